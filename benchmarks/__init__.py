@@ -0,0 +1,18 @@
+"""Benchmarks for liquidpy
+
+Run them from the root of the repository, i.e.:
+
+    python -m benchmarks                          # all the benchmarks
+    python -m benchmarks -k "bench_modes.jekyll.*"
+    python -m benchmarks.bench_filters            # a module of them
+
+The memory benchmarks (`bench_memory`) are measured by tracemalloc, in bytes.
+`python -m benchmarks.bench_threads` also prints how rendering scales with
+the threads.
+
+Save the results as a baseline and compare the later runs with it, where
+the exit code is 1 if any benchmark, of time or memory, is regressed:
+
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --compare baseline.json
+"""
@@ -0,0 +1,108 @@
+"""Run the benchmarks
+
+Examples:
+    > python -m benchmarks                        # run all
+    > python -m benchmarks -k "jekyll.*" -k where_exp
+    > python -m benchmarks --save baseline.json
+    > python -m benchmarks --compare baseline.json
+"""
+import argparse
+import importlib
+import pkgutil
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from .utils import (
+    compare,
+    load_results,
+    print_comparison,
+    run,
+    save_results,
+    select,
+)
+
+
+def import_benchmarks() -> None:
+    """Import all the `bench_*` modules to register the benchmarks"""
+    for module in pkgutil.iter_modules([str(Path(__file__).parent)]):
+        if module.name.startswith("bench_"):
+            importlib.import_module(f"{__package__}.{module.name}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks, and compare the results with a baseline
+
+    Args:
+        argv: The arguments, defaults to `sys.argv[1:]`
+
+    Returns:
+        The exit code, 1 if any benchmark is regressed
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Run the benchmarks of liquidpy",
+    )
+    parser.add_argument(
+        "-k",
+        dest="patterns",
+        action="append",
+        default=[],
+        help="Run the benchmarks matching the glob pattern or containing "
+        "the string. Can be repeated.",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List the benchmarks instead of running them",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="How many rounds to run each benchmark, overriding the defaults",
+    )
+    parser.add_argument("--save", help="Save the results to a JSON file")
+    parser.add_argument(
+        "--compare",
+        help="Compare the results with a baseline saved by --save",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The relative change of the median to report (default: 0.1)",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="The significance level of the Mann-Whitney U test "
+        "(default: 0.05)",
+    )
+    args = parser.parse_args(argv)
+
+    import_benchmarks()
+    benchmarks = select(args.patterns)
+    if args.list:
+        print("\n".join(benchmarks))
+        return 0
+
+    # load it first to fail early
+    baseline = load_results(args.compare) if args.compare else None
+    results = run(benchmarks, repeat=args.repeat)
+    if args.save:
+        save_results(args.save, results)
+
+    if baseline is None:
+        return 0
+
+    if args.patterns:
+        baseline = select(args.patterns, baseline)
+    rows = compare(baseline, results, args.threshold, args.alpha)
+    print()
+    print_comparison(rows)
+    return 1 if any(row["status"] == "regressed" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
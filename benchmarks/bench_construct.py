@@ -0,0 +1,40 @@
+"""Micro-benchmarks for constructing the environments in each mode
+
+For each mode, `<mode>.environment` constructs an environment and applies
+the bundle of the mode to it, which is what `Liquid` does besides compiling
+the template, and `<mode>.liquid` constructs a `Liquid` object with an empty
+template and the default arguments.
+"""
+from typing import Any, Callable
+
+from liquid import Liquid, LiquidEnvironment
+from liquid.modes import MODES, mode_bundle
+
+from .utils import benchmark, run, select
+
+
+def _register(mode: str) -> None:
+    """Register the benchmarks of a mode"""
+
+    @benchmark(number=200, repeat=7, name=f"{mode}.environment")
+    def environment() -> Callable[[], Any]:
+        bundle = mode_bundle(mode)
+
+        def construct() -> None:
+            env = LiquidEnvironment()
+            env.add_extension("jinja2.ext.loopcontrols")
+            bundle.apply(env, filters_as_globals=True)
+
+        return construct
+
+    @benchmark(number=200, repeat=7, name=f"{mode}.liquid")
+    def liquid() -> Callable[[], Any]:
+        return lambda: Liquid("", from_file=False, mode=mode)
+
+
+for _mode in MODES:
+    _register(_mode)
+
+
+if __name__ == "__main__":
+    run(select(["bench_construct.*"]))
@@ -0,0 +1,188 @@
+"""Benchmarks for the filters"""
+from liquid import Liquid, defaults
+
+from .utils import benchmark, run
+
+ITEMS = [{"id": i, "tags": [i % 3, i % 5]} for i in range(10_000)]
+
+WHERE_EXP_TPL = """
+{%- for item in items -%}
+{{ item.tags | where_exp: "tag", "tag > 1" | size }}
+{%- endfor -%}
+"""
+
+
+def _where_exp(expression_cache_size: int) -> Liquid:
+    orig = defaults.EXPRESSION_CACHE_SIZE
+    defaults.EXPRESSION_CACHE_SIZE = expression_cache_size
+    try:
+        return Liquid(WHERE_EXP_TPL, from_file=False, mode="jekyll")
+    finally:
+        defaults.EXPRESSION_CACHE_SIZE = orig
+
+
+@benchmark(number=1, repeat=5)
+def where_exp_10k():
+    """where_exp called on 10k items, with the expression cache"""
+    tpl = _where_exp(defaults.EXPRESSION_CACHE_SIZE)
+    return lambda: tpl.render(items=ITEMS)
+
+
+@benchmark(number=1, repeat=1, warmup=False)
+def where_exp_10k_uncached():
+    """where_exp called on 10k items, compiling the expression every time"""
+    tpl = _where_exp(0)
+    return lambda: tpl.render(items=ITEMS)
+
+
+DATES = [f"2020-{i % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(10_000)]
+
+DATE_TABLE_TPL = """
+{%- for date in dates -%}
+<tr><td>{{ date | date: "%Y" }}</td><td>{{ date | date: "%s" | plus: 86400 }}</td></tr>
+{%- endfor -%}
+"""
+
+
+@benchmark(number=1, repeat=5)
+def date_table_10k():
+    """Format and do arithmetic on a table of 10k dates"""
+    tpl = Liquid(DATE_TABLE_TPL, from_file=False)
+    return lambda: tpl.render(dates=DATES)
+
+
+PLACEHOLDERS = [f"{{{{field{i}}}}}" for i in range(15)]
+EMAIL_BODY = "".join(
+    f"<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit. {ph}</p>\n"
+    for ph in PLACEHOLDERS
+) * 20
+
+REPLACE_CHAIN_TPL = "{{ body %s }}" % " ".join(
+    f'| replace: "{ph}", "value{i}"' for i, ph in enumerate(PLACEHOLDERS)
+)
+REPLACE_MANY_TPL = "{{ body | replace_many: [%s] }}" % ", ".join(
+    f'["{ph}", "value{i}"]' for i, ph in enumerate(PLACEHOLDERS)
+)
+
+
+@benchmark(number=100, repeat=5)
+def replace_chain_15():
+    """15 chained replace filters on an email body"""
+    tpl = Liquid(REPLACE_CHAIN_TPL, from_file=False)
+    return lambda: tpl.render(body=EMAIL_BODY)
+
+
+@benchmark(number=100, repeat=5)
+def replace_many_15():
+    """The same replacements as replace_chain_15 with replace_many"""
+    tpl = Liquid(REPLACE_MANY_TPL, from_file=False)
+    return lambda: tpl.render(body=EMAIL_BODY)
+
+
+# About 5MB
+ARTICLE = (
+    "<p>Lorem <b>ipsum</b> dolor sit amet, consectetur adipiscing elit.</p>\n"
+    * 100
+    + "<!-- comment --><script>var a = 1 < 2;</script>\n"
+) * 700
+
+
+@benchmark(number=100, repeat=5)
+def truncatewords_5mb():
+    """An excerpt of 50 words from a 5MB article"""
+    tpl = Liquid("{{ article | truncatewords: 50 }}", from_file=False)
+    return lambda: tpl.render(article=ARTICLE)
+
+
+@benchmark(number=1, repeat=5)
+def strip_html_5mb():
+    """Strip the html from a 5MB article"""
+    tpl = Liquid("{{ article | strip_html }}", from_file=False)
+    return lambda: tpl.render(article=ARTICLE)
+
+
+POSTS = [
+    f"# Post {i}\n\n" + "Some *markdown* text with a [link](/a).\n\n" * 20
+    for i in range(100)
+]
+# the posts rendered in the index, the feed and the pages
+MARKDOWNIFY_TPL = """
+{%- for _ in (1..3) -%}
+{%- for post in posts -%}{{ post | markdownify }}{%- endfor -%}
+{%- endfor -%}
+"""
+
+
+@benchmark(number=1, repeat=5)
+def markdownify_posts():
+    """Markdownify 100 posts 3 times each"""
+    tpl = Liquid(MARKDOWNIFY_TPL, from_file=False, mode="jekyll")
+    return lambda: tpl.render(posts=POSTS)
+
+
+@benchmark(number=1, repeat=5)
+def markdownify_posts_cached():
+    """markdownify_posts with the result cache, which is cleared before
+    each render"""
+    from liquid.filters.jekyll import _get_markdown_cache, _markdown_settings
+
+    tpl = Liquid(MARKDOWNIFY_TPL, from_file=False, mode="jekyll")
+
+    def render():
+        orig = defaults.MARKDOWN_CACHE_SIZE
+        defaults.MARKDOWN_CACHE_SIZE = 1024
+        try:
+            _get_markdown_cache(_markdown_settings()).clear()
+            return tpl.render(posts=POSTS)
+        finally:
+            defaults.MARKDOWN_CACHE_SIZE = orig
+
+    return render
+
+
+# Japanese, Korean (with spaces) and Chinese
+CJK_SENTENCES = (
+    "こんにちは、世界！"
+    "안녕하세요 세상! "
+    "中文句子在这里。"
+)
+MULTILINGUAL_POSTS = [
+    "Reading time matters. " * 200 + CJK_SENTENCES * (i % 3) * 50
+    for i in range(1000)
+]
+READING_TIME_TPL = """
+{%- for post in posts -%}
+{{ post | number_of_words: "auto" | divided_by: 200 }}
+{%- endfor -%}
+"""
+
+
+@benchmark(number=1, repeat=5)
+def number_of_words_1k_posts():
+    """Count the words of 1000 multilingual posts in auto mode"""
+    tpl = Liquid(READING_TIME_TPL, from_file=False, mode="jekyll")
+    return lambda: tpl.render(posts=MULTILINGUAL_POSTS)
+
+
+NAV_ITEMS = [
+    {"title": f"Section {i // 20} Ünïcode Page {i}", "query": f"q={i}&lang=en"}
+    for i in range(2000)
+]
+NAVIGATION_TPL = """
+{%- for item in items -%}
+<a href="/{{ item.title | slugify: "pretty" }}?{{ item.query | cgi_escape }}"
+   id="{{ item.title | slugify }}">{{ item.title | uri_escape }}</a>
+{%- endfor -%}
+"""
+
+
+@benchmark(number=1, repeat=10)
+def navigation_2k():
+    """A navigation menu of 2000 links, rendered repeatedly as for the pages
+    of a site"""
+    tpl = Liquid(NAVIGATION_TPL, from_file=False, mode="jekyll")
+    return lambda: tpl.render(items=NAV_ITEMS)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+"""Benchmarks for the memory footprint, measured by tracemalloc
+
+For each mode, `<mode>.liquid` measures the memory retained by a `Liquid`
+object with a small template, and `<mode>.<workload>.render` the peak of
+the memory allocated by rendering some of the workloads of `bench_modes`.
+
+`Liquid.memory_report()` breaks down what a `Liquid` object retains.
+"""
+from typing import Any, Callable, Dict
+
+from .bench_modes import MODES, WORKLOADS, _liquid
+from .utils import memory_benchmark, run, select
+
+SMALL_TPL = """
+{%- for product in products -%}
+<a href="{{ product.url }}">{{ product.title | escape }}</a>
+{%- endfor -%}
+"""
+
+RENDER_WORKLOADS = ("deep_loops", "filter_chains", "includes", "large_context")
+
+
+def _register(mode: str) -> None:
+    """Register the memory benchmarks of a mode"""
+
+    @memory_benchmark(number=20, repeat=3, name=f"{mode}.liquid")
+    def liquid() -> Callable[[], Any]:
+        return lambda: _liquid(SMALL_TPL, mode)
+
+    for workload in RENDER_WORKLOADS:
+        sources, context = WORKLOADS[workload]
+
+        def render(
+            source: str = sources[mode],
+            context: Dict[str, Any] = context,
+        ) -> Callable[[], Any]:
+            tpl = _liquid(source, mode)
+            return lambda: tpl.render(**context)
+
+        memory_benchmark(
+            number=1,
+            repeat=3,
+            peak=True,
+            name=f"{mode}.{workload}.render",
+        )(render)
+
+
+for _mode in MODES:
+    _register(_mode)
+
+
+if __name__ == "__main__":
+    run(select(["bench_memory.*"]))
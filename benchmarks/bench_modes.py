@@ -0,0 +1,201 @@
+"""Benchmarks for constructing, compiling and rendering the templates in
+each mode
+
+For each mode, `<mode>.construct` constructs a `Liquid` object (mostly the
+environment) with an empty template. For each workload supported by a mode,
+`<mode>.<workload>.compile` compiles the source with an existing environment,
+and `<mode>.<workload>.render` renders the compiled template.
+"""
+from typing import Any, Callable, Dict, Tuple
+
+from jinja2 import DictLoader
+from liquid import Liquid
+
+from .utils import benchmark, run
+
+MODES = ("standard", "jekyll", "shopify", "wild")
+
+PRODUCTS = [
+    {
+        "title": f"Product {i} — {'limited ' if i % 7 == 0 else ''}edition",
+        "price": i * 1.5 % 200,
+        "type": ("shirt", "hat", "mug", "poster")[i % 4],
+        "tags": [f"tag{j}" for j in range(i % 5)],
+        "variants": [{"sku": f"P{i}-{j}", "stock": (i + j) % 3} for j in range(3)],
+    }
+    for i in range(500)
+]
+
+# The included templates
+PARTIALS = {
+    "card.html": (
+        '<div class="card">'
+        "<h3>{{ product.title | escape }}</h3>"
+        "{% include 'price.html' %}"
+        "</div>"
+    ),
+    "price.html": (
+        '<span class="price">{{ product.price | times: 100 | round'
+        ' | divided_by: 100.0 }}</span>'
+    ),
+}
+
+DEEP_LOOPS_TPL = """
+{%- for product in products -%}
+{%- for variant in product.variants -%}
+{%- for tag in product.tags -%}
+{{ forloop.index }}:{{ variant.sku }}:{{ tag }}{% if forloop.last %};{% endif %}
+{%- endfor -%}
+{%- endfor -%}
+{%- endfor -%}
+"""
+
+FILTER_CHAINS_TPL = """
+{%- for product in products -%}
+{{ product.title | downcase | replace: "edition", "ed." | remove: "limited "
+   | capitalize | append: " (" | append: product.type | append: ")"
+   | truncate: 40 | strip | escape }}
+{{ product.tags | join: ", " | upcase | split: ", " | size | plus: 1
+   | times: 2 | minus: 1 | modulo: 7 }}
+{%- endfor -%}
+"""
+
+TABLEROW_TPL = """
+<table>
+{%- tablerow product in products cols:4 limit:400 -%}
+{{ product.title }}
+{%- endtablerow -%}
+</table>
+"""
+
+CASE_TPL = """
+{%- for product in products -%}
+{%- case product.type -%}
+{%- when "shirt" -%}S{{ product.price }}
+{%- when "hat", "mug" -%}H{{ product.tags | size }}
+{%- else -%}O
+{%- endcase -%}
+{%- endfor -%}
+"""
+
+# Compiling them is the point, as the raw blocks are preprocessed
+RAW_TPL = "\n".join(
+    f"{{% raw %}}{{{{ not_a_var_{i} }}}} {{% if x %}}{{% endraw %}}"
+    f"{{% comment %}}{{{{ note_{i} }}}} {{% for %}}{{% endcomment %}}"
+    f"{{{{ x }}}}"
+    for i in range(300)
+)
+
+FRONT_MATTER_TPL = (
+    "---\n"
+    + "".join(f"key{i}: value {i}\n" for i in range(100))
+    + "tags: ["
+    + ", ".join(f"t{i}" for i in range(50))
+    + "]\n---\n"
+    + "{{ page.key0 }}{% for tag in page.tags %}{{ tag }}{% endfor %}"
+)
+
+INCLUDES_TPL = """
+{%- for product in products -%}
+{% include 'card.html' %}
+{%- endfor -%}
+"""
+
+LARGE_CONTEXT_TPL = """
+{%- for i in indexes -%}
+{{ site.data.catalog[i].name }}{{ site.config.currency }}
+{%- endfor -%}
+{{ key0 }}{{ key4999 }}
+"""
+
+LARGE_CONTEXT = {
+    **{f"key{i}": i for i in range(5000)},
+    "indexes": list(range(0, 2000, 7)),
+    "site": {
+        "config": {"currency": "$"},
+        "data": {"catalog": [{"name": f"item{i}"} for i in range(2000)]},
+    },
+}
+
+WILD_PYTHON_TPL = """
+{%- python -%}
+def stock(product):
+    return sum(variant["stock"] for variant in product["variants"])
+{%- endpython -%}
+{%- for product in products -%}
+{{ product.title | len }}:{{ stock(product) }}
+{%- endfor -%}
+"""
+
+
+def _all_modes(source: str) -> Dict[str, str]:
+    """The sources of a workload for all modes, where the wild mode uses
+    jinja's `loop` instead of `forloop`"""
+    out = dict.fromkeys(MODES, source)
+    out["wild"] = source.replace("forloop.", "loop.")
+    return out
+
+
+# name => (sources by modes, context)
+WORKLOADS: Dict[str, Tuple[Dict[str, str], Dict[str, Any]]] = {
+    "deep_loops": (_all_modes(DEEP_LOOPS_TPL), {"products": PRODUCTS}),
+    "filter_chains": (_all_modes(FILTER_CHAINS_TPL), {"products": PRODUCTS}),
+    "tablerow": (
+        dict.fromkeys(("standard", "jekyll", "shopify"), TABLEROW_TPL),
+        {"products": PRODUCTS},
+    ),
+    "case": (_all_modes(CASE_TPL), {"products": PRODUCTS}),
+    "raw_blocks": (_all_modes(RAW_TPL), {"x": 1}),
+    "front_matter": ({"jekyll": FRONT_MATTER_TPL}, {}),
+    "includes": (_all_modes(INCLUDES_TPL), {"products": PRODUCTS[:200]}),
+    "large_context": (_all_modes(LARGE_CONTEXT_TPL), LARGE_CONTEXT),
+    "python_tag": ({"wild": WILD_PYTHON_TPL}, {"products": PRODUCTS}),
+}
+
+
+def _liquid(source: str, mode: str) -> Liquid:
+    """Construct a Liquid object with the partials to include"""
+    return Liquid(
+        source,
+        from_file=False,
+        mode=mode,
+        loader=DictLoader(PARTIALS),
+    )
+
+
+def _register(mode: str) -> None:
+    """Register the benchmarks of a mode"""
+
+    @benchmark(number=20, repeat=5, name=f"{mode}.construct")
+    def construct() -> Callable[[], Any]:
+        return lambda: _liquid("", mode)
+
+    for workload, (sources, context) in WORKLOADS.items():
+        if mode not in sources:
+            continue
+
+        source = sources[mode]
+
+        def compile_(source: str = source) -> Callable[[], Any]:
+            env = _liquid("", mode).env
+            return lambda: env.from_string(source)
+
+        def render(
+            source: str = source,
+            context: Dict[str, Any] = context,
+        ) -> Callable[[], Any]:
+            tpl = _liquid(source, mode)
+            return lambda: tpl.render(**context)
+
+        benchmark(number=5, repeat=5, name=f"{mode}.{workload}.compile")(
+            compile_
+        )
+        benchmark(number=1, repeat=5, name=f"{mode}.{workload}.render")(render)
+
+
+for _mode in MODES:
+    _register(_mode)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+"""Benchmarks for rendering a shared template in multiple threads
+
+`threads.<n>` renders the same `Liquid` object `RENDERS` times in each of
+`n` threads, for 1, 2, 4 and the number of the cores. With the GIL, the time
+grows with `n`; on a free-threaded build of CPython, it should stay about the
+same as `threads.1` until the cores are saturated.
+
+Run the module to also print the throughput and the speedup over one
+thread:
+
+    python -m benchmarks.bench_threads
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .bench_modes import FILTER_CHAINS_TPL, PRODUCTS, _liquid
+from .utils import benchmark, run, select
+
+# The renders in each thread
+RENDERS = 10
+CORES = os.cpu_count() or 1
+THREADS = sorted({1, 2, 4, CORES})
+CONTEXT = {"products": PRODUCTS[:100]}
+
+
+def _register(nthreads: int) -> None:
+    """Register the benchmark with a number of threads"""
+
+    @benchmark(number=1, repeat=5, name=f"threads.{nthreads}")
+    def render() -> Callable[[], Any]:
+        tpl = _liquid(FILTER_CHAINS_TPL, "standard")
+        # started beforehand, not to time starting the threads
+        pool = ThreadPoolExecutor(nthreads)
+
+        def task(_: int) -> None:
+            for _ in range(RENDERS):
+                tpl.render(**CONTEXT)
+
+        def renders() -> None:
+            list(pool.map(task, range(nthreads)))
+
+        renders.teardown = pool.shutdown  # type: ignore[attr-defined]
+        return renders
+
+
+for _nthreads in THREADS:
+    _register(_nthreads)
+
+
+def print_scaling(results: Dict[str, Dict[str, Any]]) -> None:
+    """Print the throughput and the speedup over one thread
+
+    Args:
+        results: The results of the benchmarks of this module
+    """
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"\nGIL {'enabled' if gil else 'disabled'}, {CORES} cores")
+    base = None
+    for nthreads in THREADS:
+        stats = results.get(f"bench_threads.threads.{nthreads}")
+        if stats is None:
+            continue
+        throughput = nthreads * RENDERS / stats["median"]
+        if base is None:
+            base = throughput
+        print(
+            f"{nthreads:>3} threads  {throughput:>10.1f} renders/s  "
+            f"x{throughput / base:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    print_scaling(run(select(["bench_threads.*"])))
@@ -0,0 +1,449 @@
+"""Helpers for the benchmarks"""
+import json
+import math
+import platform
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+# name => (setup function, number, repeat, warmup, measure function)
+BENCHMARKS: Dict[str, Any] = {}
+
+
+def _register(
+    setup: Callable[[], Callable],
+    name: Optional[str],
+    *entry: Any,
+) -> None:
+    """Register a benchmark by the name of the module and the name"""
+    # use the real module name when the module is run as __main__
+    module = sys.modules[setup.__module__]
+    spec = getattr(module, "__spec__", None)
+    modname = spec.name if spec else setup.__module__
+    fullname = f"{modname.rpartition('.')[2]}.{name or setup.__name__}"
+    BENCHMARKS[fullname] = (setup, *entry)
+
+
+def benchmark(
+    number: int = 1,
+    repeat: int = 5,
+    warmup: bool = True,
+    name: str = None,
+) -> Callable[[Callable], Callable]:
+    """Register a benchmark
+
+    The decorated function does the setup and returns the function to be
+    timed. If the returned function has a `teardown` attribute, it is called
+    after the timing, i.e. to shut down the thread pools.
+
+    Examples:
+        >>> @benchmark(number=10)
+        >>> def render_loop():
+        >>>     tpl = Liquid(...)
+        >>>     return lambda: tpl.render(...)
+
+    Args:
+        number: How many times to call the timed function in each round
+        repeat: How many rounds to run
+        warmup: Whether to call the function once before timing
+        name: The name of the benchmark, after the name of the module,
+            defaults to the name of the function
+
+    Returns:
+        The decorator
+    """
+
+    def decorator(setup: Callable[[], Callable]) -> Callable:
+        _register(setup, name, number, repeat, warmup, measure)
+        return setup
+
+    return decorator
+
+
+def memory_benchmark(
+    number: int = 10,
+    repeat: int = 3,
+    peak: bool = False,
+    name: str = None,
+) -> Callable[[Callable], Callable]:
+    """Register a memory benchmark, measured by tracemalloc
+
+    The decorated function does the setup and returns the function to be
+    measured.
+
+    Examples:
+        >>> @memory_benchmark(number=20)
+        >>> def liquid_object():
+        >>>     return lambda: Liquid(...)
+
+    Args:
+        number: How many times to call the function in each round. The
+            results are kept alive until the round is measured.
+        repeat: How many rounds to run
+        peak: Whether to measure the peak of the allocated memory during
+            the calls, instead of the memory retained by the results
+        name: The name of the benchmark, after the name of the module,
+            defaults to the name of the function
+
+    Returns:
+        The decorator
+    """
+
+    def decorator(setup: Callable[[], Callable]) -> Callable:
+        _register(
+            setup,
+            name,
+            number,
+            repeat,
+            True,
+            lambda func, number, repeat, warmup: measure_memory(
+                func,
+                number,
+                repeat,
+                warmup,
+                peak,
+            ),
+        )
+        return setup
+
+    return decorator
+
+
+def measure(
+    func: Callable[[], Any],
+    number: int = 1,
+    repeat: int = 5,
+    warmup: bool = True,
+) -> Dict[str, Any]:
+    """Time a function
+
+    Args:
+        func: The function to time
+        number: How many times to call the function in each round
+        repeat: How many rounds to run
+        warmup: Whether to call the function once before timing
+
+    Returns:
+        The statistics of the seconds per call
+    """
+    if warmup:
+        func()
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "timings": timings,
+    }
+
+
+def measure_memory(
+    func: Callable[[], Any],
+    number: int = 10,
+    repeat: int = 3,
+    warmup: bool = True,
+    peak: bool = False,
+) -> Dict[str, Any]:
+    """Measure the memory allocated by a function
+
+    Args:
+        func: The function to measure
+        number: How many times to call the function in each round
+        repeat: How many rounds to run
+        warmup: Whether to call the function once before measuring, so that
+            the caches and the lazy imports are not counted
+        peak: Whether to measure the peak of the allocated memory, instead
+            of the memory retained by the results
+
+    Returns:
+        The statistics of the bytes per call
+    """
+    if warmup:
+        func()
+    samples: List[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            results = [func() for _ in range(number)]
+            gc.collect()
+            current, peak_size = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del results
+        samples.append((peak_size if peak else current) / number)
+
+    return {
+        "unit": "bytes",
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": samples,
+    }
+
+
+def select(
+    patterns: Iterable[str] = (),
+    benchmarks: Mapping[str, Any] = None,
+) -> Dict[str, Any]:
+    """Select the benchmarks by the names
+
+    Args:
+        patterns: The glob patterns (i.e. `bench_modes.jekyll.*`) or
+            substrings of the names, all benchmarks if empty
+        benchmarks: The benchmarks to select from, all registered ones by
+            default
+
+    Returns:
+        The selected benchmarks
+    """
+    if benchmarks is None:
+        benchmarks = BENCHMARKS
+    patterns = list(patterns)
+    return {
+        name: bench
+        for name, bench in benchmarks.items()
+        if not patterns
+        or any(pattern in name or fnmatchcase(name, pattern) for pattern in patterns)
+    }
+
+
+def run(
+    benchmarks: Mapping[str, Any] = None,
+    repeat: int = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Run the benchmarks and print the results
+
+    Args:
+        benchmarks: The benchmarks to run, all registered ones by default
+        repeat: How many rounds to run each benchmark, overriding the
+            registered ones
+
+    Returns:
+        The statistics of the benchmarks by names
+    """
+    if benchmarks is None:
+        benchmarks = BENCHMARKS
+
+    results = {}
+    for name, (setup, number, nrounds, warmup, measurer) in benchmarks.items():
+        func = setup()
+        try:
+            stats = results[name] = measurer(
+                func,
+                number,
+                repeat or nrounds,
+                warmup,
+            )
+        finally:
+            teardown = getattr(func, "teardown", None)
+            if teardown is not None:
+                teardown()
+        if stats.get("unit") == "bytes":
+            print(
+                f"{name:<48} "
+                f"median {stats['median'] / 1024:>10.1f} KiB "
+                f"min {stats['min'] / 1024:>10.1f} KiB "
+                f"stdev {stats['stdev'] / 1024:>8.1f} KiB"
+            )
+        else:
+            print(
+                f"{name:<48} "
+                f"median {stats['median'] * 1000:>10.3f} ms  "
+                f"min {stats['min'] * 1000:>10.3f} ms  "
+                f"stdev {stats['stdev'] * 1000:>8.3f} ms"
+            )
+    return results
+
+
+def save_results(path: str, results: Mapping[str, Dict[str, Any]]) -> None:
+    """Save the results as a JSON baseline, with the information of the
+    environment
+
+    Args:
+        path: The path to the JSON file
+        results: The results returned by `run()`
+    """
+    import jinja2
+    import liquid
+
+    data = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "liquidpy": liquid.__version__,
+            "jinja2": jinja2.__version__,
+        },
+        "results": dict(results),
+    }
+    with open(path, "w", encoding="utf-8") as fout:
+        json.dump(data, fout, indent=2)
+        fout.write("\n")
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load the results from a JSON baseline
+
+    Args:
+        path: The path to the JSON file
+
+    Returns:
+        The results by the names of the benchmarks
+    """
+    with open(path, encoding="utf-8") as fin:
+        return json.load(fin)["results"]
+
+
+@lru_cache(maxsize=None)
+def _u_counts(n1: int, n2: int) -> List[int]:
+    """The numbers of the arrangements of two samples, without ties, by the
+    Mann-Whitney U statistic"""
+    if n1 == 0 or n2 == 0:
+        return [1]
+    # the largest value is either from the first sample, where it's larger
+    # than all of the second sample, or from the second
+    first = _u_counts(n1 - 1, n2)
+    second = _u_counts(n1, n2 - 1)
+    out = [0] * (n1 * n2 + 1)
+    for u, count in enumerate(first):
+        out[u + n2] += count
+    for u, count in enumerate(second):
+        out[u] += count
+    return out
+
+
+def greater_pvalue(sample1: List[float], sample2: List[float]) -> float:
+    """The one-sided p-value of the Mann-Whitney U test that the values in
+    the first sample tend to be greater than the second
+
+    The exact distribution is used for small samples, and the normal
+    approximation for the others.
+
+    Args:
+        sample1: The first sample
+        sample2: The second sample
+
+    Returns:
+        The p-value
+    """
+    n1, n2 = len(sample1), len(sample2)
+    if not n1 or not n2:
+        return 1.0
+
+    u = sum(
+        1.0 if x > y else 0.5 if x == y else 0.0
+        for x in sample1
+        for y in sample2
+    )
+    if n1 * n2 <= 400:
+        counts = _u_counts(n1, n2)
+        return sum(counts[math.ceil(u):]) / sum(counts)
+
+    mean = n1 * n2 / 2.0
+    sd = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12.0)
+    z = (u - 0.5 - mean) / sd
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(
+    baseline: Mapping[str, Dict[str, Any]],
+    results: Mapping[str, Dict[str, Any]],
+    threshold: float = 0.1,
+    alpha: float = 0.05,
+) -> List[Dict[str, Any]]:
+    """Compare the results with a baseline
+
+    A benchmark is regressed (or improved) when its median is slower (or
+    faster) by more than the threshold, and the timings are significantly
+    slower (or faster) by the Mann-Whitney U test, so that the noise of a
+    few slow rounds is not reported. The memory benchmarks are compared by
+    the threshold only, as the measurements hardly vary.
+
+    Args:
+        baseline: The results of the baseline
+        results: The results to compare
+        threshold: The relative change of the median to report
+        alpha: The significance level of the test
+
+    Returns:
+        The comparisons of the benchmarks, with the `name`, the `unit` of
+        the medians (`s` or `bytes`), the `baseline` and `current` medians,
+        the relative `change`, the `pvalue` and the
+        `status` (`regressed`, `improved`, `unchanged`, `new` or `missing`)
+    """
+    out = []
+    for name in list(baseline) + [name for name in results if name not in baseline]:
+        base: Optional[Dict[str, Any]] = baseline.get(name)
+        current: Optional[Dict[str, Any]] = results.get(name)
+        row: Dict[str, Any] = {
+            "name": name,
+            "unit": (current or base or {}).get("unit", "s"),
+            "baseline": base and base["median"],
+            "current": current and current["median"],
+            "change": None,
+            "pvalue": None,
+        }
+        out.append(row)
+        if base is None or current is None:
+            row["status"] = "new" if base is None else "missing"
+            continue
+
+        row["change"] = change = current["median"] / base["median"] - 1.0
+        if current.get("unit") == "bytes":
+            row["status"] = (
+                "unchanged"
+                if abs(change) <= threshold
+                else "regressed"
+                if change > 0
+                else "improved"
+            )
+            continue
+
+        if change > 0:
+            pvalue = greater_pvalue(current["timings"], base["timings"])
+        else:
+            pvalue = greater_pvalue(base["timings"], current["timings"])
+        row["pvalue"] = pvalue
+        if abs(change) <= threshold or pvalue >= alpha:
+            row["status"] = "unchanged"
+        else:
+            row["status"] = "regressed" if change > 0 else "improved"
+    return out
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    """Print the comparisons returned by `compare()`"""
+
+    def fmt(value: Optional[float], spec: str, unit: str = "") -> str:
+        return "-" if value is None else format(value, spec) + unit
+
+    print(
+        f"{'Benchmark':<48} {'Baseline':>12} {'Current':>12} "
+        f"{'Change':>8} {'p':>6}  Status"
+    )
+    for row in rows:
+        # ms or KiB
+        scale, unit = (1 / 1024, "KiB") if row["unit"] == "bytes" else (1000, "ms")
+        base = row["baseline"] and row["baseline"] * scale
+        current = row["current"] and row["current"] * scale
+        print(
+            f"{row['name']:<48} {fmt(base, '.3f', unit):>12} "
+            f"{fmt(current, '.3f', unit):>12} {fmt(row['change'], '+.1%'):>8} "
+            f"{fmt(row['pvalue'], '.3f'):>6}  {row['status']}"
+        )
@@ -0,0 +1,123 @@
+"""Provides the command line interface
+
+Examples:
+    > python -m liquid compile-stats path/to/templates --mode jekyll
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# The patterns of the template files by default
+TEMPLATE_GLOBS = ("**/*.liquid", "**/*.html")
+
+
+def compile_stats(args: argparse.Namespace) -> int:
+    """Compile the templates in a directory and dump the statistics
+
+    Args:
+        args: The parsed arguments
+
+    Returns:
+        The exit code, 1 if any template fails to compile
+    """
+    from .liquid import Liquid
+    from .profiling import CompileStats
+
+    directory = Path(args.directory)
+    names = sorted(
+        {
+            path.relative_to(directory).as_posix()
+            for pattern in args.glob or TEMPLATE_GLOBS
+            for path in directory.glob(pattern)
+            if path.is_file()
+        }
+    )
+
+    stats = CompileStats()
+    env = Liquid(
+        "",
+        from_file=False,
+        mode=args.mode,
+        search_paths=[directory],
+        compile_stats=stats,
+    ).env
+    stats.reset()
+
+    errors = {}
+    for name in names:
+        try:
+            env.get_template(name)
+        except Exception as exc:
+            errors[name] = f"{type(exc).__name__}: {exc}"
+
+    if args.json:
+        json.dump(
+            {
+                "templates": stats.report(),
+                "phases": stats.summary(),
+                "errors": errors,
+            },
+            sys.stdout,
+            indent=2,
+        )
+        sys.stdout.write("\n")
+    else:
+        sys.stdout.write(stats.table(args.limit))
+
+    for name, error in errors.items():
+        print(f"{name}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """The entry of the command line interface
+
+    Args:
+        argv: The arguments, defaults to `sys.argv[1:]`
+
+    Returns:
+        The exit code
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m liquid",
+        description="Tools for the liquid templates",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "compile-stats",
+        help="Compile the templates in a directory and show the time of "
+        "the phases and the sizes for each of them",
+    )
+    command.add_argument("directory", help="The directory of the templates")
+    command.add_argument(
+        "--mode",
+        choices=("standard", "jekyll", "shopify", "wild"),
+        help="The mode of the templates, defaults to `defaults.MODE`",
+    )
+    command.add_argument(
+        "--glob",
+        action="append",
+        help="The patterns of the template files, relative to the directory "
+        f"(default: {' '.join(TEMPLATE_GLOBS)}). Can be repeated.",
+    )
+    command.add_argument(
+        "--limit",
+        type=int,
+        help="The max number of templates to show in the table",
+    )
+    command.add_argument(
+        "--json",
+        action="store_true",
+        help="Dump the statistics as JSON",
+    )
+    command.set_defaults(func=compile_stats)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
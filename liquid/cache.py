@@ -0,0 +1,87 @@
+"""Provides the shared memoisation layer for the pure filters
+
+The filters like `slugify` and `url_encode` are called with the same few
+strings again and again (i.e. in the navigation menus of every page). Their
+results are memoised in bounded LRU caches, whose statistics can be
+inspected by `memo_stats()`.
+"""
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict
+
+# The max number of results to memoise for each function
+MEMO_SIZE = 4096
+
+_memoized: Dict[str, Callable] = {}
+
+
+def memoize(
+    func: Callable = None,
+    *,
+    maxsize: int = MEMO_SIZE,
+    name: str = None,
+) -> Callable:
+    """Memoise the results of a pure function in a bounded LRU cache
+
+    Calls with unhashable arguments are passed through to the function.
+    The arguments of different types are cached separately, so that i.e.
+    `True`, `1` and `1.0` do not share a result.
+
+    Examples:
+        >>> @memoize
+        >>> def slugify(input):
+        >>>     ...
+
+    Args:
+        func: The function
+        maxsize: The max number of results to memoise
+        name: The name to report the stats with, defaults to the qualified
+            name of the function
+
+    Returns:
+        The memoised function, or a decorator if `func` is not given
+    """
+    if func is None:
+        return lambda fun: memoize(fun, maxsize=maxsize, name=name)
+
+    cached = lru_cache(maxsize=maxsize, typed=True)(func)
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return cached(*args, **kwargs)
+        except TypeError:
+            # unhashable arguments, or the function raises it, which
+            # happens again here
+            return func(*args, **kwargs)
+
+    wrapper.cache_info = cached.cache_info  # type: ignore
+    wrapper.cache_clear = cached.cache_clear  # type: ignore
+    _memoized[name or f"{func.__module__}.{func.__qualname__}"] = wrapper
+    return wrapper
+
+
+def memo_stats() -> Dict[str, Dict[str, Any]]:
+    """Get the statistics of the memoised functions
+
+    Returns:
+        A dict of the names of the functions and their statistics, including
+        `hits`, `misses`, `hit_rate`, `size` and `maxsize`
+    """
+    out = {}
+    for name, func in _memoized.items():
+        info = func.cache_info()  # type: ignore
+        calls = info.hits + info.misses
+        out[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / calls if calls else 0.0,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return out
+
+
+def clear_memos() -> None:
+    """Clear the memoised results and the statistics of all functions"""
+    for func in _memoized.values():
+        func.cache_clear()  # type: ignore
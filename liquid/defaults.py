@@ -1,6 +1,7 @@
 """Provide default settings/values"""
 from typing import TYPE_CHECKING
 
+from .drops import BLANK_DROP, EMPTY_DROP
 
 if TYPE_CHECKING:
     from .utils import PathTypeOrIter
@@ -55,9 +56,33 @@ ENV_ARGS = [
     "enable_async",
 ]
 
-# In case some one wants to use nil
-SHARED_GLOBALS = {"nil": None}
+# In case some one wants to use nil, empty or blank
+SHARED_GLOBALS = {"nil": None, "empty": EMPTY_DROP, "blank": BLANK_DROP}
 
 # Whether treat filters as globals
 # Only works in wild mode
 FILTERS_AS_GLOBALS = True
+
+# Whether to index the arrays by the properties for the `where` and
+# `find` filters, so that repeated lookups on the same array and property
+# within a render take O(1) instead of scanning the array.
+# The arrays should not be changed during the render.
+COLLECTION_INDEXES = False
+
+# The relative cost (1 being a simple string operation) from which the pure
+# filters are memoised for each render (see `FilterManager.register()`)
+FILTER_MEMO_COST = 100
+
+# The number of compiled expressions (i.e. by the `where_exp` filter) to
+# cache for each environment. 0 to disable the cache.
+EXPRESSION_CACHE_SIZE = 256
+
+# The extensions and their configurations for the `markdownify` filter
+# See: https://python-markdown.github.io/extensions/
+MARKDOWN_EXTENSIONS: list = []
+MARKDOWN_EXTENSION_CONFIGS: dict = {}
+
+# The number of rendered results of `markdownify` to cache by the hash of
+# the content, so that the same content (i.e. a post body rendered in the
+# index, feed and page templates) is only converted once. 0 to disable.
+MARKDOWN_CACHE_SIZE = 0
@@ -0,0 +1,215 @@
+"""Provides the Drop class, modelled on the drops from liquid
+
+See: https://github.com/Shopify/liquid/wiki/Introduction-to-Drops
+"""
+from typing import Any, Callable, FrozenSet, Iterable, Sequence
+
+from .runtime import current_render
+
+
+class DropField:
+    """A field exposed by a drop, resolved lazily and memoised per render
+
+    Args:
+        func: The function to resolve the value of the field
+    """
+
+    __slots__ = ("func", "name")
+
+    def __init__(self, func: Callable[["Drop"], Any]) -> None:
+        """Constructor"""
+        self.func = func
+        self.name = func.__name__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, drop: "Drop", owner: type = None) -> Any:
+        if drop is None:
+            return self
+
+        values = drop._liquid_values()
+        if values is None:
+            return self.func(drop)
+
+        try:
+            return values[self.name]
+        except KeyError:
+            value = values[self.name] = self.func(drop)
+            return value
+
+
+class Drop:
+    """The base class of the objects to be exposed to the templates
+
+    Only the fields declared by `Drop.field` are accessible in the
+    templates. They are resolved on the first access within a render and
+    memoised for the rest of that render, so that the expensive ones (i.e.
+    database queries) are not repeated.
+
+    Examples:
+        >>> class ProductDrop(Drop):
+        >>>     def __init__(self, product):
+        >>>         self.product = product
+        >>>
+        >>>     @Drop.field
+        >>>     def variants(self):
+        >>>         return self.product.variants.all()
+        >>>
+        >>>     @classmethod
+        >>>     def prefetch(cls, drops, names):
+        >>>         # load the variants of all products in one query
+        >>>         ...
+        >>>         for drop in drops:
+        >>>             drop.memoize("variants", ...)
+
+    Attributes:
+        liquid_fields: The names of the fields exposed to the templates
+    """
+
+    __slots__ = ("_liquid_memo",)
+
+    field = DropField
+    liquid_fields: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Collect the fields exposed by the drop"""
+        super().__init_subclass__(**kwargs)
+        cls.liquid_fields = frozenset(
+            name
+            for klass in cls.__mro__
+            for name, value in vars(klass).items()
+            if isinstance(value, DropField)
+        )
+
+    def _liquid_values(self) -> dict:
+        """Get the memoised values of the fields for the current render
+
+        Returns:
+            A dict of the values, or None if not rendering
+        """
+        state = current_render()
+        if state is None:
+            return None
+
+        memo = getattr(self, "_liquid_memo", None)
+        if memo is None or memo[0] != state.id:
+            memo = self._liquid_memo = (state.id, {})
+        return memo[1]
+
+    def memoize(self, name: str, value: Any) -> None:
+        """Memoise the value of a field for the current render
+
+        This is supposed to be used by `prefetch()`.
+
+        Args:
+            name: The name of the field
+            value: The value of the field
+        """
+        values = self._liquid_values()
+        if values is not None:
+            values[name] = value
+
+    @classmethod
+    def prefetch(cls, drops: Sequence["Drop"], names: Iterable[str]) -> None:
+        """Resolve the fields for a sequence of drops at once
+
+        By default, the fields are resolved one by one. Subclasses can
+        override this to load them in bulk, and `memoize()` the values.
+
+        Args:
+            drops: The drops, all instances of this class
+            names: The names of the fields to prefetch
+        """
+        names = [name for name in names if name in cls.liquid_fields]
+        for drop in drops:
+            for name in names:
+                getattr(drop, name)
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.liquid_fields:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.liquid_fields
+
+
+class EmptyDrop:
+    """The EmptyDrop class borrowed from liquid
+
+    It equals to anything that is falsy. It is immutable and a singleton,
+    so `EmptyDrop()` always returns the same object (`EMPTY_DROP`).
+    """
+
+    # Use jinja's Undefined instead?
+
+    __slots__ = ()
+    _instance = None
+
+    def __new__(cls) -> "EmptyDrop":
+        # look up in cls.__dict__, so that subclasses have their own instance
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            instance = object.__new__(cls)
+            type.__setattr__(cls, "_instance", instance)
+        return instance
+
+    def __str__(self):
+        return ""
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+    def __eq__(self, other):
+        return not bool(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None  # type: ignore
+
+    def __bool__(self):
+        return False
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return self.__class__, ()
+
+
+setattr(EmptyDrop, "empty?", True)
+
+
+class BlankDrop(EmptyDrop):
+    """The drop for `blank` from liquid
+
+    Unlike `EmptyDrop`, it does not equal to `0`, but to strings with only
+    whitespaces.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return not other.strip()
+        if other is None or other is False or isinstance(other, EmptyDrop):
+            return True
+        try:
+            return len(other) == 0
+        except TypeError:
+            return False
+
+
+EMPTY_DROP = EmptyDrop()
+BLANK_DROP = BlankDrop()
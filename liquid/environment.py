@@ -0,0 +1,517 @@
+"""Provides the jinja environment used by liquidpy"""
+import marshal
+import threading
+from types import CodeType, MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    MutableMapping,
+    Optional,
+    Union,
+)
+
+from jinja2 import Environment, Template, nodes
+from jinja2.defaults import DEFAULT_FILTERS, DEFAULT_NAMESPACE, DEFAULT_TESTS
+from jinja2.ext import Extension
+from jinja2.lexer import TokenStream
+from jinja2.utils import LRUCache, internalcode
+
+from .drops import Drop
+from .layers import Layers, layered, with_namespace
+from .parser import LiquidCodeGenerator, LiquidParser, liquid_code_generator_class
+from .profiling import compile_record
+from .props import attr_missing, subscriptable
+
+if TYPE_CHECKING:
+    from jinja2.environment import TemplateExpression
+
+# The layers of jinja's defaults, shared by the environments
+JINJA_FILTERS = MappingProxyType(DEFAULT_FILTERS)
+JINJA_TESTS = MappingProxyType(DEFAULT_TESTS)
+JINJA_GLOBALS = MappingProxyType(DEFAULT_NAMESPACE)
+
+
+class LiquidTemplate(Template):
+    """The template with the globals set for it when it is compiled
+    (see `LiquidEnvironment.set_template_global()`)"""
+
+    @classmethod
+    def from_code(
+        cls,
+        environment: Environment,
+        code: CodeType,
+        globals: MutableMapping[str, Any],
+        uptodate: Optional[Callable[[], bool]] = None,
+    ) -> Template:
+        """Create a template from the compiled code, over the globals set
+        when compiling it"""
+        pop_template_globals = getattr(environment, "pop_template_globals", None)
+        template_globals = pop_template_globals and pop_template_globals()
+        if template_globals:
+            globals = Layers(
+                template_globals,
+                *(globals.maps if isinstance(globals, Layers) else (globals,)),
+            )
+        return super().from_code(environment, code, globals, uptodate)
+
+
+class LiquidEnvironment(Environment):
+    """The environment with liquid-specific fast paths
+
+    The `a.b` and `a[b]` lookups remember, per type of `a` and name `b`,
+    which of attribute and item access could succeed, so that the lookups
+    that are known to fail are not tried (and raising exceptions) again.
+
+    Only the declared fields of drops are accessible.
+
+    The templates are parsed by `LiquidParser` and compiled by
+    `LiquidCodeGenerator`, for the liquid syntax of the `if` and `for` tags,
+    and the attributes of `forloop`, so that jinja is not patched.
+
+    The compiled expressions are cached by their sources (see
+    `compile_expression()`).
+
+    The filters, tests and globals are `Layers` over the shared read-only
+    layers, instead of copies of them. An overlay has its own top layers
+    over the ones of the environment it is created from.
+
+    Filters with a `liquid_precompile` attribute get it called with their
+    constant arguments when a template is compiled, so that they can prepare
+    things (i.e. compile regexes) ahead of rendering.
+
+    The impure filters are not evaluated when a template is compiled, even
+    if their arguments are constant (i.e. `{{ "now" | date: "%Y" }}`).
+
+    With a `compile_stats` collector (see `profiling.enable_compile_stats()`),
+    the time of the phases of compiling the templates are recorded. The
+    tokens are then lexed and filtered by the extensions eagerly, to time
+    them apart from parsing.
+
+    The templates are compiled one at a time (see `compile_lock`), as the
+    tags of the wild mode change the globals and the filters when compiling.
+    The globals of a template found when compiling it (i.e. `page` of the
+    front matter) are set for the template only (see `set_template_global()`),
+    so that the templates compiled in different threads don't see each
+    other's.
+
+    Attributes:
+        expression_cache: The LRU cache of the compiled expressions, None if
+            disabled. The size is `defaults.EXPRESSION_CACHE_SIZE`.
+        impure_filters: The impure filter functions
+        compile_lock: The lock held when compiling a template
+    """
+
+    code_generator_class = LiquidCodeGenerator
+    template_class = LiquidTemplate
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Constructor"""
+        super().__init__(*args, **kwargs)
+        self._init_layers()
+        self._init_caches()
+        self._init_filter_info()
+        self._init_compile_state()
+
+    def _init_layers(self, parent: bool = False) -> None:
+        """Turn the filters, tests and globals into layers
+
+        Args:
+            parent: Whether they are shared with the parent environment of
+                this overlay, so that this needs its own top layers
+        """
+        for name, base in (
+            ("filters", JINJA_FILTERS),
+            ("tests", JINJA_TESTS),
+            ("globals", JINJA_GLOBALS),
+        ):
+            mapping = getattr(self, name)
+            if isinstance(mapping, Layers):
+                if parent:
+                    setattr(self, name, mapping.new_child())
+            else:
+                setattr(self, name, layered(mapping, base))
+
+        # i.e. for the python tag in wild mode
+        with_namespace(self.globals)
+
+    def _init_caches(self) -> None:
+        """Initialize the caches owned by this environment"""
+        from .defaults import EXPRESSION_CACHE_SIZE
+
+        self.expression_cache = (
+            LRUCache(EXPRESSION_CACHE_SIZE) if EXPRESSION_CACHE_SIZE else None
+        )
+
+    def _init_filter_info(self, impure_filters: Iterable[Callable] = ()) -> None:
+        """Initialize the information of the filters owned by this
+        environment"""
+        self.impure_filters = set(impure_filters)
+
+    def _init_compile_state(self) -> None:
+        """Initialize the lock and the per-thread state of compiling"""
+        self.compile_lock = threading.RLock()
+        self._compiling = threading.local()
+
+    def set_template_global(self, name: str, value: Any) -> None:
+        """Set a global for the template being compiled in the current
+        thread only, i.e. by the `preprocess()` of an extension
+
+        Args:
+            name: The name of the global
+            value: The value
+        """
+        template_globals = getattr(self._compiling, "globals", None)
+        if template_globals is None:
+            template_globals = self._compiling.globals = {}
+        template_globals[name] = value
+
+    def pop_template_globals(self) -> Optional[Dict[str, Any]]:
+        """Get and clear the globals set by `set_template_global()` for the
+        template compiled last in the current thread
+
+        Returns:
+            The globals, or None if no globals are set
+        """
+        out = getattr(self._compiling, "globals", None)
+        self._compiling.globals = None
+        return out
+
+    def overlay(self, *args: Any, **kwargs: Any) -> "LiquidEnvironment":
+        """Create an overlay, with its own caches, as the compiled
+        expressions depend on the settings of the environment"""
+        out = super().overlay(*args, **kwargs)
+        out._init_layers(parent=True)
+        out._init_caches()
+        out._init_filter_info(self.impure_filters)
+        out._init_compile_state()
+        return out
+
+    @internalcode
+    def compile(  # type: ignore[override]
+        self,
+        source: Union[str, nodes.Template],
+        name: str = None,
+        filename: str = None,
+        raw: bool = False,
+        defer_init: bool = False,
+    ) -> Union[str, CodeType]:
+        """Compile a template, recording the statistics if enabled"""
+        with self.compile_lock:
+            # the ones of a template failed to compile
+            self._compiling.globals = None
+            stats = getattr(self, "compile_stats", None)
+            if stats is None:
+                return super().compile(source, name, filename, raw, defer_init)
+
+            record = stats.start(name, filename)
+            if isinstance(source, str):
+                record.source_size = len(source.encode("utf-8"))
+            try:
+                out = super().compile(source, name, filename, raw, defer_init)
+            except BaseException:
+                stats.finish(record, keep=False)
+                raise
+            stats.finish(record)
+            return out
+
+    def preprocess(
+        self,
+        source: str,
+        name: str = None,
+        filename: str = None,
+    ) -> str:
+        """Preprocess the source with the extensions, timing each of them
+        when compiling with the statistics enabled"""
+        record = compile_record(self)
+        if record is None:
+            return super().preprocess(source, name, filename)
+
+        source = str(source)
+        for ext in self.iter_extensions():
+            if type(ext).preprocess is Extension.preprocess:
+                continue
+            with record.phase(f"preprocess:{type(ext).__name__}"):
+                source = ext.preprocess(source, name, filename)
+        return source
+
+    def _tokenize(
+        self,
+        source: str,
+        name: Optional[str],
+        filename: str = None,
+        state: str = None,
+    ) -> TokenStream:
+        """Tokenize the source, lexing and filtering the tokens eagerly to
+        time the phases when compiling with the statistics enabled"""
+        record = compile_record(self)
+        if record is None:
+            return super()._tokenize(source, name, filename, state)
+
+        source = self.preprocess(source, name, filename)
+        record.preprocessed_size = len(source.encode("utf-8"))
+        with record.phase("lex"):
+            tokens = list(self.lexer.tokenize(source, name, filename, state))
+
+        for ext in self.iter_extensions():
+            if type(ext).filter_stream is Extension.filter_stream:
+                continue
+            with record.phase(f"filter_stream:{type(ext).__name__}"):
+                tokens = list(
+                    ext.filter_stream(TokenStream(iter(tokens), name, filename))
+                )
+        return TokenStream(iter(tokens), name, filename)
+
+    def _parse(
+        self,
+        source: str,
+        name: Optional[str],
+        filename: Optional[str],
+    ) -> nodes.Template:
+        """Parse the source with the liquid parser, timing it if compiling
+        with the statistics enabled"""
+        record = compile_record(self)
+        if record is None:
+            return LiquidParser(self, source, name, filename).parse()
+
+        with record.phase("parse"):
+            return LiquidParser(self, source, name, filename).parse()
+
+    def make_globals(
+        self,
+        d: Optional[MutableMapping[str, Any]],
+    ) -> MutableMapping[str, Any]:
+        """Make the globals of a template, over the layers of the globals of
+        this environment
+
+        The returned chain has the layers of this environment as its own
+        lower layers, instead of this environment's `Layers` as one of them,
+        so that a lookup goes through one chain only. The layers are shared,
+        so the later changes of the globals of this environment are seen by
+        the template.
+        """
+        return Layers({} if d is None else d, *self.globals.maps)
+
+    def _generate(
+        self,
+        source: nodes.Template,
+        name: str,
+        filename: str,
+        defer_init: bool = False,
+    ) -> str:
+        """Prepare the filters and generate the python code"""
+        record = compile_record(self)
+        if record is None:
+            self._prepare_filters(source)
+            return super()._generate(source, name, filename, defer_init)
+
+        with record.phase("generate"):
+            self._prepare_filters(source)
+            code = super()._generate(source, name, filename, defer_init)
+        record.code_size = len(code.encode("utf-8"))
+        return code
+
+    def _compile(self, source: str, filename: str) -> CodeType:
+        """Compile the python code, timing it if compiling with the
+        statistics enabled"""
+        record = compile_record(self)
+        if record is None:
+            return super()._compile(source, filename)
+
+        with record.phase("compile"):
+            code = super()._compile(source, filename)
+        record.bytecode_size = len(marshal.dumps(code))
+        return code
+
+    def _prepare_filters(self, node: nodes.Node) -> None:
+        """Prepare the filters in a template before it is compiled
+
+        Keep the impure filters from being evaluated at compile time, and
+        call the `liquid_precompile` of the filters with constant arguments.
+
+        Args:
+            node: The parsed template
+        """
+        for filter_node in node.find_all(nodes.Filter):
+            func = self.filters.get(filter_node.name)
+            if getattr(func, "liquid_profiled", False):
+                # the original one of a filter wrapped by the profiler
+                func = func.__wrapped__
+            try:
+                impure = func in self.impure_filters
+            except TypeError:  # pragma: no cover, unhashable callable
+                impure = False
+            if impure:
+                # as_const() is what the optimizer and the code generator
+                # use to evaluate the constant expressions
+                filter_node.as_const = _not_constant
+                continue
+
+            precompile = getattr(func, "liquid_precompile", None)
+            if (
+                precompile is None
+                or filter_node.dyn_args is not None
+                or filter_node.dyn_kwargs is not None
+            ):
+                continue
+
+            try:
+                args = [arg.as_const() for arg in filter_node.args]
+                kwargs = {
+                    kwarg.key: kwarg.value.as_const()
+                    for kwarg in filter_node.kwargs
+                }
+                precompile(*args, **kwargs)
+            except Exception:
+                # not constant, or let the errors raise at rendering
+                continue
+
+    def compile_expression(
+        self,
+        source: str,
+        undefined_to_none: bool = True,
+    ) -> "TemplateExpression":
+        """Compile an expression, or get it from the cache if it has been
+        compiled before
+
+        So that filters like `where_exp` won't lex, parse and compile the
+        same expression again and again, i.e. in a loop.
+
+        Args:
+            source: The source of the expression
+            undefined_to_none: Whether converting the undefined value to None
+
+        Returns:
+            The compiled expression
+        """
+        cache = self.expression_cache
+        if cache is None:
+            return super().compile_expression(source, undefined_to_none)
+
+        key = (source, undefined_to_none)
+        expr = cache.get(key)
+        if expr is None:
+            expr = cache[key] = super().compile_expression(
+                source,
+                undefined_to_none,
+            )
+        return expr
+
+    def getattr(self, obj: Any, attribute: str) -> Any:
+        """Get an item or attribute of an object but prefer the attribute"""
+        if isinstance(obj, Drop):
+            if attribute in obj.liquid_fields:
+                return getattr(obj, attribute)
+            return self.undefined(obj=obj, name=attribute)
+
+        if attr_missing(type(obj), attribute):
+            try:
+                return obj[attribute]
+            except (TypeError, LookupError, AttributeError):
+                return self.undefined(obj=obj, name=attribute)
+
+        return super().getattr(obj, attribute)
+
+    def getitem(self, obj: Any, argument: Any) -> Any:
+        """Get an item or attribute of an object but prefer the item"""
+        if isinstance(obj, Drop) or (
+            isinstance(argument, str) and not subscriptable(type(obj))
+        ):
+            # drops only expose their fields, and for the others,
+            # obj[argument] is going to fail anyway
+            return self.getattr(obj, argument)
+
+        return super().getitem(obj, argument)
+
+
+def _not_constant(eval_ctx: Any = None) -> Any:
+    """The `as_const()` of the nodes that are never constant"""
+    raise nodes.Impossible()
+
+
+_liquid_template_classes: Dict[type, type] = {}
+
+
+def liquid_template_class(cls: type) -> type:
+    """Get the class that combines LiquidTemplate and the template class of
+    a jinja environment (i.e. `NativeTemplate`)
+
+    Args:
+        cls: The template class
+
+    Returns:
+        The combined class
+    """
+    if issubclass(cls, LiquidTemplate):
+        return cls
+    if cls is Template:
+        return LiquidTemplate
+
+    try:
+        return _liquid_template_classes[cls]
+    except KeyError:
+        pass
+
+    out = _liquid_template_classes[cls] = type(
+        f"Liquid{cls.__name__}",
+        (LiquidTemplate, cls),
+        {"__module__": __name__},
+    )
+    return out
+
+
+_liquid_env_classes: Dict[type, type] = {}
+
+
+def liquid_environment_class(cls: type) -> type:
+    """Get the class that combines LiquidEnvironment and a jinja
+    environment class
+
+    Args:
+        cls: The jinja environment class
+
+    Returns:
+        The combined class
+    """
+    if issubclass(cls, LiquidEnvironment):
+        return cls
+
+    try:
+        return _liquid_env_classes[cls]
+    except KeyError:
+        pass
+
+    out = _liquid_env_classes[cls] = type(
+        f"Liquid{cls.__name__}",
+        (LiquidEnvironment, cls),
+        {
+            "__module__": __name__,
+            "code_generator_class": liquid_code_generator_class(
+                cls.code_generator_class
+            ),
+            "template_class": liquid_template_class(cls.template_class),
+        },
+    )
+    return out
+
+
+def overlay(env: Environment, **kwargs: Any) -> LiquidEnvironment:
+    """Create an overlay of an environment, which is a LiquidEnvironment
+
+    Args:
+        env: The environment
+        **kwargs: The arguments for `env.overlay()`
+
+    Returns:
+        The overlayed environment
+    """
+    out = env.overlay(**kwargs)
+    if not isinstance(out, LiquidEnvironment):
+        out.__class__ = liquid_environment_class(out.__class__)
+        out._init_layers()
+        out._init_caches()
+        out._init_filter_info()
+        out._init_compile_state()
+    return out
@@ -9,7 +9,10 @@ if TYPE_CHECKING:
 
 
 class FrontMatterExtension(Extension):
-    """This extension allows to have front matter"""
+    """This extension allows to have front matter
+
+    The front matter is available as `page` to the template it belongs to.
+    """
 
     def __init__(self, environment: "Environment") -> None:
         super().__init__(environment)
@@ -27,5 +30,12 @@ class FrontMatterExtension(Extension):
             from frontmatter.default_handlers import YAMLHandler as handler
 
         processed = frontmatter.loads(source, handler=handler())
-        self.environment.globals["page"] = processed
+        set_template_global = getattr(
+            self.environment, "set_template_global", None
+        )
+        if set_template_global is None:
+            self.environment.globals["page"] = processed
+        else:
+            # only for this template, see LiquidEnvironment
+            set_template_global("page", processed)
         return processed.content
@@ -2,24 +2,25 @@
 See: https://jekyllrb.com/docs/liquid/filters/
 """
 import datetime
+import hashlib
 import os
 import random
 import re
+import threading
 import urllib.parse
-from typing import TYPE_CHECKING, Any, Sequence
+from functools import lru_cache
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any, Optional, Sequence, Tuple
 
 if TYPE_CHECKING:
     from jinja2.environment import Environment
 
-
-# environmentfilter deprecated
-try:
-    from jinja2 import pass_environment
-except ImportError:
-    from jinja2 import environmentfilter as pass_environment
-
 from jinja2.filters import FILTERS
+from jinja2.utils import LRUCache
 
+from ..cache import memoize
+from ..props import getattr_or_item, prop_getter
+from ..runtime import collection_index
 from .manager import FilterManager
 
 jekyll_filter_manager = FilterManager()
@@ -27,24 +28,20 @@ jekyll_filter_manager = FilterManager()
 
 def _getattr(obj: Any, attr: str) -> Any:
     """Get attribute of an object, if fails, try get item"""
-    try:
-        return getattr(obj, attr)
-    except AttributeError:
-        return obj[attr]
+    return getattr_or_item(obj, attr)
 
 
-def _getattr_multi(obj: Any, attr: str) -> Any:
-    """Get attribute of an object at multiple levels
+# Returned by the property getters when the property does not exist
+MISSING = object()
 
-    For example: x.a.b = 1, _getattr_multi(x, "a.b") == 1
-    """
-    attrs = attr.split(".")
-    for att in attrs:
-        try:
-            obj = _getattr(obj, att)
-        except (TypeError, KeyError):
-            obj = None
-    return obj
+# The disallowed characters for the slugify modes, None for the default
+SLUGIFY_PATTERNS = {
+    "pretty": re.compile(r"[^_.~!$&'()+,;=@\w]+"),
+    "raw": re.compile(r"\s+"),
+}
+
+# The characters that str.split() treats as whitespaces but regex doesn't
+INFO_SEPARATOR_PATTERN = re.compile(r"[\x1c-\x1f]")
 
 
 def _get_global_var(env: "Environment", name: str, attr: str = None) -> Any:
@@ -58,13 +55,12 @@ def _get_global_var(env: "Environment", name: str, attr: str = None) -> Any:
     return _getattr(out, attr)
 
 
-jekyll_filter_manager.register("group_by")(FILTERS["groupby"])
-jekyll_filter_manager.register("to_integer")(FILTERS["int"])
-jekyll_filter_manager.register("inspect")(repr)
+jekyll_filter_manager.register("group_by", pure=True)(FILTERS["groupby"])
+jekyll_filter_manager.register("to_integer", pure=True)(FILTERS["int"])
+jekyll_filter_manager.register("inspect", pure=True)(repr)
 
 
-@jekyll_filter_manager.register
-@pass_environment
+@jekyll_filter_manager.register(pure=False, pass_env=True)
 def relative_url(env, value):
     """Get relative url based on site.baseurl"""
     baseurl = _get_global_var(env, "site", "baseurl")
@@ -72,16 +68,14 @@ def relative_url(env, value):
     return os.path.join(parts.path, value)
 
 
-@jekyll_filter_manager.register
-@pass_environment
+@jekyll_filter_manager.register(pure=False, pass_env=True)
 def absolute_url(env, value):
     """Get absolute url based on site.baseurl"""
     baseurl = _get_global_var(env, "site", "baseurl")
     return urllib.parse.urljoin(baseurl, value)
 
 
-@jekyll_filter_manager.register
-@pass_environment
+@jekyll_filter_manager.register(pure=True, pass_env=True)
 def date_to_xmlschema(env, value: datetime.datetime):
     """Convert date to xml schema format"""
     return value.isoformat()
@@ -90,28 +84,34 @@ def date_to_xmlschema(env, value: datetime.datetime):
 # TODO: other date filters
 
 
-@jekyll_filter_manager.register
-@pass_environment
+@jekyll_filter_manager.register(pure=False, pass_env=True)
 def where_exp(env, value, item, expr):
     """Where using expression"""
     compiled = env.compile_expression(expr)
     return [itm for itm in value if compiled(**{item: itm})]
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True)
 def find(value, attr, query):
     """Find elements from array using attribute value"""
-    for item in value:
+    getter = prop_getter(attr, attr_first=True, default=MISSING)
+    index = collection_index(value, getter, MISSING)
+    if index is not None:
         try:
-            if _getattr(item, attr) == query:
-                return item
-        except (KeyError, AttributeError):
-            continue
+            found = index.get(query)
+        except TypeError:  # unhashable query
+            pass
+        else:
+            return found[0] if found else None
+
+    for item in value:
+        prop = getter(item)
+        if prop is not MISSING and prop == query:
+            return item
     return None
 
 
-@jekyll_filter_manager.register
-@pass_environment
+@jekyll_filter_manager.register(pure=False, pass_env=True)
 def find_exp(env, value, item, expr):
     """Find elements using expression"""
     compiled = env.compile_expression(expr)
@@ -125,8 +125,7 @@ def find_exp(env, value, item, expr):
     return None
 
 
-@jekyll_filter_manager.register
-@pass_environment
+@jekyll_filter_manager.register(pure=False, pass_env=True)
 def group_by_expr(env, value, item, expr):
     """Group by data using expression"""
     compiled = env.compile_expression(expr)
@@ -137,7 +136,7 @@ def group_by_expr(env, value, item, expr):
     return [{name: name, items: items} for name, items in out.items()]
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True)
 def xml_escape(input: str) -> str:
     """Convert an object into its String representation
 
@@ -154,7 +153,8 @@ def xml_escape(input: str) -> str:
     return escape(input)
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True, cost=10)
+@memoize
 def cgi_escape(input: str) -> str:
     """CGI escape a string for use in a URL. Replaces any special characters
     with appropriate %XX replacements.
@@ -168,7 +168,8 @@ def cgi_escape(input: str) -> str:
     return urllib.parse.quote_plus(input)
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True, cost=10)
+@memoize
 def uri_escape(input: str) -> str:
     """URI escape a string.
 
@@ -184,7 +185,7 @@ def uri_escape(input: str) -> str:
 # TODO: smartify, sassify, scssify
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True)
 def jsonify(input: Any) -> str:
     """Convert the input into json string
 
@@ -198,7 +199,7 @@ def jsonify(input: Any) -> str:
     return json.dumps(input)
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True)
 def array_to_sentence_string(
     array: Sequence[str],
     connector: str = "and",
@@ -226,7 +227,8 @@ def array_to_sentence_string(
     return ", ".join(array[:-1]) + f", {connector} {array[-1]}"
 
 
-@jekyll_filter_manager.register("slugify")
+@jekyll_filter_manager.register("slugify", pure=True, cost=10)
+@memoize
 def jekyll_slugify(input: str, mode: str = "default") -> str:
     """Slugify a string
 
@@ -244,15 +246,27 @@ def jekyll_slugify(input: str, mode: str = "default") -> str:
 
     from slugify import slugify  # type: ignore
 
-    if mode == "pretty":
-        return slugify(input, regex_pattern=r"[^_.~!$&'()+,;=@\w]+")
-    if mode == "raw":
-        return slugify(input, regex_pattern=r"\s+")
+    return slugify(input, regex_pattern=SLUGIFY_PATTERNS.get(mode))
 
-    return slugify(input)
 
+@lru_cache(maxsize=None)
+def _cjk_word_patterns() -> Tuple[Any, Any]:
+    """Compile the patterns for `number_of_words()`
 
-@jekyll_filter_manager.register
+    Returns:
+        The pattern matching a run of CJK characters, and the pattern
+        matching a CJK character or a word of other characters
+    """
+    import regex  # type: ignore
+
+    cjk_charset = r"\p{Han}\p{Katakana}\p{Hiragana}\p{Hangul}"
+    return (
+        regex.compile(fr"[{cjk_charset}]+"),
+        regex.compile(fr"[{cjk_charset}]|[^{cjk_charset}\s]+"),
+    )
+
+
+@jekyll_filter_manager.register(pure=True, cost=100)
 def number_of_words(input: str, mode: str = None) -> int:
     """Count the number of words in the input string.
 
@@ -265,40 +279,143 @@ def number_of_words(input: str, mode: str = None) -> int:
     Returns:
         The word count.
     """
-    import regex
+    if mode not in ("cjk", "auto"):
+        return len(input.split())
 
-    cjk_charset = r"\p{Han}\p{Katakana}\p{Hiragana}\p{Hangul}"
-    cjk_regex = fr"[{cjk_charset}]"
-    word_regex = fr"[^{cjk_charset}\s]+"
-    if mode == "cjk":
-        return len(regex.findall(cjk_regex, input)) + len(
-            regex.findall(word_regex, input)
-        )
-    if mode == "auto":
-        cjk_count = len(regex.findall(cjk_regex, input))
-        return (
-            len(input.split())
-            if cjk_count == 0
-            else cjk_count + len(regex.findall(word_regex, input))
+    cjk_runs_pattern, words_pattern = _cjk_word_patterns()
+    # replace the runs of CJK characters with spaces in one pass, so that
+    # the other words can be counted by str.split(), instead of matching
+    # the words one by one
+    stripped, runs = cjk_runs_pattern.subn(" ", input)
+    if mode == "auto" and not runs:
+        return len(input.split())
+
+    if INFO_SEPARATOR_PATTERN.search(input):
+        # whitespaces for str.split() but not for the patterns
+        return words_pattern.subn("", input)[1]
+
+    cjk_count = len(input) - len(stripped) + runs
+    return cjk_count + len(stripped.split())
+
+
+# The Markdown instances for the threads
+_markdown_local = threading.local()
+# The settings and the cache of the rendered results
+_markdown_cache: Tuple[Any, Optional[LRUCache]] = (None, None)
+_markdown_cache_lock = threading.Lock()
+
+
+def _markdown_settings() -> Tuple[list, dict]:
+    """Get the current settings for markdownify"""
+    from .. import defaults
+
+    return (
+        defaults.MARKDOWN_EXTENSIONS,
+        defaults.MARKDOWN_EXTENSION_CONFIGS,
+    )
+
+
+class _Identity:
+    """Wraps an object to be compared by identity"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any) -> None:
+        self.obj = obj
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _Identity) and other.obj is self.obj
+
+
+def _settings_key(value: Any) -> Any:
+    """Take a snapshot of the settings to detect the changes
+
+    The containers are copied and compared by their contents, so that
+    in-place changes are detected, while the other objects (i.e. the
+    extension instances, which don't implement `__eq__`) are compared by
+    identity, instead of being copied, which makes them never equal.
+    """
+    if isinstance(value, list):
+        return [_settings_key(val) for val in value]
+    if isinstance(value, tuple):
+        return tuple(_settings_key(val) for val in value)
+    if isinstance(value, dict):
+        return {key: _settings_key(val) for key, val in value.items()}
+    if isinstance(value, (str, bytes, int, float, type(None))):
+        return value
+    return _Identity(value)
+
+
+def _get_markdown(settings: Tuple[list, dict]) -> Any:
+    """Get the Markdown instance of the current thread, created with the
+    settings
+
+    Creating a Markdown instance loads all the extensions, so they are
+    reused, and created again only when the settings change.
+    """
+    md = getattr(_markdown_local, "md", None)
+    key = _settings_key(settings)
+    if md is None or _markdown_local.settings != key:
+        from markdown import Markdown  # type: ignore
+
+        extensions, configs = settings
+        md = _markdown_local.md = Markdown(
+            extensions=extensions,
+            extension_configs=configs,
         )
-    return len(input.split())
+        _markdown_local.settings = key
+    return md
+
 
+def _get_markdown_cache(settings: Tuple[list, dict]) -> Optional[LRUCache]:
+    """Get the cache of the rendered results for the settings"""
+    global _markdown_cache
+    from ..defaults import MARKDOWN_CACHE_SIZE
 
-@jekyll_filter_manager.register
+    cached_settings, cache = _markdown_cache
+    key = (_settings_key(settings), MARKDOWN_CACHE_SIZE)
+    if cached_settings != key:
+        with _markdown_cache_lock:
+            cache = LRUCache(MARKDOWN_CACHE_SIZE) if MARKDOWN_CACHE_SIZE else None
+            _markdown_cache = (key, cache)
+    return cache
+
+
+@jekyll_filter_manager.register(pure=True, cost=1000)
 def markdownify(value):
-    """Markdownify a string"""
-    from markdown import markdown  # type: ignore
+    """Markdownify a string
 
-    return markdown(value)
+    The extensions are configured by `defaults.MARKDOWN_EXTENSIONS` and
+    `defaults.MARKDOWN_EXTENSION_CONFIGS`. The results are cached by the
+    hash of the content if `defaults.MARKDOWN_CACHE_SIZE` is set.
+    """
+    value = str(value)
+    settings = _markdown_settings()
+    cache = _get_markdown_cache(settings)
+    if cache is not None:
+        key = hashlib.sha1(value.encode("utf-8", "surrogatepass")).digest()
+        out = cache.get(key)
+        if out is not None:
+            return out
+
+    md = _get_markdown(settings)
+    try:
+        out = md.convert(value)
+    finally:
+        md.reset()
+
+    if cache is not None:
+        cache[key] = out
+    return out
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=True, cost=100)
 def normalize_whitespace(value):
     """Replace multiple spaces into one"""
     return re.sub(r"\s+", " ", value)
 
 
-@jekyll_filter_manager.register("sort")
+@jekyll_filter_manager.register("sort", pure=True)
 def jekyll_sort(
     array: Sequence,
     prop: str = None,
@@ -337,17 +454,19 @@ def jekyll_sort(
 
         return sorted_arr + [None] * n_none
 
-    non_none_arr = [
-        elm for elm in array if _getattr_multi(elm, prop) is not None
-    ]
-    none_arr = [elm for elm in array if _getattr_multi(elm, prop) is None]
-    sorted_arr = list(
-        sorted(
-            non_none_arr,
-            key=lambda elm: _getattr_multi(elm, prop),
-            reverse=True,
-        )
-    )
+    # get the property of each element only once
+    getter = prop_getter(prop, attr_first=True, dotted=True)
+    decorated = []
+    none_arr = []
+    for elm in array:
+        value = getter(elm)
+        if value is None:
+            none_arr.append(elm)
+        else:
+            decorated.append((value, elm))
+
+    decorated.sort(key=itemgetter(0), reverse=True)
+    sorted_arr = [elm for _, elm in decorated]
 
     if none_pos == "first":
         return none_arr + sorted_arr
@@ -355,7 +474,7 @@ def jekyll_sort(
     return sorted_arr + none_arr
 
 
-@jekyll_filter_manager.register
+@jekyll_filter_manager.register(pure=False)
 def sample(value, n: int = 1):
     """Sample elements from array"""
     return random.sample(value, k=n)
@@ -1,25 +1,104 @@
 """Provides filter manager"""
-from typing import TYPE_CHECKING, Callable, Dict, Sequence, Union
+from functools import wraps
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+# environmentfilter deprecated
+try:
+    from jinja2 import pass_environment
+except ImportError:  # pragma: no cover
+    from jinja2 import environmentfilter as pass_environment
+
+from ..layers import Layers, freeze
+from ..runtime import current_render
 
 if TYPE_CHECKING:
     from jinja2 import Environment
 
 
+def memoize_per_render(filterfunc: Callable) -> Callable:
+    """Memoise the results of a pure filter for the current render
+
+    The results are keyed by the arguments and their types. Calls with
+    unhashable arguments, or outside of a render, are passed through.
+
+    Args:
+        filterfunc: The filter
+
+    Returns:
+        The memoised filter
+    """
+
+    @wraps(filterfunc)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        state = current_render()
+        if state is None:
+            return filterfunc(*args, **kwargs)
+
+        key = (
+            "filter",
+            filterfunc,
+            args,
+            tuple(map(type, args)),
+            tuple(kwargs.items()),
+            tuple(map(type, kwargs.values())),
+        )
+        memo = state.memo
+        try:
+            return memo[key]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable arguments
+            return filterfunc(*args, **kwargs)
+
+        out = memo[key] = filterfunc(*args, **kwargs)
+        return out
+
+    return wrapper
+
+
 class FilterManager:
     """A manager for filters
 
     Attributes:
         filters: a mapping of filter names to filters
+        pures: a mapping of filter names and whether the filters are pure,
+            meaning that the results only depend on the arguments, and there
+            are no side effects. Impure filters are never evaluated when the
+            templates are compiled, even with constant arguments.
+        costs: a mapping of filter names and the relative costs of the
+            filters, 1 being a simple string operation. Pure filters that
+            cost no less than `defaults.FILTER_MEMO_COST` are memoised
+            for each render.
+
+    The filters are added to the environments as shared read-only layers
+    (see `layer()`), which are rebuilt when a filter is registered.
     """
 
-    __slots__ = ("filters",)
+    __slots__ = ("filters", "pures", "costs", "_layers")
 
     def __init__(self) -> None:
         """Constructor"""
         self.filters: Dict[str, Callable] = {}
+        self.pures: Dict[str, bool] = {}
+        self.costs: Dict[str, float] = {}
+        # the memo cost (None for not memoised) => layer
+        self._layers: Dict[Optional[float], Mapping[str, Callable]] = {}
 
     def register(
-        self, name_or_filter: Union[str, Sequence[str], Callable] = None
+        self,
+        name_or_filter: Union[str, Sequence[str], Callable] = None,
+        pure: bool = None,
+        cost: float = None,
+        pass_env: bool = False,
     ) -> Callable:
         """Register a filter
 
@@ -33,16 +112,29 @@ class FilterManager:
             >>> @filter_manager.register('addfunc')
             >>> def add(a, b):
             >>>   return a+b
+            >>> # an expensive pure filter, memoised for each render
+            >>> @filter_manager.register(pure=True, cost=1000)
+            >>> def currency(amount, code):
+            >>>   ...
 
         Args:
             name_or_filter: The filter to register
                 if name is given, will be treated as alias
+            pure: Whether the filter is pure. None for unknown, and it is
+                treated as pure when the arguments are constant (jinja's
+                behavior).
+            cost: The relative cost of the filter
+            pass_env: Whether to pass the environment to the filter as the
+                first argument
 
         Returns:
             The registered function or the decorator
         """
 
         def decorator(filterfunc: Callable) -> Callable:
+            if pass_env:
+                filterfunc = pass_environment(filterfunc)
+
             name = filterfunc.__name__
             name = [name]  # type: ignore
 
@@ -53,8 +145,13 @@ class FilterManager:
                         nam.strip() for nam in names.split(",")
                     )  # type: ignore
                 name = names  # type: ignore
+            self._layers.clear()
             for nam in name:
                 self.filters[nam] = filterfunc
+                if pure is not None:
+                    self.pures[nam] = pure
+                if cost is not None:
+                    self.costs[nam] = cost
 
             return filterfunc
 
@@ -63,18 +160,64 @@ class FilterManager:
 
         return decorator
 
+    def layer(self, memoize: bool = True) -> Mapping[str, Callable]:
+        """Get the filters as a read-only layer, shared by the environments
+
+        Args:
+            memoize: Whether to memoise the expensive pure filters for each
+                render (see `defaults.FILTER_MEMO_COST`)
+
+        Returns:
+            The layer of the filters
+        """
+        from ..defaults import FILTER_MEMO_COST
+
+        key = FILTER_MEMO_COST if memoize else None
+        layer = self._layers.get(key)
+        if layer is not None:
+            return layer
+
+        filters = self.filters.copy()
+        if memoize:
+            for name, filterfunc in filters.items():
+                if (
+                    self.pures.get(name)
+                    and self.costs.get(name, 0) >= FILTER_MEMO_COST
+                ):
+                    filters[name] = memoize_per_render(filterfunc)
+
+        layer = self._layers[key] = freeze(filters)
+        return layer
+
     def update_to_env(
         self, env: "Environment", overwrite: bool = True
     ) -> None:
         """Update the filters to environment
 
+        Expensive pure filters are memoised for each render, and the impure
+        ones are recorded in `env.impure_filters`, if the environment has it,
+        so that they are not evaluated at compile time.
+
+        If the filters of the environment are `Layers`, the filters are added
+        as a layer, instead of being copied.
+
         Args:
             env: The environment to update these filters to
             overwrite: Whether overwrite existing filters in the env?
         """
-        if overwrite:
-            env.filters.update(self.filters)
-
-        filters = self.filters.copy()
-        filters.update(env.filters)
-        env.filters = filters
+        filters = self.layer()
+
+        impure_filters = getattr(env, "impure_filters", None)
+        if impure_filters is not None:
+            impure_filters.update(
+                filters[name]
+                for name, pure in self.pures.items()
+                if pure is False
+            )
+
+        if isinstance(env.filters, Layers):
+            env.filters.add_layer(filters, overwrite)
+        elif overwrite:
+            env.filters.update(filters)
+        else:
+            env.filters = {**filters, **env.filters}
@@ -2,25 +2,55 @@
 import re
 import math
 import html
-from datetime import datetime
+from datetime import date, datetime, time
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Mapping, Match, Optional, Pattern, Tuple, Union
+from urllib.parse import quote_plus, unquote
 
 from jinja2.filters import FILTERS
 
+from ..cache import memoize
+from ..drops import Drop, EmptyDrop, EMPTY_DROP  # noqa: F401
+from ..props import getitem_or_attr, prop_getter
+from ..runtime import collection_index, current_render
 from .manager import FilterManager
 
 
 standard_filter_manager = FilterManager()
 
 
+# Dates like 2015-07-17 or 2015-07-17T10:00:00 can be parsed without dateutil
+ISO_DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# The words, split the same way as str.split()
+WORD_PATTERN = re.compile(r"\S+")
+# The html tags, comments and the tags with their bodies for strip_html
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+HTML_SPECIAL_PATTERN = re.compile(r"<(?:!--|(script|style)(?=[\s/>]))", re.I)
+HTML_BLOCK_END_PATTERNS = {
+    name: re.compile(rf"</{name}\s*>", re.I) for name in ("script", "style")
+}
+
+
 class DateTime:
-    """Date time allows plus/minus operation"""
+    """Date time allows plus/minus operation
+
+    The formatted value is cached, as it is used by the operations
+    """
+
+    __slots__ = ("dt", "fmt", "_formatted")
+
     def __init__(self, dt: datetime, fmt: str) -> None:
         self.dt = dt
         self.fmt = fmt
+        self._formatted = None
 
     def __str__(self) -> str:
         """How it is rendered"""
-        return self.dt.strftime(self.fmt)
+        if self._formatted is None:
+            self._formatted = self.dt.strftime(self.fmt)
+        return self._formatted
 
     def __add__(self, other: int) -> int:
         return int(str(self)) + other
@@ -65,62 +95,38 @@ class DateTime:
         return other // float(str(self))
 
 
-class EmptyDrop:
-    """The EmptyDrop class borrowed from liquid"""
-
-    # Use jinja's Undefined instead?
-
-    def __init__(self):
-        setattr(self, "empty?", True)
-
-    def __str__(self):
-        return ""
-
-    def __eq__(self, other):
-        return not bool(other)
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __bool__(self):
-        return False
-
-
 def _get_prop(obj, prop, _raise=False):
     """Get the property of the object, allow via getitem"""
     try:
-        return obj[prop]
-    except (TypeError, KeyError):
-        try:
-            return getattr(obj, prop)
-        except AttributeError:
-            if _raise:  # pragma: no cover
-                raise
-            return None
+        return getitem_or_attr(obj, prop)
+    except AttributeError:
+        if _raise:  # pragma: no cover
+            raise
+        return None
 
 
 # Jinja comes with thses filters
 # standard_filter_manager.register(str.capitalize)
 # standard_filter_manager.register(abs)
 # standard_filter_manager.register(round)
-standard_filter_manager.register("concat")(list.__add__)
-standard_filter_manager.register("at_least")(max)
-standard_filter_manager.register("at_most")(min)
-standard_filter_manager.register("downcase")(str.lower)
-standard_filter_manager.register("upcase")(str.upper)
-standard_filter_manager.register(html.escape)
-standard_filter_manager.register(str.lstrip)
-standard_filter_manager.register(str.rstrip)
-standard_filter_manager.register(str.strip)
-standard_filter_manager.register(str.replace)
-standard_filter_manager.register("size")(len)
-standard_filter_manager.register(int)
-standard_filter_manager.register(float)
-standard_filter_manager.register(str)
-standard_filter_manager.register(bool)
-
-
-@standard_filter_manager.register
+standard_filter_manager.register("concat", pure=True)(list.__add__)
+standard_filter_manager.register("at_least", pure=True)(max)
+standard_filter_manager.register("at_most", pure=True)(min)
+standard_filter_manager.register("downcase", pure=True)(str.lower)
+standard_filter_manager.register("upcase", pure=True)(str.upper)
+standard_filter_manager.register(html.escape, pure=True)
+standard_filter_manager.register(str.lstrip, pure=True)
+standard_filter_manager.register(str.rstrip, pure=True)
+standard_filter_manager.register(str.strip, pure=True)
+standard_filter_manager.register(str.replace, pure=True)
+standard_filter_manager.register("size", pure=True)(len)
+standard_filter_manager.register(int, pure=True)
+standard_filter_manager.register(float, pure=True)
+standard_filter_manager.register(str, pure=True)
+standard_filter_manager.register(bool, pure=True)
+
+
+@standard_filter_manager.register(pure=True)
 def split(base, sep):
     """Split a string into a list
     If the sep is empty, return the list of characters
@@ -130,72 +136,107 @@ def split(base, sep):
     return base.split(sep)
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def append(base, suffix):
     """Append a suffix to a string"""
     return f"{base}{suffix}"
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def prepend(base, prefix):
     """Prepend a prefix to a string"""
     return f"{prefix}{base}"
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def times(base, sep):
     """Implementation of *"""
     return base * sep
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def minus(base, sep):
     """Implementation of -"""
     return base - sep
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def plus(base, sep):
     """Implementation of +"""
     return base + sep
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def modulo(base, sep):
     """Implementation of %"""
     return base % sep
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def ceil(base):
     """Get the ceil of a number"""
     return math.ceil(float(base))
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def floor(base):
     """Get the floor of a number"""
     return math.floor(float(base))
 
 
-@standard_filter_manager.register("date")
+def _parse_date(base: str) -> datetime:
+    """Parse a date string, try ISO 8601 format first without dateutil"""
+    # dateutil fills the missing fields from today, so the cached results
+    # are only valid for the day
+    return _parse_date_on(base, date.today())
+
+
+@lru_cache(maxsize=1024)
+def _parse_date_on(base: str, today: date) -> datetime:
+    """Parse a date string, with the missing fields filled from `today`"""
+    if ISO_DATE_PATTERN.match(base):
+        try:
+            dtime = datetime.fromisoformat(base)
+        except ValueError:
+            pass
+        else:
+            # let dateutil handle the timezones, to keep their names
+            if dtime.tzinfo is None:
+                return dtime
+
+    from dateutil import parser    # type: ignore
+    return parser.parse(base, default=datetime.combine(today, time()))
+
+
+def _now() -> datetime:
+    """Get the current time, which is frozen during a render"""
+    state = current_render()
+    if state is None:
+        return datetime.now()
+
+    now = state.memo.get("now")
+    if now is None:
+        now = state.memo["now"] = datetime.now()
+    return now
+
+
+@standard_filter_manager.register("date", pure=False)
 def liquid_date(base, fmt):
     """Format a date/datetime"""
 
-    if base == "now":
-        dtime = datetime.now()
-    elif base == "today":
-        dtime = datetime.today()
+    if base == "now" or base == "today":
+        dtime = _now()
+    elif isinstance(base, datetime):
+        dtime = base
     elif isinstance(base, (int, float)):
         dtime = datetime.fromtimestamp(base)
     else:
-        from dateutil import parser    # type: ignore
-        dtime = parser.parse(base)
+        dtime = _parse_date(base)
 
     return DateTime(dtime, fmt)
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def default(base, deft, allow_false=False):
     """Return the deft value if base is not set.
     Otherwise, return base"""
@@ -206,7 +247,7 @@ def default(base, deft, allow_false=False):
     return FILTERS["default"](base, deft, isinstance(base, str))
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def divided_by(base, dvdby):
     """Implementation of / or //"""
     if isinstance(dvdby, int):
@@ -214,85 +255,207 @@ def divided_by(base, dvdby):
     return base / dvdby
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def escape_once(base):
     """Escapse html characters only once of the string"""
     return html.escape(html.unescape(base))
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def newline_to_br(base):
     """Replace newline with `<br />`"""
     return base.replace("\n", "<br />")
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def remove(base, string):
     """Remove a substring from a string"""
     return base.replace(string, "")
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def remove_first(base, string):
     """Remove the first substring from a string"""
     return base.replace(string, "", 1)
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def replace_first(base, old, new):
     """Replace the first substring with new string"""
     return base.replace(old, new, 1)
 
 
+@lru_cache(maxsize=256)
+def _compile_replace_many(
+    pairs: Tuple[Tuple[str, str], ...],
+) -> Tuple[Pattern, Mapping[str, str]]:
+    """Compile the substrings into one pattern that matches the longest
+    substring at each position, with the mapping to their replacements
+
+    The alternatives are tried in order by the regex engine, so sorting them
+    by length makes the matching leftmost-longest.
+    """
+    mapping: dict = {}
+    for old, new in pairs:
+        # like a chain of replace, the first replacement of a substring wins
+        if old:
+            mapping.setdefault(old, new)
+
+    olds = sorted(mapping, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, olds))), mapping
+
+
+@standard_filter_manager.register(pure=True, cost=100)
+def replace_many(
+    base: str,
+    replacements: Union[Mapping[str, str], Iterable[Tuple[str, str]]],
+) -> str:
+    """Replace multiple substrings in one pass
+
+    At each position, the longest substring that matches is replaced, and
+    the replaced text is not scanned again. When the substrings don't
+    overlap, and no replacement contains any of the substrings, the result
+    is the same as a chain of `replace`. Otherwise, it differs from the
+    chain, i.e. `"abc" | replace_many: [["ab", "x"], ["bc", "y"]]` gives
+    `"xc"`, and `"a" | replace_many: [["a", "b"], ["b", "c"]]` gives `"b"`.
+
+    Empty substrings are ignored.
+
+    Examples:
+        >>> {{ body | replace_many: [["{name}", name], ["{date}", date]] }}
+
+    Args:
+        base: The string
+        replacements: A mapping or pairs of substrings and their
+            replacements
+
+    Returns:
+        The string with the substrings replaced
+    """
+    compiled, mapping = _compile_replace_many(_regex_pairs(replacements))
+    if not mapping:
+        return base
+
+    return compiled.sub(lambda m: mapping[m[0]], base)
+
+
+@standard_filter_manager.register(pure=True, cost=100)
+def remove_many(base: str, strings: Iterable[str]) -> str:
+    """Remove multiple substrings in one pass
+
+    See `replace_many` for how the substrings are matched.
+
+    Args:
+        base: The string
+        strings: The substrings to remove
+
+    Returns:
+        The string with the substrings removed
+    """
+    return replace_many(base, [(string, "") for string in strings])
+
+
 # @standard_filter_manager.register
 # def reverse(base):
 #     """Get the reversed list"""
 #     if not base:
-#         return EmptyDrop()
+#         return EMPTY_DROP
 #     return list(reversed(base))
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def sort(base):
     """Get the sorted list"""
     if not base:
-        return EmptyDrop()
+        return EMPTY_DROP
     return list(sorted(base))
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def sort_natural(base):
     """Get the sorted list in a case-insensitive manner"""
     if not base:
-        return EmptyDrop()
+        return EMPTY_DROP
     return list(sorted(base, key=str.casefold))
 
 
-@standard_filter_manager.register("slice")
+@standard_filter_manager.register("slice", pure=True)
 def liquid_slice(base, start, length=1):
     """Slice a list"""
     if not base:
-        return EmptyDrop()
+        return EMPTY_DROP
     if start < 0:
         start = len(base) + start
     end = None if length is None else start + length
     return base[start:end]
 
 
-@standard_filter_manager.register
+def _strip_tags(base: str) -> str:
+    """Strip the html tags from a string without comments and blocks"""
+    # a "<" after the last ">" can't start a tag, and leaving them out
+    # avoids a scan to the end of the string for each of them
+    last = base.rfind(">")
+    if last < 0:
+        return base
+    return HTML_TAG_PATTERN.sub("", base[: last + 1]) + base[last + 1 :]
+
+
+@standard_filter_manager.register(pure=True, cost=100)
 def strip_html(base):
-    """Strip html tags from a string"""
-    # use html parser?
-    return re.sub(r"<[^>]+>", "", base)
+    """Strip html tags, comments, and the bodies of `<script>` and
+    `<style>` tags from a string
 
+    Like liquid, the comments and blocks are stripped before the other tags,
+    and a comment or block that is not closed is stripped as a tag.
 
-@standard_filter_manager.register
+    The string is scanned once, so the time is linear to its length.
+    """
+    find = base.find
+    out = []
+    pos = 0
+    search_from = 0
+    # the comments/blocks known to be unclosed after the current position
+    unclosed = set()
+    while True:
+        special = HTML_SPECIAL_PATTERN.search(base, search_from)
+        if not special:
+            break
+
+        name = special.group(1)
+        name = "--" if name is None else name.lower()
+        stop = None
+        if name not in unclosed:
+            if name == "--":
+                end = find("-->", special.end())
+                stop = None if end < 0 else end + 3
+            else:
+                close = HTML_BLOCK_END_PATTERNS[name].search(
+                    base,
+                    special.end(),
+                )
+                stop = close and close.end()
+
+        if stop is None:
+            # leave it to be stripped as a tag
+            unclosed.add(name)
+            search_from = special.end()
+            continue
+
+        out.append(base[pos : special.start()])
+        pos = search_from = stop
+
+    out.append(base[pos:])
+    # a tag may span the stripped comments/blocks
+    return _strip_tags("".join(out))
+
+
+@standard_filter_manager.register(pure=True)
 def strip_newlines(base):
     """Strip newlines from a string"""
     return base.replace("\n", "")
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def truncate(base, length, ellipsis="..."):
     """Truncate a string"""
     lenbase = len(base)
@@ -302,65 +465,119 @@ def truncate(base, length, ellipsis="..."):
     return base[: length - len(ellipsis)] + ellipsis
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def truncatewords(base, length, ellipsis="..."):
-    """Truncate a string by words"""
-    # do we need to preserve the whitespaces?
-    baselist = base.split()
-    lenbase = len(baselist)
-    if length >= lenbase:
-        return base
+    """Truncate a string by words
 
+    Only the words needed are scanned, so that it is cheap to get an excerpt
+    of a large string.
+    """
+    if length < 0:
+        # counting from the end needs all the words
+        baselist = base.split()
+    else:
+        baselist = [
+            match.group()
+            for match in islice(WORD_PATTERN.finditer(base), length + 1)
+        ]
+        if length >= len(baselist):
+            return base
+
+    # do we need to preserve the whitespaces?
     # instead of collapsing them into just a single space?
     return " ".join(baselist[:length]) + ellipsis
 
 
-@standard_filter_manager.register
-def uniq(base):
-    """Get the unique elements from a list"""
+@standard_filter_manager.register(pure=True)
+def uniq(base, prop=None):
+    """Get the unique elements from a list, or the elements with unique
+    values of a property if given"""
     if not base:
-        return EmptyDrop()
+        return EMPTY_DROP
+
+    if prop is None:
+        try:
+            return list(dict.fromkeys(base))
+        except TypeError:
+            # unhashable elements
+            getter = None
+    else:
+        getter = prop_getter(prop)
+
     ret = []
+    seen = set()
+    # unhashable values can only be checked linearly
+    seen_unhashable = []
     for bas in base:
-        if bas not in ret:
-            ret.append(bas)
+        value = bas if getter is None else getter(bas)
+        try:
+            if value in seen:
+                continue
+            seen.add(value)
+        except TypeError:
+            if value in seen_unhashable:
+                continue
+            seen_unhashable.append(value)
+        ret.append(bas)
     return ret
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True, cost=10)
+@memoize
 def url_decode(base):
     """Url-decode a string"""
-    try:
-        from urllib import unquote
-    except ImportError:
-        from urllib.parse import unquote
     return unquote(base)
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True, cost=10)
+@memoize
 def url_encode(base):
     """Url-encode a string"""
-    try:
-        from urllib import urlencode
-    except ImportError:
-        from urllib.parse import urlencode
-    return urlencode({"": base})[1:]
+    if not isinstance(base, (str, bytes)):
+        base = str(base)
+    return quote_plus(base)
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def where(base, prop, value):
     """Query a list of objects with a given property value"""
-    ret = [bas for bas in base if _get_prop(bas, prop) == value]
-    return ret or EmptyDrop()
+    getter = prop_getter(prop)
+    index = collection_index(base, getter)
+    if index is not None:
+        try:
+            ret = index.get(value)
+        except TypeError:  # unhashable value
+            pass
+        else:
+            return list(ret) if ret else EMPTY_DROP
+
+    ret = [bas for bas in base if getter(bas) == value]
+    return ret or EMPTY_DROP
 
 
-@standard_filter_manager.register(["liquid_map", "map"])
+@standard_filter_manager.register(["liquid_map", "map"], pure=True)
 def liquid_map(base, prop):
     """Map a property to a list of objects"""
-    return [_get_prop(bas, prop) for bas in base]
+    getter = prop_getter(prop)
+    return [getter(bas) for bas in base]
+
+
+@standard_filter_manager.register(pure=False)
+def prefetch(base, *names):
+    """Prefetch the fields of the drops in a list, so that the drops can
+    load them in bulk (i.e. before looping over them)"""
+    if not base:
+        return base
+    groups = {}
+    for bas in base:
+        if isinstance(bas, Drop):
+            groups.setdefault(type(bas), []).append(bas)
+    for drop_class, drops in groups.items():
+        drop_class.prefetch(drops, names)
+    return base
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def attr(base, prop):
     """Similar as `__getattr__()` but also works like `__getitem__()"""
     return _get_prop(base, prop)
@@ -377,25 +594,133 @@ def attr(base, prop):
 # def first(base):
 #     """Get the first element of the list"""
 #     if not base:
-#         return EmptyDrop()
+#         return EMPTY_DROP
 #     return base[0]
 
 # @standard_filter_manager.register
 # def last(base):
 #     """Get the last element of the list"""
 #     if not base:
-#         return EmptyDrop()
+#         return EMPTY_DROP
 #     return base[-1]
 
 
-@standard_filter_manager.register
+@standard_filter_manager.register(pure=True)
 def compact(base):
     """Remove empties from a list"""
     ret = [bas for bas in base if bas]
-    return ret or EmptyDrop()
+    return ret or EMPTY_DROP
+
+
+@lru_cache(maxsize=1024)
+def _compile_regex(regex: str, flags: int) -> Pattern:
+    """Compile a regex, cached by the pattern and flags
+
+    A dedicated cache, so that the many patterns used by templates don't
+    thrash the (small) internal cache of `re`, and vice versa
+    """
+    return re.compile(regex, flags)
+
+
+# The escapes and the character classes are matched first, so that the
+# references to the groups are not looked for inside them
+_PATTERN_GROUP_REFS = re.compile(
+    r"\\[^1-9]|\[\^?\]?(?:\\.|[^\]\\])*\]|(\\[1-9]|\(\?P=|\(\?\()",
+    re.DOTALL,
+)
+# The escapes of the replacements, where the octal escapes (i.e. `\\101`)
+# are matched before the numbered references to the groups
+_REPL_ESCAPES = re.compile(r"\\(?:[1-7][0-7]{2}|([1-9][0-9]?)|g<(\d+)>|.)", re.DOTALL)
+
+
+def _has_group_refs(regex: str) -> bool:
+    """Check if a pattern refers to its own groups, i.e. `(a)\\1`,
+    `(?P=name)` or `(?(1)a|b)`"""
+    return any(
+        match.group(1) for match in _PATTERN_GROUP_REFS.finditer(regex)
+    )
+
+
+def _shift_group_refs(repl: str, offset: int) -> str:
+    """Shift the numbered references to the groups in a replacement"""
+
+    def shift(match: Match) -> str:
+        num = match.group(1) or match.group(2)
+        if num is None:
+            return match.group(0)
+        return f"\\g<{int(num) + offset}>"
+
+    return _REPL_ESCAPES.sub(shift, repl)
+
+
+@lru_cache(maxsize=256)
+def _compile_regex_many(
+    pairs: Tuple[Tuple[str, str], ...],
+    flags: int,
+) -> Tuple[Optional[Pattern], Tuple[str, ...]]:
+    """Compile the patterns into one, with the replacements whose group
+    references are adjusted for the combined pattern
+
+    Each pattern is wrapped in a group, and the index of that group is used
+    to find the replacement for a match.
+
+    The patterns referring to their own groups (i.e. `(a)\\1`) and the
+    group names used by more than one pattern can't be combined. In that
+    case, the combined pattern is None, and the patterns should be applied
+    one by one.
+    """
+    combined = []
+    repls = [""]  # group 0
+    for regex, repl in pairs:
+        # the index of the wrapping group
+        offset = len(repls)
+        groups = _compile_regex(regex, flags).groups
+        if _has_group_refs(regex):
+            return None, ()
+
+        combined.append(f"({regex})")
+        repls.append(_shift_group_refs(repl, offset))
+        # placeholders for the groups inside the pattern
+        repls.extend([""] * groups)
+
+    try:
+        return _compile_regex("|".join(combined), flags), tuple(repls)
+    except re.error:
+        return None, ()
+
+
+def _regex_flags(case_sensitive: bool) -> int:
+    return 0 if case_sensitive else re.IGNORECASE
 
 
-@standard_filter_manager.register
+def _precompile_regex_replace(
+    regex: str,
+    replace: str = "",
+    case_sensitive: bool = False,
+    count: int = 0,
+) -> None:
+    """Compile a constant pattern when the template is compiled"""
+    _compile_regex(regex, _regex_flags(case_sensitive))
+
+
+def _regex_pairs(
+    patterns: Union[Mapping[str, str], Iterable[Tuple[str, str]]],
+) -> Tuple[Tuple[str, str], ...]:
+    """Turn the patterns into a hashable tuple of pattern-replacement pairs"""
+    if isinstance(patterns, Mapping):
+        patterns = patterns.items()
+    return tuple((regex, repl) for regex, repl in patterns)
+
+
+def _precompile_regex_replace_many(
+    patterns: Union[Mapping[str, str], Iterable[Tuple[str, str]]],
+    case_sensitive: bool = False,
+) -> None:
+    """Compile the constant patterns when the template is compiled"""
+    _compile_regex_many(_regex_pairs(patterns), _regex_flags(case_sensitive))
+
+
+@standard_filter_manager.register(pure=True, cost=100)
 def regex_replace(
     base: str,
     regex: str,
@@ -408,13 +733,59 @@ def regex_replace(
         # Raise an error instead?
         return base
 
-    args = {
-        "pattern": regex,  # re.escape
-        "repl": replace,
-        "string": base,
-        "count": count,
-    }
-    if not case_sensitive:
-        args["flags"] = re.IGNORECASE
+    return _compile_regex(regex, _regex_flags(case_sensitive)).sub(
+        replace,
+        base,
+        count=count,
+    )
+
+
+regex_replace.liquid_precompile = _precompile_regex_replace  # type: ignore
+
+
+@standard_filter_manager.register(pure=True, cost=100)
+def regex_replace_many(
+    base: str,
+    patterns: Union[Mapping[str, str], Iterable[Tuple[str, str]]],
+    case_sensitive: bool = False,
+) -> str:
+    """Replace multiple regex patterns in one pass
+
+    At each position, the first pattern that matches is replaced, and the
+    replaced text is not matched again. So the result may be different from
+    applying `regex_replace` one by one, when the patterns overlap or a
+    replacement matches other patterns. The patterns are applied one by one
+    when they can't be combined, i.e. when they refer to their own groups
+    (`(a)\\1`) or share group names.
+
+    Examples:
+        >>> {{ body | regex_replace_many: [["\\s+", " "], ["(\\d+)px", "\\1em"]] }}
+
+    Args:
+        base: The string
+        patterns: A mapping or pairs of patterns and their replacements
+        case_sensitive: Whether the patterns are case-sensitive
+
+    Returns:
+        The string with the patterns replaced
+    """
+    if not isinstance(base, str):
+        return base
+
+    pairs = _regex_pairs(patterns)
+    if not pairs:
+        return base
+
+    flags = _regex_flags(case_sensitive)
+    compiled, repls = _compile_regex_many(pairs, flags)
+    if compiled is None:
+        for regex, repl in pairs:
+            base = _compile_regex(regex, flags).sub(repl, base)
+        return base
+
+    return compiled.sub(lambda m: m.expand(repls[m.lastindex]), base)
+
 
-    return re.sub(**args)    # type: ignore
+regex_replace_many.liquid_precompile = (  # type: ignore
+    _precompile_regex_replace_many
+)
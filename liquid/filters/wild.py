@@ -1,10 +1,5 @@
 """Provides some wild filters"""
 
-try:
-    from jinja2 import pass_environment
-except ImportError:
-    from jinja2 import environmentfilter as pass_environment
-
 from typing import TYPE_CHECKING, Any, Callable
 from .manager import FilterManager
 
@@ -14,8 +9,7 @@ if TYPE_CHECKING:
 wild_filter_manager = FilterManager()
 
 
-@wild_filter_manager.register("ifelse, if_else")
-@pass_environment
+@wild_filter_manager.register("ifelse, if_else", pure=False, pass_env=True)
 def ifelse(
     env: "Environment",
     value: Any,
@@ -69,7 +63,7 @@ def ifelse(
     return compile_out(false, false_args)
 
 
-@wild_filter_manager.register
+@wild_filter_manager.register(pure=False)
 def call(fn: Callable, *args, **kwargs) -> Any:
     """Call a function with passed arguments
 
@@ -88,7 +82,7 @@ def call(fn: Callable, *args, **kwargs) -> Any:
     return fn(*args, **kwargs)
 
 
-@wild_filter_manager.register
+@wild_filter_manager.register(pure=False)
 def each(array: Any, fn: Callable, *args: Any, **kwargs: Any) -> Any:
     """Call a function for each item in an array.
 
@@ -0,0 +1,142 @@
+"""Provides the layered registries of the filters, tests and globals
+
+An environment looks up its filters, tests and globals through a chain of
+layers: a small mutable top layer for its own overrides, over the read-only
+layers shared by the environments (i.e. the standard filters, and jinja's
+defaults), so that constructing an environment does not copy them.
+"""
+from collections import ChainMap
+from types import MappingProxyType
+from typing import Any, Mapping, MutableMapping
+
+
+class Layers(ChainMap):
+    """A chain of layers, where the lookups go through the layers in order,
+    and the writes go to the top layer (`maps[0]`)
+
+    Unlike `ChainMap`, a missing key in a layer doesn't raise and catch an
+    exception, as the lookups usually go through a few layers. Note that
+    the items of the lower layers can't be deleted.
+    """
+
+    def __getitem__(self, key: Any) -> Any:
+        """Get the value of a key from the first layer that has it"""
+        for mapping in self.maps:
+            if key in mapping:
+                return mapping[key]
+        return self.__missing__(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get the value of a key from the first layer that has it, or
+        the default"""
+        for mapping in self.maps:
+            if key in mapping:
+                return mapping[key]
+        return default
+
+    def add_layer(self, layer: Mapping, overwrite: bool = True) -> None:
+        """Add a layer
+
+        Args:
+            layer: The layer, usually a read-only shared one (see `freeze()`)
+            overwrite: Whether the items of the layer overwrite the existing
+                ones, including the ones in the top layer. Otherwise, it
+                is added to the bottom.
+        """
+        if not overwrite:
+            self.maps.append(layer)
+            return
+
+        top = self.maps[0]
+        if top:
+            for key in layer:
+                top.pop(key, None)
+        self.maps.insert(1, layer)
+
+
+class Namespace(dict):
+    """A top layer, that can be the globals of python code (see `exec()`),
+    where the names missing in it are looked up in the other layers
+
+    The functions defined by the code keep it as their globals, so that they
+    see the later changes of the layers.
+    """
+
+    __slots__ = ("layers",)
+
+    def __init__(self, layers: Layers, *args: Any, **kwargs: Any) -> None:
+        """Constructor
+
+        Args:
+            layers: The layers to look up the missing names in
+            *args: and
+            **kwargs: The initial items, as for `dict()`
+        """
+        super().__init__(*args, **kwargs)
+        self.layers = layers
+
+    def __missing__(self, key: Any) -> Any:
+        """Get the value of a missing key from the other layers"""
+        for mapping in self.layers.maps:
+            if mapping is not self and key in mapping:
+                return mapping[key]
+        raise KeyError(key)
+
+
+def with_namespace(layers: Layers) -> Layers:
+    """Make the top layer of the layers a `Namespace`
+
+    Args:
+        layers: The layers
+
+    Returns:
+        The layers
+    """
+    if not isinstance(layers.maps[0], Namespace):
+        layers.maps[0] = Namespace(layers, layers.maps[0])
+    return layers
+
+
+def freeze(mapping: Mapping) -> Mapping:
+    """Get a read-only snapshot of a mapping, to be shared as a layer
+
+    Args:
+        mapping: The mapping
+
+    Returns:
+        The read-only snapshot
+    """
+    return MappingProxyType(dict(mapping))
+
+
+def layered(mapping: MutableMapping, base: Mapping) -> Layers:
+    """Turn a mapping into layers over a base, i.e. the defaults it is
+    copied from, where only the items different from the base are kept in
+    the top layer
+
+    Args:
+        mapping: The mapping
+        base: The base, a read-only layer
+
+    Returns:
+        The layers, or the mapping itself if it is already layered
+    """
+    if isinstance(mapping, Layers):
+        return mapping
+
+    if mapping == base:
+        # i.e. just copied from the base
+        return Layers({}, base)
+
+    if any(key not in mapping for key in base):
+        # some items of the base are removed
+        return Layers({}, mapping)
+
+    return Layers(
+        {
+            key: value
+            for key, value in mapping.items()
+            if key not in base or base[key] is not value
+        },
+        base,
+    )
@@ -1,15 +1,25 @@
 """Provides Liquid class"""
-import builtins
-from typing import Any, Callable, Mapping
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, Optional, Union
 from jinja2 import (
     Environment,
     ChoiceLoader,
     FileSystemLoader,
 )
 
-from .filters.standard import standard_filter_manager
+from .environment import LiquidEnvironment, overlay
+from .filters.manager import FilterManager
+from .layers import freeze
+from .modes import mode_bundle
+from .runtime import render_scope
 from .utils import PathType, PathTypeOrIter
 
+if TYPE_CHECKING:
+    from .profiling import CompileStats, Profiler
+
+# The globals added to all the environments
+BUILTIN_GLOBALS = freeze({"int": int, "float": float, "str": str, "bool": bool})
+
 
 class Liquid:
     """The entrance for the package
@@ -36,9 +46,17 @@ class Liquid:
             `encoding` and/or `followlinks`, you should use jinja's
             `FileSystemLoader`
         globals: Additional global values to be used to render the template
-        filters: Additional filters be to used to render the template
+        filters: Additional filters be to used to render the template.
+            Could be a `FilterManager` to register them with their purity
+            and costs.
         filters_as_globals: Whether also use filters as globals
             Only works in wild mode
+        profile: Whether to profile the filters and tags, or a `Profiler`
+            to record them, i.e. one shared by multiple templates.
+            See `liquid.profiling`.
+        compile_stats: Whether to record the time of the phases and the
+            sizes of compiling the templates, or a `CompileStats` to record
+            them. The records are available at `env.compile_stats`.
         **kwargs: Other arguments for an jinja Environment construction and
             configurations for extensions
     """
@@ -54,8 +72,10 @@ class Liquid:
         filter_with_colon: bool = None,
         search_paths: PathTypeOrIter = None,
         globals: Mapping[str, Any] = None,
-        filters: Mapping[str, Callable] = None,
+        filters: Union[Mapping[str, Callable], FilterManager] = None,
         filters_as_globals: bool = None,
+        profile: Union[bool, "Profiler"] = False,
+        compile_stats: Union[bool, "CompileStats"] = False,
         **kwargs: Any,
     ) -> None:
         """Constructor"""
@@ -69,6 +89,7 @@ class Liquid:
             ENV_ARGS,
             SHARED_GLOBALS,
             FILTERS_AS_GLOBALS,
+            COLLECTION_INDEXES,
         )
 
         if from_file is None:
@@ -99,95 +120,48 @@ class Liquid:
         else:
             loader = fsloader
 
-        self.env = Environment(**env_args, loader=loader)
-        if env is not None:
-            self.env = env.overlay(**env_args, loader=loader)
+        if env is None:
+            self.env = LiquidEnvironment(**env_args, loader=loader)
+        else:
+            self.env = overlay(env, **env_args, loader=loader)
 
         self.env.extend(**ext_conf)
-        self.env.globals.update(SHARED_GLOBALS)
+        self.env.extend(collection_indexes=COLLECTION_INDEXES)
+        # a live view, so that it is shared instead of copied
+        self.env.globals.add_layer(MappingProxyType(SHARED_GLOBALS))
 
-        standard_filter_manager.update_to_env(self.env)
         self.env.add_extension("jinja2.ext.loopcontrols")
         if filter_with_colon:
             from .exts.filter_colon import FilterColonExtension
 
             self.env.add_extension(FilterColonExtension)
 
-        if mode == "wild":
-            from .exts.wild import LiquidWildExtension
-            from .filters.wild import wild_filter_manager
-
-            self.env.add_extension("jinja2.ext.debug")
-            self.env.add_extension(LiquidWildExtension)
-
-            bfilters = {
-                key: getattr(builtins, key)
-                for key in dir(builtins)
-                if not key.startswith("_")
-                and callable(getattr(builtins, key))
-                and key
-                not in (
-                    "copyright",
-                    "credits",
-                    "input",
-                    "help",
-                    "globals",
-                    "license",
-                    "locals",
-                    "memoryview",
-                    "object",
-                    "property",
-                    "staticmethod",
-                    "super",
-                )
-                and not any(key_c.isupper() for key_c in key)
-            }
-            self.env.filters.update(bfilters)
-            wild_filter_manager.update_to_env(self.env)
-            self.env.globals.update(
-                {
-                    key: val
-                    for key, val in __builtins__.items()
-                    if not key.startswith("_")
-                }
-            )
-            if filters_as_globals:
-                self.env.globals.update(standard_filter_manager.filters)
-                self.env.globals.update(wild_filter_manager.filters)
-
-        elif mode == "jekyll":
-            from .exts.front_matter import FrontMatterExtension
-            from .exts.jekyll import LiquidJekyllExtension
-            from .filters.jekyll import jekyll_filter_manager
+        mode_bundle(mode).apply(self.env, filters_as_globals)
 
-            jekyll_filter_manager.update_to_env(self.env)
-            self.env.add_extension(FrontMatterExtension)
-            self.env.add_extension(LiquidJekyllExtension)
-
-        elif mode == "shopify":
-            from .exts.shopify import LiquidShopifyExtension
-            from .filters.shopify import shopify_filter_manager
+        if isinstance(filters, FilterManager):
+            filters.update_to_env(self.env)
+        elif filters:
+            self.env.filters.update(filters)
 
-            shopify_filter_manager.update_to_env(self.env)
-            self.env.add_extension(LiquidShopifyExtension)
+        self.env.globals.add_layer(BUILTIN_GLOBALS)
+        if globals:
+            self.env.globals.update(globals)
 
-        else:  # standard
-            from .exts.standard import LiquidStandardExtension
+        if profile:
+            from .profiling import enable_profiling
 
-            self.env.add_extension(LiquidStandardExtension)
+            enable_profiling(
+                self.env,
+                None if profile is True else profile,  # type: ignore
+            )
 
-        if filters:
-            self.env.filters.update(filters)
+        if compile_stats:
+            from .profiling import enable_compile_stats
 
-        builtin_globals = {
-            "int": int,
-            "float": float,
-            "str": str,
-            "bool": bool
-        }
-        if globals:
-            builtin_globals.update(globals)
-        self.env.globals.update(builtin_globals)
+            enable_compile_stats(
+                self.env,
+                None if compile_stats is True else compile_stats,  # type: ignore
+            )
 
         if from_file:
             # in case template is a PathLike
@@ -195,17 +169,36 @@ class Liquid:
         else:
             self.template = self.env.from_string(str(template))
 
+    @property
+    def profiler(self) -> Optional["Profiler"]:
+        """The profiler of the filters and tags, if profiling is enabled"""
+        return getattr(self.env, "profiler", None)
+
     def render(self, *args, **kwargs) -> Any:
         """Render the template.
 
         You can either pass the values using `tpl.render(a=1)` or
         `tpl.render({'a': 1})`
         """
-        return self.template.render(*args, **kwargs)
+        with render_scope(self.env):
+            return self.template.render(*args, **kwargs)
 
     async def render_async(self, *args, **kwargs) -> Any:
         """Asynchronously render the template"""
-        return await self.template.render_async(*args, **kwargs)
+        with render_scope(self.env):
+            return await self.template.render_async(*args, **kwargs)
+
+    def memory_report(self) -> Dict[str, int]:
+        """Estimate the memory retained by this object, by its components
+
+        See `liquid.memory.memory_report()`.
+
+        Returns:
+            The sizes in bytes of the components and the `total`
+        """
+        from .memory import memory_report
+
+        return memory_report(self)
 
     @classmethod
     def from_env(
@@ -0,0 +1,136 @@
+"""Provides the accounting of the memory retained by the Liquid objects
+
+The sizes are estimated by `sys.getsizeof()`, following the references of
+the objects owned by a `Liquid` object. The objects shared with the others,
+i.e. the functions of the filters, the modules and the classes, are not
+counted, nor are the environments other than the one of the `Liquid` object.
+"""
+import sys
+from types import CodeType, FunctionType, MethodType, ModuleType
+from typing import TYPE_CHECKING, Any, Dict, Set
+
+from jinja2 import Environment
+
+from .layers import Layers
+
+if TYPE_CHECKING:
+    from .liquid import Liquid
+
+# Shared by everyone
+_SINGLETONS = (None, True, False, Ellipsis, NotImplemented)
+
+
+def deep_sizeof(obj: Any, seen: Set[int]) -> int:
+    """Estimate the size of an object and the objects it refers to
+
+    The functions are only counted if they are compiled from templates.
+
+    Args:
+        obj: The object
+        seen: The ids of the objects that are counted already, or not to be
+            counted. The ids of the counted objects are added to it.
+
+    Returns:
+        The size in bytes
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if (
+            id(obj) in seen
+            or any(obj is singleton for singleton in _SINGLETONS)
+            or isinstance(obj, (type, ModuleType, Environment))
+        ):
+            continue
+
+        if isinstance(obj, FunctionType):
+            if "__jinja_template__" not in obj.__globals__:
+                continue
+            stack.extend((obj.__code__, obj.__defaults__, obj.__kwdefaults__))
+        elif isinstance(obj, CodeType):
+            stack.append(obj.co_consts)
+        elif isinstance(obj, MethodType):
+            stack.extend((obj.__self__, obj.__func__))
+        elif callable(obj) and not hasattr(obj, "__dict__"):
+            # builtin functions and methods
+            continue
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, complex)):
+            stack.extend(_referents(obj))
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+    return size
+
+
+def _referents(obj: Any) -> list:
+    """Get the attributes of an object, from its `__dict__` and slots"""
+    out = []
+    attrs = getattr(obj, "__dict__", None)
+    if attrs is not None:
+        out.append(attrs)
+    for cls in type(obj).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            try:
+                out.append(getattr(obj, slot))
+            except AttributeError:
+                continue
+    return out
+
+
+def _registry_sizeof(mapping: Any) -> int:
+    """Estimate the size of a registry of the filters, tests or globals
+
+    For the `Layers`, only the chain and its top layer are owned by the
+    environment, and the lower layers are shared.
+    """
+    if not isinstance(mapping, Layers):
+        return sys.getsizeof(mapping)
+    return (
+        sys.getsizeof(mapping)
+        + sys.getsizeof(mapping.maps)
+        + sys.getsizeof(mapping.maps[0])
+    )
+
+
+def memory_report(liq: "Liquid") -> Dict[str, int]:
+    """Estimate the memory retained by a Liquid object, by its components
+
+    The components are counted in order, and the objects reachable from
+    more than one of them are counted in the first one. Only the dicts of
+    the filters, tests and globals are counted, as the values are shared,
+    and so are their lower layers (see `liquid.layers`).
+
+    Args:
+        liq: The Liquid object
+
+    Returns:
+        The sizes in bytes of `template` (the compiled template), `filters`,
+        `tests`, `globals`, `extensions`, `loader`, `caches` (the caches of
+        the templates and the expressions), `environment` (the rest of the
+        environment) and `liquid` (the Liquid object itself), and the
+        `total`
+    """
+    env = liq.env
+    seen = {id(env), id(env.filters), id(env.tests), id(env.globals)}
+    out = {
+        "template": deep_sizeof(liq.template, seen),
+        "filters": _registry_sizeof(env.filters),
+        "tests": _registry_sizeof(env.tests),
+        "globals": _registry_sizeof(env.globals),
+        "extensions": deep_sizeof(env.extensions, seen),
+        "loader": deep_sizeof(env.loader, seen),
+        "caches": deep_sizeof(
+            [env.cache, getattr(env, "expression_cache", None)],
+            seen,
+        ),
+    }
+    out["environment"] = sys.getsizeof(env) + deep_sizeof(env.__dict__, seen)
+    out["liquid"] = sys.getsizeof(liq)
+    out["total"] = sum(out.values())
+    return out
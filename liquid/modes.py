@@ -0,0 +1,239 @@
+"""Provides the bundles of the modes
+
+A bundle describes what a mode adds to an environment: the extensions, the
+layers of the filters and the globals, and the impure filters. The bundles
+are built once per process when they are first used, so that constructing a
+`Liquid` object only adds the shared layers to its environment.
+"""
+import builtins
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Tuple,
+    Type,
+    Union,
+)
+
+from .filters.manager import FilterManager
+from .filters.standard import standard_filter_manager
+from .layers import freeze
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+    from jinja2.ext import Extension
+
+MODES = ("standard", "jekyll", "shopify", "wild")
+
+# The builtins that have side effects or depend on the states, which should
+# not be evaluated when compiling the templates in wild mode
+IMPURE_BUILTINS = (
+    "aiter",
+    "anext",
+    "breakpoint",
+    "compile",
+    "delattr",
+    "dir",
+    "eval",
+    "exec",
+    "exit",
+    "id",
+    "iter",
+    "next",
+    "open",
+    "print",
+    "quit",
+    "setattr",
+    "vars",
+)
+
+# The builtins not to be used as filters in wild mode
+EXCLUDED_BUILTIN_FILTERS = (
+    "copyright",
+    "credits",
+    "input",
+    "help",
+    "globals",
+    "license",
+    "locals",
+    "memoryview",
+    "object",
+    "property",
+    "staticmethod",
+    "super",
+)
+
+
+class ModeBundle:
+    """What a mode adds to an environment, shared by the environments
+
+    The attributes are immutable, and the layers are read-only.
+
+    Attributes:
+        mode: The name of the mode
+        extensions: The extensions, in the order to be added
+        filters: The layers of the filters, in the order to be added, each
+            overriding the previous ones. A `FilterManager` is added by
+            `FilterManager.update_to_env()`, so that it takes the filters
+            registered after the bundle is built.
+        impure_filters: The impure filters of the layers that are not
+            filter managers
+        globals: The layers of the globals
+        filter_globals: The filter managers whose filters are also used as
+            globals, if `filters_as_globals` is True
+    """
+
+    __slots__ = (
+        "mode",
+        "extensions",
+        "filters",
+        "impure_filters",
+        "globals",
+        "filter_globals",
+    )
+
+    def __init__(
+        self,
+        mode: str,
+        extensions: Tuple[Union[str, Type["Extension"]], ...],
+        filters: Tuple[Union[FilterManager, Mapping[str, Callable]], ...],
+        impure_filters: frozenset = frozenset(),
+        globals: Tuple[Mapping[str, Any], ...] = (),
+        filter_globals: Tuple[FilterManager, ...] = (),
+    ) -> None:
+        """Constructor"""
+        self.mode = mode
+        self.extensions = extensions
+        self.filters = filters
+        self.impure_filters = impure_filters
+        self.globals = globals
+        self.filter_globals = filter_globals
+
+    def apply(
+        self,
+        env: "Environment",
+        filters_as_globals: bool = False,
+    ) -> None:
+        """Add the extensions, filters and globals to an environment
+
+        Args:
+            env: The environment, with layered filters and globals
+                (see `LiquidEnvironment`)
+            filters_as_globals: Whether to also use the filters of the filter
+                managers in `filter_globals` as globals
+        """
+        for layer in self.filters:
+            if isinstance(layer, FilterManager):
+                layer.update_to_env(env)
+            else:
+                env.filters.add_layer(layer)
+        env.impure_filters.update(self.impure_filters)
+
+        for layer in self.globals:
+            env.globals.add_layer(layer)
+        if filters_as_globals:
+            for manager in self.filter_globals:
+                env.globals.add_layer(manager.layer(memoize=False))
+
+        for extension in self.extensions:
+            env.add_extension(extension)
+
+
+def _builtin_filters() -> Mapping[str, Callable]:
+    """The builtins used as filters in wild mode"""
+    return freeze(
+        {
+            key: getattr(builtins, key)
+            for key in dir(builtins)
+            if not key.startswith("_")
+            and callable(getattr(builtins, key))
+            and key not in EXCLUDED_BUILTIN_FILTERS
+            and not any(key_c.isupper() for key_c in key)
+        }
+    )
+
+
+def _build(mode: str) -> ModeBundle:
+    """Build the bundle of a mode"""
+    if mode == "wild":
+        from .exts.wild import LiquidWildExtension
+        from .filters.wild import wild_filter_manager
+
+        bfilters = _builtin_filters()
+        return ModeBundle(
+            mode,
+            ("jinja2.ext.debug", LiquidWildExtension),
+            (standard_filter_manager, bfilters, wild_filter_manager),
+            # i.e. `{{ "x" | print }}` should not print when compiling
+            frozenset(
+                bfilters[key] for key in IMPURE_BUILTINS if key in bfilters
+            ),
+            (
+                freeze(
+                    {
+                        key: val
+                        for key, val in vars(builtins).items()
+                        if not key.startswith("_")
+                    }
+                ),
+            ),
+            (standard_filter_manager, wild_filter_manager),
+        )
+
+    if mode == "jekyll":
+        from .exts.front_matter import FrontMatterExtension
+        from .exts.jekyll import LiquidJekyllExtension
+        from .filters.jekyll import jekyll_filter_manager
+
+        return ModeBundle(
+            mode,
+            (FrontMatterExtension, LiquidJekyllExtension),
+            (standard_filter_manager, jekyll_filter_manager),
+        )
+
+    if mode == "shopify":
+        from .exts.shopify import LiquidShopifyExtension
+        from .filters.shopify import shopify_filter_manager
+
+        return ModeBundle(
+            mode,
+            (LiquidShopifyExtension,),
+            (standard_filter_manager, shopify_filter_manager),
+        )
+
+    from .exts.standard import LiquidStandardExtension
+
+    return ModeBundle(
+        mode,
+        (LiquidStandardExtension,),
+        (standard_filter_manager,),
+    )
+
+
+_BUNDLES: Dict[str, ModeBundle] = {}
+_BUNDLES_LOCK = threading.Lock()
+
+
+def mode_bundle(mode: str) -> ModeBundle:
+    """Get the bundle of a mode, built when it is first used
+
+    Args:
+        mode: The mode, any mode other than jekyll, shopify and wild is
+            treated as standard
+
+    Returns:
+        The bundle of the mode
+    """
+    if mode not in MODES:
+        mode = "standard"
+
+    bundle = _BUNDLES.get(mode)
+    if bundle is None:
+        with _BUNDLES_LOCK:
+            bundle = _BUNDLES.get(mode)
+            if bundle is None:
+                bundle = _BUNDLES[mode] = _build(mode)
+    return bundle
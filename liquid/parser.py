@@ -0,0 +1,229 @@
+"""Provides the parser and the code generator of the liquid environments
+
+They implement the syntax that can't be implemented by extensions, without
+changing jinja's `Parser` and `CodeGenerator` for the other environments:
+
+1. `elsif` in addition to `elif` for the `if` tag
+2. The arguments `offset`, `limit` and `reversed` for the `for` tag
+3. `rindex`, `rindex0` and the named cycles (`liquid_cycle`) for `forloop`
+
+The code generator also supports python's `try ... finally` statement for
+the nodes (see `try_finally()`), as jinja doesn't allow custom nodes.
+"""
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type
+
+from jinja2 import nodes
+from jinja2.compiler import CodeGenerator, Frame
+from jinja2.parser import Parser
+
+from .profiling import compile_record
+from .utils import parse_tag_args
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+# The arguments of the for tag
+FOR_ARGS = ("name:reversed", "name:limit", "name:offset")
+
+
+class LiquidParser(Parser):
+    """The parser with the liquid-specific syntax of the `if` and `for` tags
+
+    When compiling with the statistics enabled (see
+    `profiling.enable_compile_stats()`), the `if` and `for` tags are timed
+    as the phases `parse_if` and `parse_for`.
+    """
+
+    def __init__(
+        self,
+        environment: "Environment",
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        """Constructor"""
+        super().__init__(environment, *args, **kwargs)
+        self.compile_record = compile_record(environment)
+
+    def parse_if(self) -> nodes.If:
+        """Parse the `if` tag, timed if compiling with the statistics"""
+        if self.compile_record is None:
+            return self._parse_if()
+        with self.compile_record.phase("parse_if"):
+            return self._parse_if()
+
+    def parse_for(self) -> nodes.For:
+        """Parse the `for` tag, timed if compiling with the statistics"""
+        if self.compile_record is None:
+            return self._parse_for()
+        with self.compile_record.phase("parse_for"):
+            return self._parse_for()
+
+    def _parse_if(self) -> nodes.If:
+        """Parse the `if` tag, allowing `elsif` in addition to `elif`"""
+        node = result = nodes.If(lineno=self.stream.expect("name:if").lineno)
+        while True:
+            node.test = self.parse_tuple(with_condexpr=False)
+            node.body = self.parse_statements(
+                ("name:elif", "name:elsif", "name:else", "name:endif")
+            )
+            node.elif_ = []
+            node.else_ = []
+            token = next(self.stream)
+            if token.test_any("name:elif", "name:elsif"):
+                node = nodes.If(lineno=self.stream.current.lineno)
+                result.elif_.append(node)
+                continue
+            elif token.test("name:else"):
+                result.else_ = self.parse_statements(
+                    ("name:endif",), drop_needle=True
+                )
+            break
+        return result
+
+    def _parse_for(self) -> nodes.For:
+        """Parse the `for` tag, allowing the arguments `reversed`,
+        `limit: n` and `offset: n` after the iterable, in any order
+
+        The arguments are applied by a single call of `runtime.loop_iter()`,
+        instead of a slice and a filter.
+        """
+        lineno = self.stream.expect("name:for").lineno
+        target = self.parse_assign_target(extra_end_rules=("name:in",))
+        self.stream.expect("name:in")
+        iter = self.parse_tuple(
+            with_condexpr=False,
+            extra_end_rules=("name:recursive",) + FOR_ARGS,
+        )
+
+        reverse = False
+        args: Dict[str, Optional[nodes.Expr]] = {"offset": None, "limit": None}
+        while self.stream.current.test_any(*FOR_ARGS):
+            if self.stream.skip_if("name:reversed"):
+                reverse = True
+            else:
+                name = self.stream.current.value
+                args[name] = parse_tag_args(self.stream, name, lineno)
+
+        if reverse or args["offset"] or args["limit"]:
+            iter = nodes.Call(
+                nodes.ImportedName("liquid.runtime.loop_iter"),
+                [
+                    nodes.EnvironmentAttribute("getitem"),
+                    iter,
+                    args["offset"] or nodes.Const(None),
+                    args["limit"] or nodes.Const(None),
+                    nodes.Const(reverse),
+                ],
+                [],
+                None,
+                None,
+                lineno=lineno,
+            )
+
+        test = None
+        if self.stream.skip_if("name:if"):
+            test = self.parse_expression()
+        recursive = self.stream.skip_if("name:recursive")
+        body = self.parse_statements(("name:endfor", "name:else"))
+        if next(self.stream).value == "endfor":
+            else_ = []
+        else:
+            else_ = self.parse_statements(("name:endfor",), drop_needle=True)
+        return nodes.For(
+            target, iter, body, else_, test, recursive, lineno=lineno
+        )
+
+
+def try_finally(
+    body: List[nodes.Node],
+    final: nodes.ExprStmt,
+    lineno: int,
+) -> List[nodes.Node]:
+    """Get the nodes that run `final` even when running the `body` is
+    broken, i.e. by exceptions, `break` and `continue`
+
+    Only supported by `LiquidCodeGenerator`, otherwise `final` is only run
+    when the `body` finishes.
+
+    Args:
+        body: The nodes
+        final: The statement to run after the nodes
+        lineno: The line number
+
+    Returns:
+        The nodes, to be used in the place of the `body`
+    """
+    start = nodes.ExprStmt(nodes.Const(None), lineno=lineno)
+    start.liquid_block = "try"  # type: ignore[attr-defined]
+    final.liquid_block = "finally"  # type: ignore[attr-defined]
+    return [start, *body, final]
+
+
+class LiquidCodeGenerator(CodeGenerator):
+    """The code generator that uses the loop contexts of liquid
+    (`runtime.LiquidLoopContext` and `runtime.LiquidAsyncLoopContext`), and
+    supports `try_finally()`"""
+
+    def writeline(
+        self,
+        x: str,
+        node: Optional[nodes.Node] = None,
+        extra: int = 0,
+    ) -> None:
+        """Write a line, where the loop contexts imported from jinja at the
+        top of the module are replaced with the ones of liquid"""
+        super().writeline(x, node, extra)
+        if x.startswith("from jinja2.runtime import "):
+            loop_contexts = "LiquidLoopContext as LoopContext"
+            if self.environment.is_async:
+                loop_contexts += ", LiquidAsyncLoopContext as AsyncLoopContext"
+            super().writeline(f"from liquid.runtime import {loop_contexts}")
+
+    def visit_ExprStmt(self, node: nodes.ExprStmt, frame: Frame) -> None:
+        """Write a statement, or a clause of `try ... finally` for the
+        statements marked by `try_finally()`"""
+        block = getattr(node, "liquid_block", None)
+        if block == "try":
+            self.writeline("try:", node)
+            self.indent()
+            # in case the body writes nothing
+            self.writeline("pass")
+        elif block == "finally":
+            self.outdent()
+            self.writeline("finally:")
+            self.indent()
+            super().visit_ExprStmt(node, frame)
+            self.outdent()
+        else:
+            super().visit_ExprStmt(node, frame)
+
+
+_liquid_code_generators: Dict[type, Type[CodeGenerator]] = {}
+
+
+def liquid_code_generator_class(cls: Type[Any]) -> Type[CodeGenerator]:
+    """Get the class that combines LiquidCodeGenerator and the code
+    generator class of a jinja environment (i.e. `NativeCodeGenerator`)
+
+    Args:
+        cls: The code generator class
+
+    Returns:
+        The combined class
+    """
+    if issubclass(cls, LiquidCodeGenerator):
+        return cls
+    if cls is CodeGenerator:
+        return LiquidCodeGenerator
+
+    try:
+        return _liquid_code_generators[cls]
+    except KeyError:
+        pass
+
+    out = _liquid_code_generators[cls] = type(
+        f"Liquid{cls.__name__}",
+        (LiquidCodeGenerator, cls),
+        {"__module__": __name__},
+    )
+    return out
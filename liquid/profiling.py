@@ -0,0 +1,927 @@
+"""Provides the profiler for the filters and tags
+
+When profiling is enabled for an environment (see `enable_profiling()`, or
+`Liquid(..., profile=True)`), the filters of the environment are wrapped to
+record their calls when they are looked up, and the tags registered by the
+tag managers in the templates compiled afterwards record their rendering.
+Nothing is wrapped or recorded when it is disabled.
+
+Examples:
+    >>> tpl = Liquid("...", profile=True)
+    >>> tpl.render(...)
+    >>> tpl.profiler.report()
+    >>> print(tpl.profiler.prometheus())
+
+The `LineProfiler` attributes the time and the output of the renders to the
+lines of the templates instead.
+
+The `CompileStats` records the time of the phases and the sizes of the
+compiled templates (see `enable_compile_stats()`, or
+`Liquid(..., compile_stats=True)`).
+
+Examples:
+    >>> with LineProfiler() as prof:
+    >>>     tpl.render(...)
+    >>> print(prof.table())
+    >>> prof.dump_folded("render.folded")
+"""
+import sys
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from jinja2 import nodes
+
+from .layers import Layers
+from .runtime import current_render
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+# The upper bounds of the buckets for the sizes of the filtered values
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, float("inf"))
+
+
+class CallStats:
+    """The statistics of the calls to a filter or a tag
+
+    Attributes:
+        calls: The number of calls
+        total: The cumulative time, in seconds
+        self_time: The time excluding the filters and tags called inside,
+            in seconds
+        sizes: The numbers of calls by the size (`len()`) of the filtered
+            values, for each bucket in `SIZE_BUCKETS`
+        size_total: The sum of the sizes
+    """
+
+    __slots__ = ("calls", "total", "self_time", "sizes", "size_total")
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.calls = 0
+        self.total = 0.0
+        self.self_time = 0.0
+        self.sizes = [0] * len(SIZE_BUCKETS)
+        self.size_total = 0
+
+    def add(self, elapsed: float, self_time: float, size: int = None) -> None:
+        """Record a call
+
+        Args:
+            elapsed: The time of the call
+            self_time: The self time of the call
+            size: The size of the filtered value, if any
+        """
+        self.calls += 1
+        self.total += elapsed
+        self.self_time += self_time
+        if size is not None:
+            self.size_total += size
+            for i, bound in enumerate(SIZE_BUCKETS):  # pragma: no branch
+                if size <= bound:
+                    self.sizes[i] += 1
+                    break
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the statistics as a dict"""
+        return {
+            "calls": self.calls,
+            "total": self.total,
+            "self": self.self_time,
+            "sizes": {
+                f"<={bound:g}": count
+                for bound, count in zip(SIZE_BUCKETS, self.sizes)
+                if count
+            },
+        }
+
+
+class Profiler:
+    """The profiler of the filters and tags
+
+    A profiler can be shared by multiple environments.
+
+    Attributes:
+        stats: The statistics by the kind (`filter` or `tag`) and the names
+    """
+
+    __slots__ = ("stats", "_local", "_lock")
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.stats: Dict[str, Dict[str, CallStats]] = {"filter": {}, "tag": {}}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[List[float]]:
+        """Get the stack of the calls in progress, with their start times
+        and the times of the calls inside them, for the current thread and
+        render"""
+        local = self._local
+        state = current_render()
+        render_id = state and state.id
+        if getattr(local, "render_id", -1) != render_id:
+            # a new render, discarding the calls that were broken (i.e. by
+            # exceptions) in the previous one
+            local.render_id = render_id
+            local.stack = []
+        return local.stack
+
+    def enter(self) -> None:
+        """Start a call"""
+        self._stack().append([perf_counter(), 0.0])
+
+    def exit(self, kind: str, name: str, size: int = None) -> None:
+        """Finish a call and record it
+
+        Args:
+            kind: The kind, `filter` or `tag`
+            name: The name of the filter or tag
+            size: The size of the filtered value, if any
+        """
+        end = perf_counter()
+        stack = self._stack()
+        if not stack:  # pragma: no cover, discarded
+            return
+
+        start, children = stack.pop()
+        elapsed = end - start
+        if stack:
+            stack[-1][1] += elapsed
+
+        with self._lock:
+            stats = self.stats[kind].get(name)
+            if stats is None:
+                stats = self.stats[kind][name] = CallStats()
+            stats.add(elapsed, elapsed - children, size)
+
+    def wrap_filter(self, name: str, filterfunc: Callable) -> Callable:
+        """Wrap a filter to record its calls
+
+        Args:
+            name: The name of the filter
+            filterfunc: The filter
+
+        Returns:
+            The wrapped filter
+        """
+        # the value is after the environment/context if passed
+        value_index = 1 if hasattr(filterfunc, "jinja_pass_arg") else 0
+
+        @wraps(filterfunc)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            self.enter()
+            try:
+                return filterfunc(*args, **kwargs)
+            finally:
+                try:
+                    size = len(args[value_index])
+                except (TypeError, IndexError):
+                    size = None
+                self.exit("filter", name, size)
+
+        wrapper.liquid_profiled = True  # type: ignore
+        return wrapper
+
+    def reset(self) -> None:
+        """Discard the statistics"""
+        with self._lock:
+            self.stats = {"filter": {}, "tag": {}}
+
+    def report(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get the statistics as a structured report
+
+        Returns:
+            The statistics of the filters and tags (`filters` and `tags`),
+            ordered by the cumulative time, by their names
+        """
+        out = {}
+        for kind, stats in self.stats.items():
+            out[f"{kind}s"] = {
+                name: stat.to_dict()
+                for name, stat in sorted(
+                    stats.items(),
+                    key=lambda item: item[1].total,
+                    reverse=True,
+                )
+            }
+        return out
+
+    def prometheus(self, prefix: str = "liquid") -> str:
+        """Dump the statistics in the Prometheus text format
+
+        Args:
+            prefix: The prefix of the metric names
+
+        Returns:
+            The text of the metrics
+        """
+        counters = (
+            ("calls_total", "calls", "The number of calls"),
+            ("seconds_total", "total", "The cumulative time of the calls"),
+            (
+                "self_seconds_total",
+                "self_time",
+                "The time of the calls, excluding the calls inside",
+            ),
+        )
+        lines = []
+        for metric, attr, helptext in counters:
+            lines.append(f"# HELP {prefix}_{metric} {helptext}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for kind, name, stats in self._iter_stats():
+                lines.append(
+                    f'{prefix}_{metric}{{kind="{kind}",name="{name}"}} '
+                    f"{getattr(stats, attr)}"
+                )
+
+        metric = f"{prefix}_value_size"
+        lines.append(f"# HELP {metric} The sizes of the filtered values")
+        lines.append(f"# TYPE {metric} histogram")
+        for kind, name, stats in self._iter_stats():
+            if not any(stats.sizes):
+                continue
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, count in zip(SIZE_BUCKETS, stats.sizes):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(
+                    f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}'
+                )
+            lines.append(f"{metric}_sum{{{labels}}} {stats.size_total}")
+            lines.append(f"{metric}_count{{{labels}}} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+    def _iter_stats(self) -> Iterator[Tuple[str, str, CallStats]]:
+        """Iterate over the kinds, names and statistics"""
+        for kind, stats in self.stats.items():
+            for name, stat in sorted(stats.items()):
+                yield kind, name, stat
+
+
+class ProfiledFilters(Layers):
+    """The layers of the filters, where the filters are wrapped to record
+    their calls when they are looked up, so that the filters added after
+    profiling is enabled (i.e. by the `addfilter` tag) are also recorded
+
+    The wrapped filters are cached by the names, until the filters change.
+
+    Attributes:
+        profiler: The profiler
+    """
+
+    def __init__(self, *maps: Any, profiler: Profiler = None) -> None:
+        """Constructor
+
+        Args:
+            *maps: The layers
+            profiler: The profiler
+        """
+        super().__init__(*maps)
+        self.profiler = profiler
+        self._wrapped: Dict[str, Tuple[Callable, Callable]] = {}
+
+    def _wrap(self, name: str, filterfunc: Callable) -> Callable:
+        """Get the wrapped filter"""
+        if getattr(filterfunc, "liquid_profiled", False):
+            return filterfunc
+
+        cached = self._wrapped.get(name)
+        if cached is not None and cached[0] is filterfunc:
+            return cached[1]
+
+        wrapped = self.profiler.wrap_filter(  # type: ignore[union-attr]
+            name, filterfunc
+        )
+        self._wrapped[name] = (filterfunc, wrapped)
+        return wrapped
+
+    def __getitem__(self, key: Any) -> Any:
+        """Get the wrapped filter"""
+        return self._wrap(key, super().__getitem__(key))
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get the wrapped filter, or the default"""
+        filterfunc = super().get(key, self)
+        return default if filterfunc is self else self._wrap(key, filterfunc)
+
+    def new_child(  # type: ignore[override]
+        self,
+        m: Any = None,
+    ) -> "ProfiledFilters":
+        """Get new layers with a new top layer, i.e. for the overlays"""
+        return self.__class__(
+            {} if m is None else m,
+            *self.maps,
+            profiler=self.profiler,
+        )
+
+
+def enable_profiling(
+    env: "Environment",
+    profiler: Optional[Profiler] = None,
+) -> Profiler:
+    """Enable profiling for an environment
+
+    The filters are wrapped when they are looked up (see `ProfiledFilters`),
+    including the ones added later. The tags are recorded for the templates
+    compiled after this.
+
+    Args:
+        env: The environment
+        profiler: The profiler, a new one is created if not given
+
+    Returns:
+        The profiler
+    """
+    if profiler is None:
+        profiler = getattr(env, "profiler", None) or Profiler()
+
+    filters = env.filters
+    if isinstance(filters, ProfiledFilters):
+        if filters.profiler is not profiler:
+            env.filters = ProfiledFilters(*filters.maps, profiler=profiler)
+    elif isinstance(filters, Layers):
+        env.filters = ProfiledFilters(*filters.maps, profiler=profiler)
+    else:
+        env.filters = ProfiledFilters(filters, profiler=profiler)
+
+    env.profiler = profiler  # type: ignore
+    return profiler
+
+
+def tag_enter() -> None:
+    """Start rendering a tag, called by the instrumented templates"""
+    state = current_render()
+    profiler = state and getattr(state.env, "profiler", None)
+    if profiler is not None:
+        profiler.enter()
+
+
+def tag_exit(name: str) -> None:
+    """Finish rendering a tag, called by the instrumented templates
+
+    Args:
+        name: The name of the tag
+    """
+    state = current_render()
+    profiler = state and getattr(state.env, "profiler", None)
+    if profiler is not None:
+        profiler.exit("tag", name)
+
+
+def instrument_tag(name: str, node: Any, lineno: int) -> List[nodes.Node]:
+    """Instrument the nodes of a tag to record the rendering
+
+    The rendering is recorded even when it is broken, i.e. by exceptions,
+    `break` and `continue` (see `parser.try_finally()`).
+
+    Args:
+        name: The name of the tag
+        node: The node or nodes parsed from the tag
+        lineno: The line number of the tag
+
+    Returns:
+        The instrumented nodes
+    """
+    from .parser import try_finally
+
+    if not isinstance(node, list):
+        node = [node]
+
+    def call(func: str, *args: Any) -> nodes.ExprStmt:
+        return nodes.ExprStmt(
+            nodes.Call(
+                nodes.ImportedName(f"{__name__}.{func}"),
+                [nodes.Const(arg) for arg in args],
+                [],
+                None,
+                None,
+            ),
+            lineno=lineno,
+        )
+
+    return [
+        call("tag_enter"),
+        *try_finally(node, call("tag_exit", name), lineno),
+    ]
+
+
+# A location in the templates, the name of the template and the line number
+Location = Tuple[str, int]
+
+
+class LineProfiler:
+    """The profiler of the lines of the templates
+
+    While it is active (as a context manager), the renders in the current
+    thread are traced, and the wall time and the size of the output (in
+    bytes, UTF-8 encoded) are attributed to the lines of the templates,
+    by the stacks of the lines of the including templates, blocks and
+    macros. The line numbers are mapped back from the generated python code
+    by the debug info of the templates.
+
+    The time spent in the filters and other python functions is attributed
+    to the line calling them.
+
+    Note that `sys.settrace()` is used, so that other tracers (i.e. a
+    debugger or coverage) are suspended while profiling, and the renders are
+    several times slower.
+
+    Attributes:
+        times: The self time, in seconds, by the stacks of the locations
+        outputs: The bytes of the output, by the stacks of the locations
+    """
+
+    __slots__ = (
+        "times",
+        "outputs",
+        "_linenos",
+        "_parents",
+        "_last_key",
+        "_last_time",
+        "_last_output",
+        "_prev_trace",
+    )
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.times: Dict[Tuple[Location, ...], float] = {}
+        self.outputs: Dict[Tuple[Location, ...], int] = {}
+        # (template, python line number) => location
+        self._linenos: Dict[Tuple[Any, int], Location] = {}
+        # frame => the stack of the locations of the template frames above
+        self._parents: Dict[Any, Tuple[Location, ...]] = {}
+        self._last_key: Optional[Tuple[Location, ...]] = None
+        self._last_time = 0.0
+        # the last yielded output and the frame consuming it
+        self._last_output: Tuple[Any, Any] = (None, None)
+        self._prev_trace: Any = None
+
+    def __enter__(self) -> "LineProfiler":
+        """Start tracing the current thread"""
+        self._prev_trace = sys.gettrace()
+        self._last_key = None
+        sys.settrace(self._trace)
+        return self
+
+    # This and the tracing functions run under sys.settrace(), where coverage
+    # can't see them
+    def __exit__(self, *exc_info: Any) -> None:  # pragma: no cover
+        """Stop tracing the current thread"""
+        sys.settrace(self._prev_trace)
+        self._prev_trace = None
+        self._parents.clear()
+        self._last_key = None
+        self._last_output = (None, None)
+
+    def _trace(self, frame: Any, event: str, arg: Any) -> Any:  # pragma: no cover
+        """The global trace function, tracing the frames of templates"""
+        if "__jinja_template__" not in frame.f_globals:
+            return None
+        self._event(frame, event, arg)
+        return self._trace_frame
+
+    def _trace_frame(  # pragma: no cover
+        self,
+        frame: Any,
+        event: str,
+        arg: Any,
+    ) -> Any:
+        """The local trace function of the frames of templates"""
+        self._event(frame, event, arg)
+        return self._trace_frame
+
+    def _event(self, frame: Any, event: str, arg: Any) -> None:  # pragma: no cover
+        """Handle an event of a template frame
+
+        The time since the last event is charged to the stack of the
+        locations then.
+        """
+        now = perf_counter()
+        key = self._last_key
+        if key is not None:
+            self.times[key] = self.times.get(key, 0.0) + now - self._last_time
+
+        if event == "call":
+            # also the resuming of generators, whose callers may change
+            self._parents[frame] = parents = self._stack(frame.f_back)
+            key = parents + (self._location(frame),)
+        elif event == "return":
+            parents = self._parents.pop(frame, ())
+            last_output, last_consumer = self._last_output
+            # a yielded output, unless passed through from the frame it
+            # consumes (i.e. of an included template)
+            if isinstance(arg, str) and (
+                arg is not last_output or frame is not last_consumer
+            ):
+                here = parents + (self._location(frame),)
+                self.outputs[here] = self.outputs.get(here, 0) + len(
+                    arg.encode("utf-8")
+                )
+            self._last_output = (arg, frame.f_back)
+            key = parents or None
+        else:
+            key = self._parents.get(frame, ()) + (self._location(frame),)
+
+        self._last_key = key
+        # not to charge the time of the profiler itself
+        self._last_time = perf_counter()
+
+    def _stack(self, frame: Any) -> Tuple[Location, ...]:  # pragma: no cover
+        """Get the stack of the locations of the template frames from a
+        frame up"""
+        out = []
+        while frame is not None:
+            if "__jinja_template__" in frame.f_globals:
+                out.append(self._location(frame))
+            frame = frame.f_back
+        return tuple(reversed(out))
+
+    def _location(self, frame: Any) -> Location:  # pragma: no cover
+        """Get the location in the template of a template frame"""
+        template = frame.f_globals["__jinja_template__"]
+        key = (template, frame.f_lineno)
+        try:
+            return self._linenos[key]
+        except KeyError:
+            pass
+        # get_corresponding_lineno() scans the debug info
+        out = self._linenos[key] = (
+            template.name or "<template>",
+            template.get_corresponding_lineno(frame.f_lineno),
+        )
+        return out
+
+    def lines(self) -> List[Dict[str, Any]]:
+        """Get the statistics of the lines
+
+        Returns:
+            The statistics, ordered by the self time, with the `template`,
+            the `line`, the `self` time, the `total` time (including the
+            lines below it in the stacks) and the bytes of the `output`
+            of each line
+        """
+        stats: Dict[Location, List[Union[float, int]]] = {}
+        for key in set(self.times) | set(self.outputs):
+            row = stats.setdefault(key[-1], [0.0, 0.0, 0])
+            row[0] += self.times.get(key, 0.0)
+            row[2] += self.outputs.get(key, 0)
+            # recursive ones (i.e. a macro calling itself) counted once
+            for location in set(key):
+                stats.setdefault(location, [0.0, 0.0, 0])[1] += self.times.get(
+                    key, 0.0
+                )
+
+        out = [
+            {
+                "template": template,
+                "line": line,
+                "self": row[0],
+                "total": row[1],
+                "output": row[2],
+            }
+            for (template, line), row in stats.items()
+        ]
+        out.sort(key=lambda row: (-row["self"], row["template"], row["line"]))
+        return out
+
+    def templates(self) -> Dict[str, Dict[str, Any]]:
+        """Get the statistics of the templates
+
+        Returns:
+            The `self` time, the `total` time (including the templates
+            included) and the bytes of the `output` of each template, by
+            their names, ordered by the total time
+        """
+        stats: Dict[str, Dict[str, Any]] = {}
+        for key in set(self.times) | set(self.outputs):
+            elapsed = self.times.get(key, 0.0)
+            name = key[-1][0]
+            row = stats.setdefault(name, {"self": 0.0, "total": 0.0, "output": 0})
+            row["self"] += elapsed
+            row["output"] += self.outputs.get(key, 0)
+            for template in {location[0] for location in key}:
+                stats.setdefault(
+                    template,
+                    {"self": 0.0, "total": 0.0, "output": 0},
+                )["total"] += elapsed
+
+        return dict(
+            sorted(stats.items(), key=lambda item: item[1]["total"], reverse=True)
+        )
+
+    def table(self, limit: int = None) -> str:
+        """Format the statistics of the lines and templates as a text table
+
+        Args:
+            limit: The max number of lines to show, all if not given
+
+        Returns:
+            The text of the table
+        """
+        header = f"{'Self(ms)':>10} {'Total(ms)':>10} {'Output(B)':>10}  "
+        rows = [header + "Line"]
+        for row in self.lines()[:limit]:
+            rows.append(
+                f"{row['self'] * 1000:>10.3f} {row['total'] * 1000:>10.3f} "
+                f"{row['output']:>10}  {row['template']}:{row['line']}"
+            )
+        rows.append("")
+        rows.append(header + "Template")
+        for name, row in self.templates().items():
+            rows.append(
+                f"{row['self'] * 1000:>10.3f} {row['total'] * 1000:>10.3f} "
+                f"{row['output']:>10}  {name}"
+            )
+        return "\n".join(rows) + "\n"
+
+    def folded(self) -> str:
+        """Format the times in the folded stacks format, for the flame graph
+        tools (i.e. `flamegraph.pl` and speedscope)
+
+        Returns:
+            The lines of the stacks and their self times in microseconds
+        """
+        lines = []
+        for key, elapsed in sorted(self.times.items()):
+            micros = round(elapsed * 1_000_000)
+            if micros:
+                stack = ";".join(f"{name}:{line}" for name, line in key)
+                lines.append(f"{stack} {micros}")
+        return "".join(f"{line}\n" for line in lines)
+
+    def dump_folded(self, path: str) -> None:
+        """Write the folded stacks to a file
+
+        Args:
+            path: The path to the file
+        """
+        with open(path, "w", encoding="utf-8") as fout:
+            fout.write(self.folded())
+
+    def reset(self) -> None:
+        """Discard the statistics"""
+        self.times = {}
+        self.outputs = {}
+
+
+class CompileRecord:
+    """The record of compiling a template
+
+    The phases are exclusive, i.e. the time of tokenizing is not included
+    in `parse`, although the tokens are pulled by the parser. They are:
+    `preprocess:<Extension>` and `filter_stream:<Extension>` for the
+    extensions implementing them, `lex`, `parse`, `parse_if` and
+    `parse_for` (the `if` and `for` tags), `tags` (parsing the tags by the
+    tag managers), `generate` (the python code) and `compile` (the python
+    code to bytecode).
+
+    Attributes:
+        name: The name of the template
+        filename: The filename of the template
+        phases: The time of the phases, in seconds
+        source_size: The size of the source, in bytes
+        preprocessed_size: The size of the source after preprocessing
+        code_size: The size of the generated python code
+        bytecode_size: The size of the marshalled bytecode
+    """
+
+    __slots__ = (
+        "name",
+        "filename",
+        "phases",
+        "source_size",
+        "preprocessed_size",
+        "code_size",
+        "bytecode_size",
+        "total",
+    )
+
+    def __init__(self, name: Optional[str], filename: Optional[str]) -> None:
+        """Constructor"""
+        self.name = name or "<template>"
+        self.filename = filename
+        self.phases: Dict[str, float] = {}
+        self.source_size: Optional[int] = None
+        self.preprocessed_size: Optional[int] = None
+        self.code_size: Optional[int] = None
+        self.bytecode_size: Optional[int] = None
+        self.total = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        """Time a phase, excluding the phases timed inside
+
+        Args:
+            name: The name of the phase
+        """
+        before = self.total
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start - (self.total - before)
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self.total += elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the record as a dict"""
+        return {
+            "name": self.name,
+            "filename": self.filename,
+            "total": self.total,
+            "phases": dict(self.phases),
+            "source_size": self.source_size,
+            "preprocessed_size": self.preprocessed_size,
+            "code_size": self.code_size,
+            "bytecode_size": self.bytecode_size,
+        }
+
+
+class CompileStats:
+    """The statistics of compiling the templates
+
+    A collector can be shared by multiple environments.
+
+    Attributes:
+        records: The records of the compiled templates, in order
+    """
+
+    __slots__ = ("records", "_local", "_lock")
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.records: List[CompileRecord] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[CompileRecord]:
+        """Get the stack of the templates being compiled in the current
+        thread"""
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    def start(
+        self,
+        name: Optional[str],
+        filename: Optional[str],
+    ) -> CompileRecord:
+        """Start compiling a template
+
+        Args:
+            name: The name of the template
+            filename: The filename of the template
+
+        Returns:
+            The record
+        """
+        record = CompileRecord(name, filename)
+        self._stack().append(record)
+        return record
+
+    def finish(self, record: CompileRecord, keep: bool = True) -> None:
+        """Finish compiling a template
+
+        Args:
+            record: The record returned by `start()`
+            keep: Whether to keep the record, False if the compiling failed
+        """
+        self._stack().remove(record)
+        if keep:
+            with self._lock:
+                self.records.append(record)
+
+    def current(self) -> Optional[CompileRecord]:
+        """Get the record of the template being compiled in the current
+        thread, if any"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def reset(self) -> None:
+        """Discard the records"""
+        with self._lock:
+            self.records = []
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Get the records as dicts, ordered by the total time"""
+        return [
+            record.to_dict()
+            for record in sorted(
+                self.records,
+                key=lambda record: record.total,
+                reverse=True,
+            )
+        ]
+
+    def summary(self) -> Dict[str, float]:
+        """Get the total time of the phases of all the templates
+
+        Returns:
+            The time of the phases, in seconds, ordered by the time
+        """
+        out: Dict[str, float] = {}
+        for record in self.records:
+            for phase, elapsed in record.phases.items():
+                out[phase] = out.get(phase, 0.0) + elapsed
+        return dict(sorted(out.items(), key=lambda item: item[1], reverse=True))
+
+    def table(self, limit: int = None) -> str:
+        """Format the statistics of the templates and phases as a text table
+
+        Args:
+            limit: The max number of templates to show, all if not given
+
+        Returns:
+            The text of the table
+        """
+        rows = [
+            f"{'Total(ms)':>10} {'Source(B)':>10} {'Code(B)':>10} "
+            f"{'Bytecode(B)':>12}  {'Slowest phase':<24}  Template"
+        ]
+        for record in sorted(
+            self.records,
+            key=lambda record: record.total,
+            reverse=True,
+        )[:limit]:
+            slowest = max(
+                record.phases,
+                key=record.phases.__getitem__,
+                default="",
+            )
+            rows.append(
+                f"{record.total * 1000:>10.3f} "
+                f"{_size(record.source_size):>10} "
+                f"{_size(record.code_size):>10} "
+                f"{_size(record.bytecode_size):>12}  "
+                f"{slowest:<24}  {record.name}"
+            )
+
+        summary = self.summary()
+        total = sum(summary.values())
+        rows.append("")
+        rows.append(f"{'Total(ms)':>10} {'Share':>7}  Phase")
+        for phase, elapsed in summary.items():
+            rows.append(
+                f"{elapsed * 1000:>10.3f} {elapsed / (total or 1):>7.1%}  {phase}"
+            )
+        return "\n".join(rows) + "\n"
+
+
+def _size(size: Optional[int]) -> str:
+    """Format a size that may be unknown"""
+    return "-" if size is None else str(size)
+
+
+def enable_compile_stats(
+    env: "Environment",
+    stats: Optional[CompileStats] = None,
+) -> CompileStats:
+    """Enable recording the statistics of compiling the templates for an
+    environment
+
+    Args:
+        env: The environment, a LiquidEnvironment
+        stats: The collector, a new one is created if not given
+
+    Returns:
+        The collector
+    """
+    if stats is None:
+        stats = getattr(env, "compile_stats", None) or CompileStats()
+    env.compile_stats = stats  # type: ignore
+    return stats
+
+
+def compile_record(env: "Environment") -> Optional[CompileRecord]:
+    """Get the record of the template being compiled by an environment in
+    the current thread
+
+    Args:
+        env: The environment
+
+    Returns:
+        The record, or None if the statistics are not enabled or not
+        compiling
+    """
+    stats = getattr(env, "compile_stats", None)
+    return None if stats is None else stats.current()
@@ -0,0 +1,203 @@
+"""Provides cached resolution for liquid's `a.b` lookups
+
+Liquid's `a.b` falls back between attribute and item access. Instead of
+trying one of them and catching the exception for every access, we remember,
+per concrete type and name, whether the attribute lookup could ever succeed
+and whether the type supports item access at all.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, Tuple
+
+from .drops import Drop
+
+# Types whose attribute lookup is known to be the generic one
+GENERIC_GETATTR_TYPES = frozenset(
+    (object, dict, list, tuple, str, bytes, int, float, bool, set, frozenset)
+)
+
+# Keep the caches bounded, in case types are created dynamically
+MAX_CACHED_TYPES = 4096
+
+_attr_missing_cache: Dict[Tuple[type, str], bool] = {}
+_subscriptable_cache: Dict[type, bool] = {}
+
+
+def _fixed_attrs(typ: type) -> bool:
+    """Whether the attributes of the instances of a type are fully
+    determined by the type itself, meaning that the instances have no
+    `__dict__` and the attribute lookup is not customized.
+    """
+    if typ.__dictoffset__ != 0 or issubclass(typ, type):
+        return False
+
+    for klass in typ.__mro__:
+        if klass in GENERIC_GETATTR_TYPES:
+            continue
+        klass_dict = vars(klass)
+        if "__getattribute__" in klass_dict or "__getattr__" in klass_dict:
+            return False
+    return True
+
+
+def attr_missing(typ: type, name: str) -> bool:
+    """Check if `getattr(obj, name)` fails for every instance of the type
+
+    Args:
+        typ: The type of the object
+        name: The name of the attribute
+
+    Returns:
+        True if the attribute lookup is known to fail, otherwise False
+    """
+    if not isinstance(name, str):
+        return False
+
+    key = (typ, name)
+    try:
+        return _attr_missing_cache[key]
+    except KeyError:
+        pass
+
+    if len(_attr_missing_cache) >= MAX_CACHED_TYPES:  # pragma: no cover
+        _attr_missing_cache.clear()
+
+    out = _attr_missing_cache[key] = _fixed_attrs(typ) and not hasattr(
+        typ, name
+    )
+    return out
+
+
+def subscriptable(typ: type) -> bool:
+    """Check if the instances of a type may support `obj[key]`
+
+    Args:
+        typ: The type of the object
+
+    Returns:
+        False if `obj[key]` is known to fail, otherwise True
+    """
+    try:
+        return _subscriptable_cache[typ]
+    except KeyError:
+        pass
+
+    if len(_subscriptable_cache) >= MAX_CACHED_TYPES:  # pragma: no cover
+        _subscriptable_cache.clear()
+
+    # classes may support `cls[...]` via their metaclasses or
+    # `__class_getitem__`
+    out = _subscriptable_cache[typ] = issubclass(typ, type) or hasattr(
+        typ, "__getitem__"
+    )
+    return out
+
+
+def getitem_or_attr(obj: Any, prop: Any) -> Any:
+    """Get the property of an object, prefering `obj[prop]`
+
+    Args:
+        obj: The object
+        prop: The property
+
+    Returns:
+        The value of the property
+
+    Raises:
+        AttributeError: When neither the item nor the attribute exists
+    """
+    if isinstance(obj, Drop):
+        # drops only expose their fields
+        if prop in obj.liquid_fields:
+            return getattr(obj, prop)
+        raise AttributeError(prop)
+
+    typ = type(obj)
+    if subscriptable(typ):
+        try:
+            return obj[prop]
+        except (TypeError, KeyError):
+            pass
+
+    if attr_missing(typ, prop):
+        raise AttributeError(prop)
+    return getattr(obj, prop)
+
+
+def getattr_or_item(obj: Any, name: Any) -> Any:
+    """Get the property of an object, prefering `getattr(obj, name)`
+
+    Args:
+        obj: The object
+        name: The name of the property
+
+    Returns:
+        The value of the property
+
+    Raises:
+        TypeError: When the object does not support `obj[name]`
+        KeyError: When neither the attribute nor the item exists
+    """
+    if isinstance(obj, Drop):
+        # drops only expose their fields
+        if name in obj.liquid_fields:
+            return getattr(obj, name)
+        raise KeyError(name)
+
+    if not attr_missing(type(obj), name):
+        try:
+            return getattr(obj, name)
+        except AttributeError:
+            pass
+    return obj[name]
+
+
+@lru_cache(maxsize=1024)
+def prop_getter(
+    prop: Any,
+    attr_first: bool = False,
+    dotted: bool = False,
+    default: Any = None,
+) -> Callable[[Any], Any]:
+    """Get a function that gets a property of the objects
+
+    The functions are cached by the arguments, so that a property path is
+    only parsed once, and the same function is reused.
+
+    Args:
+        prop: The property
+        attr_first: Whether to prefer `getattr(obj, prop)` (as jekyll does)
+            over `obj[prop]`
+        dotted: Whether to treat `prop` as a dotted path (i.e. `a.b`) to
+            get the property at multiple levels
+        default: The value to return when the property does not exist
+
+    Returns:
+        The function that takes an object and returns the property value
+    """
+    if attr_first:
+        get = getattr_or_item
+        errors = (AttributeError, TypeError, KeyError)
+    else:
+        get = getitem_or_attr
+        errors = (AttributeError,)  # type: ignore
+
+    if dotted and isinstance(prop, str) and "." in prop:
+        names = tuple(prop.split("."))
+
+        def getter(obj: Any) -> Any:
+            try:
+                for name in names:
+                    obj = get(obj, name)
+            except errors:
+                return default
+            return obj
+
+    else:
+
+        def getter(obj: Any) -> Any:
+            try:
+                return get(obj, prop)
+            except errors:
+                return default
+
+    return getter
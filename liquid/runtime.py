@@ -0,0 +1,202 @@
+"""Provides the runtime state shared by the templates during a render, and
+the runtime helpers of the compiled templates
+
+The state lives as long as the outermost `Liquid.render()` call, including
+the templates included by the template being rendered. It is stored in a
+context variable, so that it is safe for threads and async tasks.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+)
+
+from jinja2.filters import do_reverse
+from jinja2.runtime import AsyncLoopContext, LoopContext
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+
+_render_ids = count(1)
+# Nothing is missing for the collection indexes
+_NOTHING = object()
+
+
+class RenderState:
+    """The state of a render
+
+    Attributes:
+        id: A unique id of the render
+        env: The environment of the template being rendered
+        memo: A dict for anything to be memoised during the render
+    """
+
+    __slots__ = ("id", "env", "memo")
+
+    def __init__(self, env: "Environment") -> None:
+        """Constructor"""
+        self.id = next(_render_ids)
+        self.env = env
+        self.memo: Dict[Any, Any] = {}
+
+
+_render_state: ContextVar[Optional[RenderState]] = ContextVar(
+    "liquid_render_state",
+    default=None,
+)
+
+
+def current_render() -> Optional[RenderState]:
+    """Get the state of the current render
+
+    Returns:
+        The state of the current render, or None if not rendering
+    """
+    return _render_state.get()
+
+
+@contextmanager
+def render_scope(env: "Environment") -> Generator[RenderState, None, None]:
+    """Open a render scope
+
+    A nested scope (i.e. rendering a template inside a filter) shares the
+    state of the outermost one.
+
+    Args:
+        env: The environment of the template to render
+
+    Yields:
+        The state of the render
+    """
+    state = _render_state.get()
+    if state is not None:
+        yield state
+        return
+
+    state = RenderState(env)
+    token = _render_state.set(state)
+    try:
+        yield state
+    finally:
+        _render_state.reset(token)
+
+
+def collection_index(
+    collection: Any,
+    getter: Callable[[Any], Any],
+    missing: Any = _NOTHING,
+) -> Optional[Dict[Any, List[Any]]]:
+    """Get the index of a collection by a property for the current render
+
+    The index is built the first time it is requested during a render, and
+    reused by the later requests for the same collection and property, until
+    the render ends. Only works when `collection_indexes` is enabled for the
+    environment.
+
+    Note that the collection is assumed not to be changed during the render.
+
+    Args:
+        collection: The collection, a list or a tuple
+        getter: The function to get the property of the elements
+        missing: The value returned by the getter when the property is
+            missing. Such elements are not indexed.
+
+    Returns:
+        A dict mapping property values to the elements, in their original
+        order, or None if indexing is not enabled or not possible (i.e. the
+        property values are unhashable).
+    """
+    state = current_render()
+    if (
+        state is None
+        or not getattr(state.env, "collection_indexes", False)
+        or not isinstance(collection, (list, tuple))
+    ):
+        return None
+
+    key = ("collection_index", id(collection), getter)
+    cached = state.memo.get(key)
+    # the collection is kept with the index, so that its id can't be reused
+    if cached is not None and cached[0] is collection:
+        return cached[1]
+
+    index: Optional[Dict[Any, List[Any]]] = {}
+    try:
+        for item in collection:
+            value = getter(item)
+            if value is not missing:
+                index.setdefault(value, []).append(item)
+    except TypeError:
+        index = None
+
+    state.memo[key] = (collection, index)
+    return index
+
+
+def loop_iter(
+    getitem: Callable[[Any, Any], Any],
+    iterable: Any,
+    offset: Any = None,
+    limit: Any = None,
+    reverse: bool = False,
+) -> Any:
+    """Apply the arguments of the `for` tag to the iterable
+
+    i.e. `{% for x in xs offset:1 limit:2 reversed %}`, where the iterable is
+    sliced by `offset` and `limit` first, and then reversed.
+
+    Args:
+        getitem: The `getitem()` of the environment, to slice the iterable
+        iterable: The iterable
+        offset: The offset
+        limit: The max number of the items
+        reverse: Whether to reverse the iterable
+
+    Returns:
+        The iterable to loop over
+    """
+    if offset is not None or limit is not None:
+        stop = limit if offset is None or limit is None else offset + limit
+        iterable = getitem(iterable, slice(offset, stop))
+    if reverse:
+        iterable = do_reverse(iterable)
+    return iterable
+
+
+def _liquid_cycle(self: LoopContext, *args: Any, name: Any = None) -> Any:
+    """Cycle through the values, where the cycles with different names
+    are independent (i.e. `{% cycle "name": "one", "two" %}`)"""
+    cyclers = self._liquid_cyclers
+    if cyclers is None:
+        cyclers = self._liquid_cyclers = {}
+    if name not in cyclers:
+        cyclers[name] = [args, -1]
+    cycler = cyclers[name]
+    cycler[1] += 1
+    return cycler[0][cycler[1] % len(cycler[0])]
+
+
+class LiquidLoopContext(LoopContext):
+    """The loop context with the attributes of liquid's `forloop`"""
+
+    _liquid_cyclers: Optional[Dict[Any, List[Any]]] = None
+    rindex = LoopContext.revindex
+    rindex0 = LoopContext.revindex0
+    liquid_cycle = _liquid_cycle
+
+
+class LiquidAsyncLoopContext(AsyncLoopContext):
+    """The async loop context with the attributes of liquid's `forloop`"""
+
+    _liquid_cyclers: Optional[Dict[Any, List[Any]]] = None
+    rindex = AsyncLoopContext.revindex
+    rindex0 = AsyncLoopContext.revindex0
+    liquid_cycle = _liquid_cycle
@@ -13,6 +13,7 @@ if TYPE_CHECKING:
 
 
 from ..exts.ext import ENCODING_ID
+from ..profiling import compile_record
 
 ENCODED_PATTERN = re.compile(fr"\$\${ENCODING_ID}\$([\w=+/]+)\$\$")
 
@@ -137,6 +138,24 @@ class TagManager:
                 token.lineno,
             )
 
+        record = compile_record(env)
+        if record is None:
+            node = self._parse_tag(env, token, parser)
+        else:
+            with record.phase("tags"):
+                node = self._parse_tag(env, token, parser)
+
+        if getattr(env, "profiler", None) is not None:
+            from ..profiling import instrument_tag
+
+            return instrument_tag(tagname, node, token.lineno)
+        return node
+
+    def _parse_tag(
+        self, env: "Environment", token: "Token", parser: "Parser"
+    ) -> nodes.Node:
+        """Call the parser function of a tag"""
+        tagname = token.value
         if self.envs.get(tagname, False):
             return self.tags[tagname](env, token, parser)
         return self.tags[tagname](token, parser)
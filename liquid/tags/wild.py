@@ -1,18 +1,22 @@
 """Provides tags for wild mode"""
+import hashlib
 import textwrap
-from contextlib import redirect_stdout
+from contextvars import ContextVar
 from io import StringIO
-from typing import TYPE_CHECKING, List, Union
+from types import CodeType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
 from jinja2 import nodes
 from jinja2.exceptions import TemplateSyntaxError
 from jinja2.lexer import TOKEN_BLOCK_END
+from jinja2.utils import LRUCache
 
 try:
     from jinja2 import pass_environment
 except ImportError:
     from jinja2 import environmentfilter as pass_environment
 
+from ..layers import Layers, Namespace
 from .manager import TagManager, decode_raw
 from .standard import assign, capture, case, comment, cycle
 
@@ -24,6 +28,59 @@ if TYPE_CHECKING:
 
 wild_tags = TagManager()
 
+# The compiled code of the tag bodies, and the names bound by the imports,
+# keyed by the digest of the body. So that the same helper block shared by
+# many templates is only compiled once, and the same import only executed
+# once.
+CODE_CACHE = LRUCache(1024)
+BINDINGS_CACHE = LRUCache(1024)
+
+
+def _digest(body: str) -> str:
+    """Get the digest of a tag body"""
+    return hashlib.sha1(body.encode()).hexdigest()
+
+
+def _compile_body(body: str, filename: str) -> CodeType:
+    """Compile the body of a tag, using the cached code if possible
+
+    Args:
+        body: The python code
+        filename: The filename used to compile the code
+
+    Returns:
+        The compiled code
+    """
+    key = (_digest(body), filename)
+    code = CODE_CACHE.get(key)
+    if code is None:
+        code = CODE_CACHE[key] = compile(body, filename, mode="exec")
+    return code
+
+
+def _import_bindings(body: str, filename: str) -> Dict[str, Any]:
+    """Get the names bound by an import statement
+
+    The statement is executed in a fresh namespace only the first time,
+    the modules/objects imported are reused afterwards.
+
+    Args:
+        body: The import statement
+        filename: The filename used to compile the code
+
+    Returns:
+        A mapping of the names bound by the statement and their values
+    """
+    key = _digest(body)
+    bindings = BINDINGS_CACHE.get(key)
+    if bindings is None:
+        bindings = {}
+        exec(_compile_body(body, filename), bindings)
+        del bindings["__builtins__"]
+        BINDINGS_CACHE[key] = bindings
+    return bindings
+
+
 wild_tags.register(comment, raw=True)
 wild_tags.register(case)
 wild_tags.register(capture)
@@ -31,6 +88,25 @@ wild_tags.register(assign)
 wild_tags.register(cycle)
 
 
+# The output of the python tag being compiled
+_python_output: ContextVar[Optional[StringIO]] = ContextVar(
+    "liquid_python_output",
+    default=None,
+)
+
+
+# The value of a name that is not bound
+_MISSING = object()
+
+
+def _print(*args: Any, **kwargs: Any) -> None:
+    """The `print()` for the code of the python tag, which prints to the
+    output of the tag being compiled, if not printing to a file"""
+    if kwargs.get("file") is None:
+        kwargs["file"] = _python_output.get()
+    print(*args, **kwargs)
+
+
 @wild_tags.register(raw=True, env=True)
 def python(env: "Environment", token: "Token", parser: "Parser") -> nodes.Node:
     """The python tag
@@ -41,6 +117,10 @@ def python(env: "Environment", token: "Token", parser: "Parser") -> nodes.Node:
     The globals from the enviornment will be used to evaluate the code
     It also affect the globals from the environment
 
+    The output of `print()` in the code is the output of the tag. Unlike
+    redirecting `sys.stdout`, this doesn't capture the output of the other
+    threads, nor the other writes to `sys.stdout` in the code.
+
     Args:
         env: The environment
         token: The token matches the tag name
@@ -68,10 +148,26 @@ def python(env: "Environment", token: "Token", parser: "Parser") -> nodes.Node:
 
         body = " ".join(pieces)
 
-    code = compile(body, "<liquid-python-tag>", mode="exec")
+    code = _compile_body(body, "<liquid-python-tag>")
+    # The top layer of the globals (a dict), so that the names bound by the
+    # code are globals, and the functions defined see the later ones
+    globs = env.globals.maps[0] if isinstance(env.globals, Layers) else env.globals
+    # bind the print() only while running the code, not to be seen by the
+    # templates, nor to replace the one bound before
+    orig_print = globs.get("print", _MISSING)
+    globs["print"] = _print
     out = StringIO()
-    with redirect_stdout(out):
-        exec(code, env.globals)
+    token_out = _python_output.set(out)
+    try:
+        exec(code, globs)
+    finally:
+        _python_output.reset(token_out)
+        # unless the code binds its own
+        if globs.get("print") is _print:
+            if orig_print is _MISSING:
+                del globs["print"]
+            else:
+                globs["print"] = orig_print
     return nodes.Output([nodes.Const(out.getvalue())], lineno=token.lineno)
 
 
@@ -99,8 +195,7 @@ def import_(
         if parser.stream.current.type is TOKEN_BLOCK_END:
             break
     body = " ".join(pieces)
-    code = compile(body, "<liquid-import_-tag>", mode="exec")
-    exec(code, env.globals)
+    env.globals.update(_import_bindings(body, "<liquid-import_-tag>"))
     return nodes.Output([], lineno=token.lineno)
 
 
@@ -126,8 +221,7 @@ def from_(env: "Environment", token: "Token", parser: "Parser") -> nodes.Node:
         if parser.stream.current.type is TOKEN_BLOCK_END:
             break
     body = " ".join(pieces)
-    code = compile(body, "<liquid-from_-tag>", mode="exec")
-    exec(code, env.globals)
+    env.globals.update(_import_bindings(body, "<liquid-from_-tag>"))
     return nodes.Output([], lineno=token.lineno)
 
 
@@ -165,19 +259,24 @@ def addfilter(
         body = "" if len(body_parts) < 2 else body_parts[1]
     body = textwrap.dedent(body)
 
-    globs = env.globals.copy()
-    code = compile(body, "<liquid-addfilter-tag>", mode="exec")
-    exec(code, globs)
-    try:
-        filterfunc = globs[filtername]
-    except KeyError:
+    # Only the code is cached, and it is executed for each environment, so
+    # that the filter sees the globals of the environment
+    globs: Dict[str, Any] = (
+        Namespace(env.globals)
+        if isinstance(env.globals, Layers)
+        else dict(env.globals)
+    )
+    exec(_compile_body(body, "<liquid-addfilter-tag>"), globs)
+    if filtername not in globs:
         raise TemplateSyntaxError(
             f"No such filter defined in 'addfilter': {filtername}",
             token.lineno,
-        ) from None
+        )
 
+    filterfunc: Callable = globs[filtername]
     if pass_env:
         filterfunc = pass_environment(filterfunc)  # type: ignore
+
     env.filters[filtername] = filterfunc
 
     return nodes.Output([], lineno=token.lineno)
@@ -28,6 +28,12 @@ def test_find(set_default_jekyll):
     out = liq.render(obj=[{}])
     assert out == "None"
 
+    out = liq.render(obj=[1, {"a": 2}, {"a": 1, "b": 3}])
+    assert out == "{'a': 1, 'b': 3}"
+
+    liq = Liquid('{{ obj | find: "a", None }}')
+    assert liq.render(obj=[{}, {"a": None, "b": 1}]) == "{'a': None, 'b': 1}"
+
 
 def test_normalize_whitespace(set_default_jekyll):
     assert Liquid('{{"a    b" | normalize_whitespace}}').render() == "a b"
@@ -45,6 +51,85 @@ def test_markdownify(set_default_jekyll):
     assert Liquid("{{ '# a' | markdownify }}").render() == "<h1>a</h1>"
 
 
+def test_markdownify_reused(set_default_jekyll, monkeypatch):
+    import threading
+    from liquid import defaults
+    from liquid.filters.jekyll import _get_markdown, _markdown_settings
+
+    tpl = Liquid("{{ x | markdownify }}")
+    md = _get_markdown(_markdown_settings())
+    x = "a[^1]\n\n[^1]: b"
+    assert "footnote" not in tpl.render(x=x)
+    assert _get_markdown(_markdown_settings()) is md
+
+    # the footnotes are reset between the uses
+    monkeypatch.setattr(defaults, "MARKDOWN_EXTENSIONS", ["footnotes"])
+    assert tpl.render(x=x) == tpl.render(x=x)
+    assert "fnref2" not in tpl.render(x=x)
+    assert _get_markdown(_markdown_settings()) is not md
+    assert tpl.render(x=1) == "<p>1</p>"
+
+    # each thread has its own instance
+    mds = []
+    thread = threading.Thread(
+        target=lambda: mds.append(_get_markdown(_markdown_settings()))
+    )
+    thread.start()
+    thread.join()
+    assert mds[0] is not _get_markdown(_markdown_settings())
+
+
+def test_markdownify_cache(set_default_jekyll, monkeypatch):
+    from liquid import defaults
+    from liquid.filters.jekyll import _get_markdown_cache, _markdown_settings
+
+    tpl = Liquid("{{ x | markdownify }}")
+    assert _get_markdown_cache(_markdown_settings()) is None
+
+    monkeypatch.setattr(defaults, "MARKDOWN_CACHE_SIZE", 2)
+    cache = _get_markdown_cache(_markdown_settings())
+    assert tpl.render(x="# a") == "<h1>a</h1>"
+    assert len(cache) == 1
+    assert tpl.render(x="# a") == "<h1>a</h1>"
+    assert len(cache) == 1
+    assert tpl.render(x="# b") == "<h1>b</h1>"
+    assert len(cache) == 2
+
+    # cached results are discarded when the settings change
+    monkeypatch.setattr(defaults, "MARKDOWN_EXTENSIONS", ["toc"])
+    assert _get_markdown_cache(_markdown_settings()) is not cache
+    assert tpl.render(x="# a") == '<h1 id="a">a</h1>'
+
+
+def test_markdownify_extension_instances(set_default_jekyll, monkeypatch):
+    from markdown.extensions.toc import TocExtension
+    from liquid import defaults
+    from liquid.filters.jekyll import (
+        _get_markdown,
+        _get_markdown_cache,
+        _markdown_settings,
+    )
+
+    # the instances don't implement __eq__, but they are reused
+    monkeypatch.setattr(defaults, "MARKDOWN_EXTENSIONS", [TocExtension()])
+    monkeypatch.setattr(defaults, "MARKDOWN_CACHE_SIZE", 2)
+    md = _get_markdown(_markdown_settings())
+    cache = _get_markdown_cache(_markdown_settings())
+    tpl = Liquid("{{ x | markdownify }}")
+    assert tpl.render(x="# a") == '<h1 id="a">a</h1>'
+    assert _get_markdown(_markdown_settings()) is md
+    assert _get_markdown_cache(_markdown_settings()) is cache
+    assert len(cache) == 1
+
+    # in-place changes are still detected
+    defaults.MARKDOWN_EXTENSIONS.append("footnotes")
+    assert _get_markdown(_markdown_settings()) is not md
+    assert _get_markdown_cache(_markdown_settings()) is not cache
+
+    monkeypatch.setattr(defaults, "MARKDOWN_EXTENSIONS", [TocExtension()])
+    assert _get_markdown(_markdown_settings()) is not md
+
+
 @pytest.mark.parametrize(
     "sen,mode,out",
     [
@@ -56,6 +141,12 @@ def test_markdownify(set_default_jekyll):
         ("你好hello世界world", None, 1),
         ("你好hello世界world", "cjk", 6),
         ("你好hello世界world", "auto", 6),
+        ("", "cjk", 0),
+        ("", "auto", 0),
+        ("a\x1cb", "auto", 2),
+        ("a\x1cb", "cjk", 1),
+        ("a\x1cb中", "auto", 2),
+        (" 中文 a中b ", "cjk", 5),
     ],
 )
 def test_number_of_words(sen, mode, out, set_default_jekyll):
@@ -67,6 +158,21 @@ def test_number_of_words(sen, mode, out, set_default_jekyll):
     assert Liquid(tpl).render() == str(out)
 
 
+def test_number_of_words_large(set_default_jekyll):
+    import regex
+
+    doc = (
+        "Hello world, a sentence. " * 10 + "こんにちは、世界！안녕하세요 세상! 中文。"
+    ) * 1000
+    cjk = r"\p{Han}\p{Katakana}\p{Hiragana}\p{Hangul}"
+    expected = len(regex.findall(fr"[{cjk}]", doc)) + len(
+        regex.findall(fr"[^{cjk}\s]+", doc)
+    )
+    for mode in ("cjk", "auto"):
+        tpl = Liquid(f"{{{{ doc | number_of_words: {mode!r} }}}}")
+        assert tpl.render(doc=doc) == str(expected)
+
+
 def test_sort_error(set_default_jekyll):
     tpl = Liquid("{{ x | sort }}")
     with pytest.raises(ValueError):
@@ -133,6 +239,12 @@ def test_sort_error(set_default_jekyll):
             "first",
             [{"a": {"b": 3}}, {"a": {"b": 2}}, {"a": {"b": 1}}],
         ),
+        (
+            [{"a": {"b": 1}}, {"a": 1}, {"a": {"b": 3}}, {"a": {"c": 2}}],
+            "a.b",
+            "last",
+            [{"a": {"b": 3}}, {"a": {"b": 1}}, {"a": 1}, {"a": {"c": 2}}],
+        ),
     ],
 )
 def test_sort(array, prop, none_pos, out, set_default_jekyll):
@@ -256,3 +368,15 @@ def test_uri_escape(set_default_jekyll):
         Liquid("{{ x | uri_escape }}").render(x="http://foo.com/?q=foo, \\bar?")
         == "http://foo.com/?q=foo,%20%5Cbar?"
     )
+
+
+def test_find_indexed(set_default_jekyll):
+    tpl = Liquid(
+        "{% for q in queries %}"
+        '{{ obj | find: "a", q }};'
+        "{% endfor %}",
+        collection_indexes=True,
+    )
+    obj = [{"a": 1, "b": 1}, {"b": 2}, {"a": 1, "b": 3}, {"a": 2, "b": 4}]
+    out = tpl.render(obj=obj, queries=[1, 2, 3, None, []])
+    assert out == "{'a': 1, 'b': 1};{'a': 2, 'b': 4};None;None;None;"
@@ -412,3 +412,239 @@ def test_liquid_map(set_default_standard):
     assert Liquid('{{x | liquid_map: "y" | last}}').render(
         x=[namedtuple("X", "y")(2)]
     ) == "2"
+
+
+def test_uniq(set_default_standard):
+    tpl = Liquid("{{ x | uniq }}")
+    assert tpl.render(x=[1, 2, 1, 3, 2]) == "[1, 2, 3]"
+    assert tpl.render(x=[[1], 2, [1], 2, {}, {}]) == "[[1], 2, {}]"
+
+    tpl = Liquid('{{ x | uniq: "handle" | map: "id" | join: "," }}')
+    assert tpl.render(
+        x=[
+            {"handle": "a", "id": 1},
+            {"handle": "b", "id": 2},
+            {"handle": "a", "id": 3},
+            {"handle": ["c"], "id": 4},
+            {"handle": ["c"], "id": 5},
+            {"id": 6},
+            {"id": 7},
+        ]
+    ) == "1,2,4,6"
+
+
+def test_where_indexed(set_default_standard):
+    tpl = Liquid(
+        "{% for h in handles %}"
+        '{{ products | where: "handle", h | map: "id" | join: "," }};'
+        "{% endfor %}",
+        collection_indexes=True,
+    )
+    products = [
+        {"handle": "a", "id": 1},
+        {"handle": "b", "id": 2},
+        {"handle": "a", "id": 3},
+        {"id": 4},
+    ]
+    assert tpl.env.collection_indexes
+    out = tpl.render(products=products, handles=["a", "b", "c", None, []])
+    assert out == "1,3;2;;4;;"
+    # not indexed: unhashable property values
+    products.append({"handle": ["x"], "id": 5})
+    out = tpl.render(products=products, handles=["a", ["x"]])
+    assert out == "1,3;5;"
+    # not indexed: disabled or not a list
+    tpl = Liquid('{{ products | where: "handle", "a" | map: "id" }}')
+    assert not tpl.env.collection_indexes
+    assert tpl.render(products=products) == "[1, 3]"
+    assert tpl.render(products=iter(products)) == "[1, 3]"
+
+
+@pytest.mark.parametrize(
+    "base,fmt,out",
+    [
+        ("2015-07-17", "%Y/%m/%d %H", "2015/07/17 00"),
+        ("2015-07-17T10:11:12", "%Y/%m/%d %H:%M:%S", "2015/07/17 10:11:12"),
+        ("2015-07-17 10:11:12.5", "%f", "500000"),
+        ("2015-07-17T10:11:12+08:00", "%H %z", "10 +0800"),
+        ("2015-07-17 10:11 PM", "%H:%M", "22:11"),
+        (datetime(2015, 7, 17), "%Y", "2015"),
+    ],
+)
+def test_date_parsing(base, fmt, out, set_default_standard):
+    assert Liquid("{{ x | date: fmt }}").render(x=base, fmt=fmt) == out
+
+
+def test_date_now_frozen(set_default_standard):
+    from liquid.filters.standard import liquid_date
+
+    tpl = Liquid(
+        '{% for i in (1..50) %}{{ now | date: "%f" }},{% endfor %}'
+        '{{ today | date: "%f" }}'
+    )
+    assert len(set(tpl.render(now="now", today="today").split(","))) == 1
+    # not frozen outside of a render
+    assert isinstance(liquid_date("now", "%f").dt, datetime)
+
+
+def test_date_now_literal(set_default_standard, monkeypatch):
+    from liquid.filters import standard
+
+    tpl = Liquid('{{ "now" | date: "%Y" }}')
+    # not evaluated when the template is compiled
+    monkeypatch.setattr(standard, "_now", lambda: datetime(1999, 1, 1))
+    assert tpl.render() == "1999"
+
+
+def test_date_partial(set_default_standard, monkeypatch):
+    from liquid.filters import standard
+
+    class FakeDate(standard.date):
+        day_now = standard.date(2020, 1, 2)
+
+        @classmethod
+        def today(cls):
+            return cls.day_now
+
+    monkeypatch.setattr(standard, "date", FakeDate)
+    tpl = Liquid('{{ x | date: "%Y-%m-%d %H" }}')
+    assert tpl.render(x="10:00") == "2020-01-02 10"
+    # not cached from the day before
+    FakeDate.day_now = standard.date(2020, 1, 3)
+    assert tpl.render(x="10:00") == "2020-01-03 10"
+
+
+def test_regex_replace_precompiled(set_default_standard):
+    from liquid.filters.standard import _compile_regex
+
+    _compile_regex.cache_clear()
+    tpl = Liquid(
+        '{{ x | regex_replace: "B+", "c" }}|'
+        '{{ x | regex_replace: y, "c" }}|'
+        '{{ x | regex_replace: "b", "c", case_sensitive: True }}'
+    )
+    # the constant patterns are compiled with the template
+    assert _compile_regex.cache_info().currsize == 2
+    assert tpl.render(x="abbB", y="a") == "ac|cbbB|accB"
+
+    # invalid patterns raise at rendering
+    tpl = Liquid('{{ x | regex_replace: "(", "c" }}')
+    with pytest.raises(Exception):
+        tpl.render(x="a")
+
+
+@pytest.mark.parametrize(
+    "patterns,case_sensitive,base,out",
+    [
+        ({}, False, "abc", "abc"),
+        ({"a": "b", "b": "c"}, False, "ab", "bc"),
+        ([("a", "b"), ("b", "c")], True, "aBb", "bBc"),
+        ({"(\\d+)px": "\\1em", "(x)(y)": "\\g<2>\\1"}, False, "2px xy", "2em yx"),
+        ({"a+": "[\\g<0>]", "\\s+": " "}, False, "aa  b", "[aa] b"),
+        ({"ab": "1", "a": "2"}, False, "aab", "21"),
+        # escaped backslashes are not references
+        ([["ab", "\\\\1"], ["x", "\\\\g<1>"]], False, "abx", "\\1\\g<1>"),
+        ([["(a)", "\\101\\1"]], False, "a", "Aa"),
+        # can't be combined, applied one by one
+        ([["(a)\\1", "Z"]], False, "aab", "Zb"),
+        ([["(a)(b)\\2", "X"]], False, "abb", "X"),
+        ([["x", "y"], ["(?P<a>a)(?P=a)", "X"]], False, "xaa", "yX"),
+        ([["(a)?(?(1)b|c)", "X"]], False, "abc", "XX"),
+        ([["(a)\\1", "b"], ["b", "c"]], False, "aab", "cc"),
+        (
+            [["(?P<x>a)", "[\\g<x>]"], ["(?P<x>b)", "<\\g<x>>"]],
+            False,
+            "ab",
+            "[a]<b>",
+        ),
+    ],
+)
+def test_regex_replace_many(patterns, case_sensitive, base, out, set_default_standard):
+    tpl = Liquid("{{ x | regex_replace_many: p, case_sensitive: c }}")
+    assert tpl.render(x=base, p=patterns, c=case_sensitive) == out
+
+
+def test_regex_replace_many_precompiled(set_default_standard):
+    from liquid.filters.standard import _compile_regex_many
+
+    _compile_regex_many.cache_clear()
+    tpl = Liquid('{{ x | regex_replace_many: [["a", "b"], ["b", "c"]] }}')
+    assert _compile_regex_many.cache_info().currsize == 1
+    assert tpl.render(x="ab") == "bc"
+    assert tpl.render(x=1) == "1"
+
+
+@pytest.mark.parametrize(
+    "replacements,base,out",
+    [
+        ({}, "abc", "abc"),
+        ({"": "x"}, "abc", "abc"),
+        ({"a": "1", "c": "3"}, "abcabc", "1b31b3"),
+        ([("a", "1"), ("ab", "2")], "abcab", "2c2"),
+        ([("ab", "x"), ("bc", "y")], "abc", "xc"),
+        ([("a", "b"), ("b", "c")], "ab", "bc"),
+        ([("a", "1"), ("a", "2")], "a", "1"),
+        ({".": "!", "*": "+"}, "a.b*", "a!b+"),
+    ],
+)
+def test_replace_many(replacements, base, out, set_default_standard):
+    tpl = Liquid("{{ x | replace_many: r }}")
+    assert tpl.render(x=base, r=replacements) == out
+
+
+def test_replace_many_same_as_chain(set_default_standard):
+    body = "Dear {name}, your order {order} ships on {date}. " * 100
+    chain = Liquid(
+        '{{ x | replace: "{name}", "Ann" | replace: "{order}", "#1" '
+        '| replace: "{date}", "Monday" | remove: "Dear " }}'
+    )
+    many = Liquid(
+        '{{ x | replace_many: [["{name}", "Ann"], ["{order}", "#1"], '
+        '["{date}", "Monday"], ["Dear ", ""]] }}'
+    )
+    assert many.render(x=body) == chain.render(x=body)
+
+
+def test_remove_many(set_default_standard):
+    tpl = Liquid('{{ x | remove_many: ["a", "bc", "b"] }}')
+    assert tpl.render(x="abcab") == ""
+    assert tpl.render(x="xbcy") == "xy"
+
+
+@pytest.mark.parametrize(
+    "base,length,out",
+    [
+        ("a b  c", 3, "a b  c"),
+        ("a b  c", 4, "a b  c"),
+        ("a\tb\n c d", 2, "a b..."),
+        (" a b", 0, "..."),
+        ("a b c", -1, "a b..."),
+        ("", 1, ""),
+    ],
+)
+def test_truncatewords(base, length, out, set_default_standard):
+    tpl = Liquid("{{ x | truncatewords: n }}")
+    assert tpl.render(x=base, n=length) == out
+
+
+@pytest.mark.parametrize(
+    "base,out",
+    [
+        ("<b>a</b>", "a"),
+        ("a < b and c > d", "a  d"),
+        ("a <> b <", "a <> b <"),
+        ("a<!-- <b> -->b", "ab"),
+        ("a<!-- b > c", "a c"),
+        ("a<script>if (a<b) {}</script>b", "ab"),
+        ("a<SCRIPT type='x'>c</Script >b", "ab"),
+        ("a<style>p>b {}</style>b<style/>c", "abc"),
+        ("a<script>b<script>c", "abc"),
+        ("a<scripts>b</scripts>", "ab"),
+        ("a<!-- <!-- -->b<!--", "ab<!--"),
+        ("<a title='<!--'>b-->c", "<a title='c"),
+        ("1 < 2 <!-- c --> 3 > 0", "1  0"),
+    ],
+)
+def test_strip_html(base, out, set_default_standard):
+    tpl = Liquid("{{ x | strip_html }}")
+    assert tpl.render(x=base) == out
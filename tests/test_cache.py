@@ -0,0 +1,61 @@
+import pytest
+from liquid import Liquid
+from liquid.cache import clear_memos, memo_stats, memoize
+
+
+def test_memoize():
+    calls = []
+
+    @memoize(maxsize=2, name="test_cache.double")
+    def double(x, times=2):
+        calls.append(x)
+        return x * times
+
+    assert double(1) == 2
+    assert double(1) == 2
+    assert double([1]) == [1, 1]
+    assert double([1]) == [1, 1]
+    assert calls == [1, [1], [1]]
+    assert double(1, times=3) == 3
+
+    stats = memo_stats()["test_cache.double"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert stats["size"] == 2
+    assert stats["maxsize"] == 2
+
+    clear_memos()
+    stats = memo_stats()["test_cache.double"]
+    assert stats["hits"] == stats["misses"] == stats["size"] == 0
+    assert stats["hit_rate"] == 0.0
+
+
+def test_memoize_errors():
+    @memoize
+    def fail(x):
+        raise TypeError(x)
+
+    with pytest.raises(TypeError):
+        fail(1)
+    assert "test_memoize_errors.<locals>.fail" in "".join(memo_stats())
+
+
+def test_memoized_filters(set_default_jekyll):
+    from liquid.filters.jekyll import jekyll_slugify
+
+    jekyll_slugify.cache_clear()
+    tpl = Liquid("{{ x | slugify }}{{ x | slugify: 'pretty' }}")
+    assert tpl.render(x="a b!") == "a-ba-b!"
+    assert tpl.render(x="a b!") == "a-ba-b!"
+    assert jekyll_slugify.cache_info().hits == 2
+
+    tpl = Liquid("{{ x | url_encode }}|{{ x | url_encode | url_decode }}")
+    assert tpl.render(x="a b&c") == "a+b%26c|a+b&c"
+    assert tpl.render(x=[1]) == "%5B1%5D|[1]"
+
+    # equal arguments of different types are not mixed up
+    tpl = Liquid("{{ x | url_encode }}")
+    assert tpl.render(x=True) == "True"
+    assert tpl.render(x=1.0) == "1.0"
+    assert tpl.render(x=1) == "1"
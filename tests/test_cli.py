@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from liquid.__main__ import main
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / "layout.liquid").write_text(
+        "{% for i in (1..3) %}{% include 'item.html' %}{% endfor %}"
+    )
+    (tmp_path / "partials").mkdir()
+    (tmp_path / "partials" / "item.html").write_text("<{{ i }}>")
+    (tmp_path / "notes.txt").write_text("{{ x }}")
+    return tmp_path
+
+
+def test_compile_stats(templates, capsys):
+    assert main(["compile-stats", str(templates)]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].split()[-1] == "Template"
+    assert sorted(line.split()[-1] for line in out[1:3]) == [
+        "layout.liquid",
+        "partials/item.html",
+    ]
+    assert out[3] == ""
+    assert "generate" in [line.split()[-1] for line in out[5:]]
+
+
+def test_compile_stats_json(templates, capsys):
+    (templates / "bad.liquid").write_text("{% if %}")
+    assert (
+        main(
+            [
+                "compile-stats",
+                str(templates),
+                "--glob",
+                "*.liquid",
+                "--glob",
+                "*.txt",
+                "--mode",
+                "jekyll",
+                "--json",
+            ]
+        )
+        == 1
+    )
+    captured = capsys.readouterr()
+    out = json.loads(captured.out)
+    assert sorted(record["name"] for record in out["templates"]) == [
+        "layout.liquid",
+        "notes.txt",
+    ]
+    assert "preprocess:FrontMatterExtension" in out["phases"]
+    assert list(out["errors"]) == ["bad.liquid"]
+    assert out["errors"]["bad.liquid"].startswith("TemplateSyntaxError: ")
+    assert captured.err.startswith("bad.liquid: TemplateSyntaxError: ")
+
+
+def test_no_command(capsys):
+    with pytest.raises(SystemExit):
+        main([])
@@ -0,0 +1,161 @@
+import pytest  # noqa: F401
+
+from liquid import Drop, Liquid
+
+
+class ProductDrop(Drop):
+    def __init__(self, name, loads):
+        self.name = name
+        self.loads = loads
+        self.token = "SECRET"
+
+    @Drop.field
+    def title(self):
+        self.loads.append(self.name)
+        return self.name.title()
+
+    def secret(self):
+        return "secret"
+
+
+class BulkDrop(ProductDrop):
+    @classmethod
+    def prefetch(cls, drops, names):
+        for drop in drops:
+            drop.memoize("title", drop.name.upper())
+
+
+def test_fields():
+    assert ProductDrop.liquid_fields == {"title"}
+    assert isinstance(ProductDrop.title, Drop.field)
+    drop = ProductDrop("a", [])
+    assert "title" in drop
+    assert drop["title"] == "A"
+    with pytest.raises(KeyError):
+        drop["secret"]
+
+
+def test_memoised_per_render(set_default_standard):
+    loads = []
+    drop = ProductDrop("a", loads)
+    tpl = Liquid("{{p.title}}{{p['title']}}{{p.secret}}{{p[0]}}")
+    assert tpl.render(p=drop) == "AA"
+    assert loads == ["a"]
+    assert tpl.render(p=drop) == "AA"
+    assert loads == ["a", "a"]
+
+    # not memoised outside of a render
+    drop.title
+    drop.title
+    assert loads == ["a", "a", "a", "a"]
+
+
+def test_filters_on_drops(set_default_standard):
+    loads = []
+    drops = [ProductDrop("a", loads), ProductDrop("b", loads)]
+    tpl = Liquid('{{ps | map: "title" | join: ","}}')
+    assert tpl.render(ps=drops) == "A,B"
+    tpl = Liquid(
+        '{% assign p = ps | find: "title", "B" %}{{p.title}}', mode="jekyll"
+    )
+    assert tpl.render(ps=drops) == "B"
+
+
+@pytest.mark.parametrize(
+    "mode, tpl",
+    [
+        ("standard", '{{ps | map: "token" | compact | join: ","}}'),
+        ("standard", '{{ps | where: "token", "SECRET" | size}}'),
+        ("standard", '{{ps | uniq: "token" | size}}'),
+        ("jekyll", '{{ps | map: "token" | compact | join: ","}}'),
+        ("jekyll", '{{ps | find: "token", "SECRET" | default: "none"}}'),
+    ],
+)
+def test_filters_hide_non_fields(mode, tpl):
+    drops = [ProductDrop("a", []), ProductDrop("b", [])]
+    out = Liquid(tpl, mode=mode, from_file=False).render(ps=drops)
+    assert "SECRET" not in out
+    assert out in ("", "0", "1", "none")
+
+
+def test_prefetch(set_default_standard):
+    loads = []
+    drops = [ProductDrop("a", loads), BulkDrop("b", loads), 1]
+    tpl = Liquid(
+        '{% for p in ps | prefetch: "title", "secret" %}'
+        "{{loads | size}}{{p.title}}"
+        "{% endfor %}"
+    )
+    assert tpl.render(ps=drops, loads=loads) == "1A1B1"
+    assert loads == ["a"]
+    assert Liquid('{{ps | prefetch: "title"}}').render(ps=[]) == "[]"
+
+    # no effect outside of a render
+    drop = BulkDrop("c", loads)
+    drop.memoize("title", "x")
+    assert drop.title == "C"
+
+
+def test_nested_render_shares_memo(set_default_standard):
+    loads = []
+    drop = ProductDrop("a", loads)
+    inner = Liquid("{{p.title}}")
+    tpl = Liquid(
+        "{{p.title}}{{p | render}}",
+        filters={"render": lambda p: inner.render(p=p)},
+    )
+    assert tpl.render(p=drop) == "AA"
+    assert loads == ["a"]
+
+
+def test_empty_drop():
+    import copy
+    import pickle
+    from liquid.drops import EmptyDrop, BlankDrop, EMPTY_DROP, BLANK_DROP
+
+    assert EmptyDrop() is EMPTY_DROP
+    assert BlankDrop() is BLANK_DROP
+    assert EMPTY_DROP is not BLANK_DROP
+    assert getattr(EMPTY_DROP, "empty?")
+    assert repr(EMPTY_DROP) == "EmptyDrop()"
+    assert list(EMPTY_DROP) == []
+    assert len(EMPTY_DROP) == 0
+    assert copy.copy(EMPTY_DROP) is EMPTY_DROP
+    assert copy.deepcopy(EMPTY_DROP) is EMPTY_DROP
+    assert pickle.loads(pickle.dumps(EMPTY_DROP)) is EMPTY_DROP
+    with pytest.raises(AttributeError):
+        EMPTY_DROP.x = 1
+    with pytest.raises(AttributeError):
+        setattr(EMPTY_DROP, "empty?", False)
+
+
+@pytest.mark.parametrize(
+    "value,empty,blank",
+    [
+        (None, True, True),
+        (False, True, True),
+        (0, True, False),
+        ("", True, True),
+        ("  ", False, True),
+        ("a", False, False),
+        ([], True, True),
+        ({}, True, True),
+        ([1], False, False),
+        (1, False, False),
+    ],
+)
+def test_empty_and_blank(value, empty, blank, set_default_standard):
+    tpl = Liquid(
+        "{% if x == empty %}1{% else %}0{% endif %}"
+        "{% if x == blank %}1{% else %}0{% endif %}"
+    )
+    assert tpl.render(x=value) == f"{int(empty)}{int(blank)}"
+
+
+def test_empty_results(set_default_standard):
+    tpl = Liquid(
+        '{% assign x = arr | where: "a", 1 %}'
+        "{{x.size}}{% for y in x %}{{y}}{% endfor %}"
+        "{% if x == empty %}empty{% endif %}"
+    )
+    assert tpl.render(arr=[]) == "0empty"
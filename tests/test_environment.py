@@ -0,0 +1,115 @@
+import pytest  # noqa: F401
+from collections import namedtuple
+
+from jinja2 import Environment
+from jinja2.sandbox import SandboxedEnvironment
+from liquid import Liquid, LiquidEnvironment
+from liquid.environment import liquid_environment_class
+from liquid.props import (
+    attr_missing,
+    getattr_or_item,
+    getitem_or_attr,
+    subscriptable,
+)
+
+
+class Dynamic:
+    def __getattr__(self, name):
+        return name
+
+
+class Slotted:
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return name
+
+
+def test_attr_missing():
+    assert attr_missing(dict, "x")
+    assert not attr_missing(dict, "items")
+    assert not attr_missing(dict, 1)
+    assert attr_missing(namedtuple("X", "y"), "z")
+    assert not attr_missing(namedtuple("X", "y"), "y")
+    # instances have __dict__
+    assert not attr_missing(type("Obj", (), {}), "x")
+    assert not attr_missing(Dynamic, "x")
+    assert not attr_missing(Slotted, "x")
+
+
+def test_subscriptable():
+    assert subscriptable(dict)
+    assert subscriptable(type)
+    assert not subscriptable(Dynamic)
+
+
+def test_getitem_or_attr():
+    assert getitem_or_attr({"items": 1}, "items") == 1
+    assert getitem_or_attr(Dynamic(), "x") == "x"
+    with pytest.raises(AttributeError):
+        getitem_or_attr({}, "x")
+
+
+def test_getattr_or_item():
+    assert getattr_or_item(Dynamic(), "x") == "x"
+    assert getattr_or_item({"x": 1}, "x") == 1
+    assert getattr_or_item(namedtuple("X", "y")(1), "y") == 1
+    with pytest.raises(KeyError):
+        getattr_or_item({}, "x")
+    with pytest.raises(TypeError):
+        getattr_or_item(1, "x")
+    with pytest.raises(TypeError):
+        getattr_or_item(type("Obj", (), {})(), "x")
+
+
+def test_env_lookups(set_default_standard):
+    tpl = Liquid("{{a.b}}|{{a.keys is defined}}|{{c['x']}}|{{a.z}}|{{c.y}}")
+    assert isinstance(tpl.env, LiquidEnvironment)
+    assert tpl.render(a={"b": 1}, c=Dynamic()) == "1|True|x||y"
+    assert tpl.render(a=[], c=Dynamic()) == "|False|x||y"
+
+
+def test_env_overlay(set_default_standard):
+    tpl = Liquid.from_env("{{a.b}}", Environment())
+    assert isinstance(tpl.env, LiquidEnvironment)
+    assert tpl.render(a={"b": 1}) == "1"
+
+    tpl = Liquid.from_env("{{a.b}}", SandboxedEnvironment())
+    assert isinstance(tpl.env, LiquidEnvironment)
+    assert isinstance(tpl.env, SandboxedEnvironment)
+    assert tpl.render(a={"b": 1}) == "1"
+    assert liquid_environment_class(SandboxedEnvironment) is type(tpl.env)
+    assert liquid_environment_class(LiquidEnvironment) is LiquidEnvironment
+
+
+def test_expression_cache(set_default_standard):
+    from liquid import defaults
+
+    env = LiquidEnvironment()
+    expr = env.compile_expression("a + 1")
+    assert expr(a=1) == 2
+    assert env.compile_expression("a + 1") is expr
+    assert env.compile_expression("a + 1", False) is not expr
+
+    # overlays have their own caches
+    env2 = env.overlay()
+    assert env2.expression_cache is not env.expression_cache
+    assert env2.compile_expression("a + 1") is not expr
+
+    orig = defaults.EXPRESSION_CACHE_SIZE
+    defaults.EXPRESSION_CACHE_SIZE = 0
+    try:
+        env = LiquidEnvironment()
+        assert env.expression_cache is None
+        assert env.compile_expression("a") is not env.compile_expression("a")
+    finally:
+        defaults.EXPRESSION_CACHE_SIZE = orig
+
+    tpl = Liquid(
+        "{% for x in xs %}"
+        '{{ x | where_exp: "i", "i > 1" | join: "," }};'
+        "{% endfor %}",
+        mode="jekyll",
+    )
+    assert tpl.render(xs=[[1, 2], [3, 0]]) == "2;3;"
+    assert ("i > 1", True) in tpl.env.expression_cache
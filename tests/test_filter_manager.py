@@ -0,0 +1,188 @@
+import pytest
+from liquid import Liquid
+from liquid.filters.manager import FilterManager
+
+
+def _counting_manager():
+    calls = []
+    manager = FilterManager()
+
+    @manager.register(pure=False)
+    def impure(value):
+        calls.append(("impure", value))
+        return value
+
+    @manager.register(pure=True)
+    def cheap(value):
+        calls.append(("cheap", value))
+        return value
+
+    @manager.register("costly, expensive", pure=True, cost=1000)
+    def costly(value, suffix=""):
+        calls.append(("costly", value))
+        return f"{value}{suffix}"
+
+    @manager.register(pass_env=True)
+    def envname(env, value):
+        return f"{type(env).__name__}:{value}"
+
+    return manager, calls
+
+
+def test_register():
+    manager, _ = _counting_manager()
+    assert manager.pures == {
+        "impure": False,
+        "cheap": True,
+        "costly": True,
+        "expensive": True,
+    }
+    assert manager.costs == {"costly": 1000, "expensive": 1000}
+    assert set(manager.filters) == {
+        "impure",
+        "cheap",
+        "costly",
+        "expensive",
+        "envname",
+    }
+
+
+def test_constant_folding(set_default_standard):
+    manager, calls = _counting_manager()
+    tpl = Liquid(
+        '{{ 1 | impure }}{{ 2 | cheap }}{{ 3 | envname }}', filters=manager
+    )
+    # only the pure one (or unknown) is evaluated at compile time
+    assert calls == [("cheap", 2)]
+    assert tpl.render() == "12LiquidEnvironment:3"
+    assert tpl.render() == "12LiquidEnvironment:3"
+    assert calls == [("cheap", 2), ("impure", 1), ("impure", 1)]
+
+    # also for expressions
+    calls.clear()
+    expr = tpl.env.compile_expression("1 | impure")
+    assert calls == []
+    assert expr() == 1
+    assert calls == [("impure", 1)]
+
+    # filters passed as a mapping are folded as in jinja
+    calls.clear()
+    Liquid("{{ 1 | impure }}", filters=dict(manager.filters))
+    assert calls == [("impure", 1)]
+
+
+def test_memoize_per_render(set_default_standard):
+    manager, calls = _counting_manager()
+    tpl = Liquid(
+        "{% for x in xs %}{{ x | costly }}{{ x | expensive: '!' }}"
+        "{% endfor %}",
+        filters=manager,
+    )
+    assert tpl.render(xs=[1, 1, 1.0, [1], [1]]) == "11!11!1.01.0![1][1]![1][1]!"
+    # 1 and 1.0 are different keys, unhashable lists are not memoised
+    assert calls == [
+        ("costly", 1),
+        ("costly", 1),
+        ("costly", 1.0),
+        ("costly", 1.0),
+        ("costly", [1]),
+        ("costly", [1]),
+        ("costly", [1]),
+        ("costly", [1]),
+    ]
+
+    # memoised per render
+    calls.clear()
+    tpl.render(xs=[1])
+    assert calls == [("costly", 1), ("costly", 1)]
+
+    # the keyword arguments of different types are different keys
+    calls.clear()
+    tpl = Liquid(
+        "{% for s in ss %}{{ 1 | costly: suffix: s }}{% endfor %}",
+        filters=manager,
+    )
+    assert tpl.render(ss=[True, 1, 1.0, 1]) == "1True1111.011"
+    assert calls == [("costly", 1)] * 3
+
+    # not rendering
+    calls.clear()
+    tpl.env.filters["costly"](1)
+    tpl.env.filters["costly"](1)
+    assert calls == [("costly", 1), ("costly", 1)]
+
+
+def test_update_to_env_no_overwrite(set_default_standard):
+    manager, calls = _counting_manager()
+    tpl = Liquid("{{ 1 }}")
+    tpl.env.filters["cheap"] = str
+    manager.update_to_env(tpl.env, overwrite=False)
+    assert tpl.env.filters["cheap"] is str
+    assert tpl.env.filters["impure"] in tpl.env.impure_filters
+
+    # overlays keep the impure filters
+    from liquid.environment import overlay
+
+    env = overlay(tpl.env)
+    assert env.impure_filters == tpl.env.impure_filters
+    assert env.impure_filters is not tpl.env.impure_filters
+
+
+def test_impure_builtins(set_default_standard, capsys):
+    from liquid.filters.standard import liquid_date
+
+    tpl = Liquid('{{ "now" | date: "%Y" }}')
+    assert liquid_date in tpl.env.impure_filters
+
+    tpl = Liquid('{{ "x" | print }}', mode="wild")
+    assert capsys.readouterr().out == ""
+    tpl.render()
+    assert capsys.readouterr().out == "x\n"
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["sample", "relative_url", "absolute_url", "where_exp", "find_exp", "group_by_expr"],
+)
+def test_impure_jekyll_filters(name, set_default_jekyll):
+    tpl = Liquid("{{ x }}")
+    assert tpl.env.filters[name] in tpl.env.impure_filters
+
+
+@pytest.mark.parametrize("mode", ["standard", "jekyll", "shopify", "wild"])
+def test_builtin_filters_annotated(mode):
+    from importlib import import_module
+
+    module = import_module(f"liquid.filters.{mode}")
+    manager = getattr(module, f"{mode}_filter_manager")
+    assert set(manager.pures) == set(manager.filters)
+
+
+@pytest.mark.parametrize(
+    "name,memoized",
+    [
+        ("slugify", False),
+        ("cgi_escape", False),
+        ("uri_escape", False),
+        ("url_encode", False),
+        ("url_decode", False),
+        ("strip_html", True),
+        ("replace_many", True),
+        ("remove_many", True),
+        ("regex_replace", True),
+        ("regex_replace_many", True),
+        ("normalize_whitespace", True),
+    ],
+)
+def test_pure_builtin_filters(name, memoized):
+    from liquid import defaults
+    from liquid.filters.jekyll import jekyll_filter_manager
+    from liquid.filters.standard import standard_filter_manager
+
+    manager = (
+        standard_filter_manager
+        if name in standard_filter_manager.filters
+        else jekyll_filter_manager
+    )
+    assert manager.pures[name] is True
+    assert (manager.costs[name] >= defaults.FILTER_MEMO_COST) is memoized
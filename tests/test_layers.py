@@ -0,0 +1,117 @@
+import pytest
+from jinja2 import Environment
+from liquid import Liquid, LiquidEnvironment
+from liquid.environment import JINJA_FILTERS, JINJA_GLOBALS
+from liquid.filters.manager import FilterManager
+from liquid.layers import Layers, Namespace, freeze, layered, with_namespace
+
+
+def test_layers():
+    base = freeze({"a": 1, "b": 2})
+    layers = Layers({}, base)
+    assert layers["a"] == 1
+    assert layers.get("b") == 2
+    assert layers.get("c", 3) == 3
+    with pytest.raises(KeyError):
+        layers["c"]
+    with pytest.raises(TypeError):
+        base["a"] = 0
+
+    layers["a"] = 0
+    assert layers["a"] == 0
+    assert base["a"] == 1
+
+    # overwriting the top layer
+    layers.add_layer(freeze({"a": 10, "c": 30}))
+    assert (layers["a"], layers["b"], layers["c"]) == (10, 2, 30)
+    layers["b"] = 20
+    assert layers["b"] == 20
+
+    # at the bottom
+    layers.add_layer(freeze({"c": 0, "d": 40}), overwrite=False)
+    assert (layers["c"], layers["d"]) == (30, 40)
+    assert dict(layers) == {"a": 10, "b": 20, "c": 30, "d": 40}
+
+
+def test_layered():
+    base = freeze({"a": 1, "b": 2})
+    out = layered({"a": 1, "b": 3, "c": 4}, base)
+    assert out.maps == [{"b": 3, "c": 4}, base]
+    assert layered(out, base) is out
+
+    # items removed from the base
+    mapping = {"a": 1}
+    out = layered(mapping, base)
+    assert out.maps == [{}, mapping]
+    assert "b" not in out
+
+
+def test_env_layers():
+    env = LiquidEnvironment()
+    assert isinstance(env.filters, Layers)
+    assert env.filters.maps == [{}, JINJA_FILTERS]
+    assert env.globals.maps[-1] is JINJA_GLOBALS
+
+    env.filters["x"] = str
+    env2 = env.overlay()
+    assert env2.filters["x"] is str
+    env2.filters["x"] = int
+    assert env.filters["x"] is str
+    assert env2.filters.maps[1:] == env.filters.maps
+
+
+def test_liquid_layers(set_default_standard):
+    tpl1 = Liquid("{{ x | upcase }}", globals={"y": 1}, filters={"z": str})
+    tpl2 = Liquid("{{ x }}")
+    # the layers are shared
+    assert tpl1.env.filters.maps[1] is tpl2.env.filters.maps[1]
+    assert tpl1.env.filters.maps[0] == {"z": str}
+    assert tpl1.env.globals.maps[0] == {"y": 1}
+    assert tpl1.render(x="a") == "A"
+
+    # the environment from the user is not changed
+    env = Environment()
+    tpl = Liquid.from_env("{{ x | upcase }}", env)
+    assert tpl.render(x="a") == "A"
+    assert "upcase" not in env.filters
+
+
+def test_filter_manager_layer(set_default_standard):
+    manager = FilterManager()
+    manager.register("up")(str.upper)
+    layer = manager.layer()
+    assert manager.layer() is layer
+    assert manager.layer(memoize=False) is not layer
+
+    manager.register("down")(str.lower)
+    assert manager.layer() is not layer
+    assert set(manager.layer()) == {"up", "down"}
+
+
+@pytest.mark.parametrize("overwrite", [True, False])
+def test_update_to_plain_env(overwrite):
+    manager = FilterManager()
+    manager.register("upper")(str.upper)
+    env = Environment()
+    env.filters["upper"] = str.lower
+    manager.update_to_env(env, overwrite=overwrite)
+    assert isinstance(env.filters, dict)
+    assert env.filters["upper"] is (str.upper if overwrite else str.lower)
+
+
+def test_namespace():
+    layers = with_namespace(Layers({"a": 1}, freeze({"b": 2})))
+    top = layers.maps[0]
+    assert isinstance(top, Namespace)
+    assert with_namespace(layers).maps[0] is top
+    assert top == {"a": 1}
+
+    exec("def f():\n    return a + b + c", top)
+    with pytest.raises(NameError):
+        top["f"]()
+    layers.add_layer(freeze({"c": 3}))
+    assert top["f"]() == 6
+
+    env = LiquidEnvironment()
+    assert isinstance(env.globals.maps[0], Namespace)
+    assert isinstance(env.overlay().globals.maps[0], Namespace)
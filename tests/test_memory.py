@@ -0,0 +1,85 @@
+import sys
+from collections import ChainMap
+
+import pytest
+from jinja2 import Environment
+from liquid import Liquid
+from liquid.memory import deep_sizeof
+
+COMPONENTS = [
+    "template",
+    "filters",
+    "tests",
+    "globals",
+    "extensions",
+    "loader",
+    "caches",
+    "environment",
+    "liquid",
+    "total",
+]
+
+
+@pytest.mark.parametrize("mode", ["standard", "jekyll", "shopify", "wild"])
+def test_memory_report(mode):
+    tpl = Liquid(
+        "{% for i in x %}{{ i | upcase }}{% endfor %}", from_file=False, mode=mode
+    )
+    report = tpl.memory_report()
+    assert list(report) == COMPONENTS
+    assert all(size > 0 for size in report.values())
+    assert report["total"] == sum(
+        size for name, size in report.items() if name != "total"
+    )
+    filters = tpl.env.filters
+    assert report["filters"] == (
+        sys.getsizeof(filters)
+        + sys.getsizeof(filters.maps)
+        + sys.getsizeof(filters.maps[0])
+    )
+
+
+def test_memory_report_plain_registries(set_default_standard):
+    tpl = Liquid("{{ x }}")
+    tpl.env.tests = dict(tpl.env.tests)
+    assert tpl.memory_report()["tests"] == sys.getsizeof(tpl.env.tests)
+
+
+def test_memory_report_template_size(set_default_standard):
+    small = Liquid("{{ x }}").memory_report()
+    large = Liquid("{{ x }}" + "".join(f"[{i}]{{{{ x }}}}" for i in range(200)))
+    assert large.memory_report()["template"] > small["template"] + 5000
+
+
+def test_deep_sizeof():
+    def shared():
+        ...
+
+    seen = set()
+    items = ["a" * 100, ["b" * 100], (1.5,), {2}, frozenset([3])]
+    value = {"items": items, "shared": shared, "none": None}
+    size = deep_sizeof(value, seen)
+    assert size > sys.getsizeof(value) + 200
+    # counted once
+    assert deep_sizeof(value, seen) == 0
+    assert deep_sizeof(items[0], seen) == 0
+
+    # shared objects
+    assert deep_sizeof(shared, set()) == 0
+    assert deep_sizeof(len, set()) == 0
+    assert deep_sizeof(sys, set()) == 0
+    assert deep_sizeof(Environment(), set()) == 0
+
+    class Slotted:
+        __slots__ = ("a", "b")
+
+        def method(self):
+            ...
+
+    obj = Slotted()
+    obj.a = "x" * 1000
+    assert deep_sizeof(obj, set()) > 1000
+    assert deep_sizeof(obj.method, set()) > 1000
+
+    chain = ChainMap({"a": "y" * 1000})
+    assert deep_sizeof(chain, set()) > 1000
@@ -0,0 +1,51 @@
+import builtins
+
+import pytest
+from liquid import Liquid
+from liquid.filters.standard import standard_filter_manager
+from liquid.modes import MODES, mode_bundle
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_mode_bundle(mode):
+    bundle = mode_bundle(mode)
+    assert bundle.mode == mode
+    assert mode_bundle(mode) is bundle
+    assert bundle.filters[0] is standard_filter_manager
+
+
+def test_mode_bundle_unknown():
+    assert mode_bundle("unknown") is mode_bundle("standard")
+
+
+def test_wild_bundle_shared():
+    bundle = mode_bundle("wild")
+    tpl1 = Liquid("{{ x | len }}", from_file=False, mode="wild")
+    tpl2 = Liquid("{{ x }}", from_file=False, mode="wild")
+    bfilters = bundle.filters[1]
+    assert bfilters["len"] is len
+    assert bfilters in tpl1.env.filters.maps
+    assert bfilters in tpl2.env.filters.maps
+    assert tpl1.env.globals["abs"] is builtins.abs
+    assert tpl1.env.filters["print"] in tpl1.env.impure_filters
+    assert tpl1.render(x="abc") == "3"
+
+    tpl3 = Liquid(
+        "{{ x }}", from_file=False, mode="wild", filters_as_globals=False
+    )
+    assert "upcase" in tpl1.env.globals
+    assert "upcase" not in tpl3.env.globals
+
+
+def test_bundle_takes_filters_registered_later(set_default_standard):
+    mode_bundle("standard")
+
+    @standard_filter_manager.register
+    def later_filter(value):
+        return f"later:{value}"
+
+    try:
+        assert Liquid("{{ 1 | later_filter }}").render() == "later:1"
+    finally:
+        del standard_filter_manager.filters["later_filter"]
+        standard_filter_manager._layers.clear()
@@ -0,0 +1,87 @@
+import pytest
+from jinja2 import Environment, TemplateSyntaxError
+from jinja2.nativetypes import NativeEnvironment
+from jinja2.parser import Parser
+from jinja2.runtime import LoopContext
+from liquid import Liquid, patch_jinja, unpatch_jinja
+from liquid.parser import (
+    LiquidCodeGenerator,
+    LiquidParser,
+    liquid_code_generator_class,
+)
+from liquid.patching import jinja_parse_for, jinja_parse_if
+from liquid.runtime import loop_iter
+
+LIQUID_TPL = """
+{%- for x in xs offset:1 limit:3 reversed -%}
+{%- if x == 2 %}two{% elsif x == 3 %}three{% else %}{{ x }}{% endif -%}
+:{{ loop.rindex }}{{ loop.liquid_cycle("a", "b") }}
+{%- endfor -%}
+"""
+
+
+def test_jinja_untouched():
+    assert Parser.parse_if is jinja_parse_if
+    assert Parser.parse_for is jinja_parse_for
+    assert not hasattr(LoopContext, "rindex")
+    with pytest.raises(TemplateSyntaxError):
+        Environment().from_string(LIQUID_TPL)
+
+
+def test_patch_jinja():
+    patch_jinja()
+    try:
+        tpl = Environment().from_string(LIQUID_TPL)
+        assert tpl.render(xs=[1, 2, 3, 4, 5]) == "4:3athree:2btwo:1a"
+    finally:
+        unpatch_jinja()
+
+    test_jinja_untouched()
+    # not patched
+    unpatch_jinja()
+
+
+def test_liquid_parser(set_default_wild):
+    tpl = Liquid(LIQUID_TPL)
+    assert tpl.render(xs=[1, 2, 3, 4, 5]) == "4:3athree:2btwo:1a"
+
+    # in any order, with a test
+    tpl = Liquid(
+        "{% for x in xs reversed limit:n if x > 1 %}{{ x }}{% endfor %}"
+    )
+    assert tpl.render(xs=[1, 2, 3, 4], n=3) == "32"
+    assert tpl.render(xs=None, n=3) == ""
+
+
+def test_loop_iter():
+    env = Environment()
+    assert loop_iter(env.getitem, [1, 2, 3]) == [1, 2, 3]
+    assert loop_iter(env.getitem, [1, 2, 3], offset=1) == [2, 3]
+    assert loop_iter(env.getitem, [1, 2, 3], limit=2) == [1, 2]
+    assert loop_iter(env.getitem, [1, 2, 3], 1, 1) == [2]
+    assert list(loop_iter(env.getitem, [1, 2, 3], 1, reverse=True)) == [3, 2]
+
+
+def test_async_loop_context(set_default_standard):
+    import asyncio
+
+    tpl = Liquid(
+        "{% for x in xs %}{{ forloop.rindex0 }}"
+        "{% cycle 'a', 'b' %}{% endfor %}",
+        enable_async=True,
+    )
+    assert asyncio.run(tpl.render_async(xs=[1, 2, 3])) == "2a1b0a"
+
+
+def test_code_generator_class(set_default_standard):
+    assert liquid_code_generator_class(LiquidCodeGenerator) is LiquidCodeGenerator
+    tpl = Liquid.from_env(
+        "{% for x in xs limit:2 %}{{ x }}{% endfor %}",
+        NativeEnvironment(),
+    )
+    assert issubclass(tpl.env.code_generator_class, LiquidCodeGenerator)
+    assert tpl.env.code_generator_class is liquid_code_generator_class(
+        NativeEnvironment.code_generator_class
+    )
+    assert tpl.render(xs=[1, 2, 3]) == 12
+    assert isinstance(LiquidParser(tpl.env, "").parse().body, list)
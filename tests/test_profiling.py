@@ -0,0 +1,361 @@
+import threading
+
+import pytest
+from liquid import Liquid
+from liquid.profiling import (
+    CompileStats,
+    LineProfiler,
+    Profiler,
+    compile_record,
+    enable_compile_stats,
+    enable_profiling,
+)
+
+
+def test_profiling_disabled(set_default_standard):
+    tpl = Liquid("{{ x | upcase }}")
+    assert tpl.profiler is None
+    assert not hasattr(tpl.env.filters["upcase"], "liquid_profiled")
+
+
+def test_profile_filters_and_tags(set_default_standard):
+    tpl = Liquid(
+        "{% capture x %}{{ a | upcase | append: 'b' }}{% endcapture %}"
+        "{{ x | size }}{% for s in ss %}{{ s | strip_html }}{% endfor %}",
+        profile=True,
+    )
+    assert tpl.render(a="abc", ss=["<b>x</b>", "y" * 20, "z" * 2000]) == (
+        "4xyyyyyyyyyyyyyyyyyyyy" + "z" * 2000
+    )
+    report = tpl.profiler.report()
+    assert set(report["filters"]) == {"upcase", "append", "size", "strip_html"}
+    assert list(report["tags"]) == ["capture"]
+
+    strip_html = report["filters"]["strip_html"]
+    assert strip_html["calls"] == 3
+    assert strip_html["sizes"] == {"<=10": 1, "<=100": 1, "<=10000": 1}
+    assert strip_html["self"] == pytest.approx(strip_html["total"])
+
+    # the filters inside are excluded from the self time of the tag
+    capture = report["tags"]["capture"]
+    assert capture["calls"] == 1
+    assert capture["sizes"] == {}
+    assert capture["self"] < capture["total"]
+    assert capture["total"] >= (
+        report["filters"]["upcase"]["total"]
+        + report["filters"]["append"]["total"]
+    )
+
+    tpl.render(a="abc", ss=[])
+    assert tpl.profiler.report()["tags"]["capture"]["calls"] == 2
+
+    tpl.profiler.reset()
+    assert tpl.profiler.report() == {"filters": {}, "tags": {}}
+
+
+def test_profile_shared(set_default_standard):
+    profiler = Profiler()
+    tpl1 = Liquid("{{ x | upcase }}", profile=profiler)
+    tpl2 = Liquid("{{ x | upcase }}{{ x | date: '%Y' }}", profile=profiler)
+    tpl1.render(x="a")
+    tpl2.render(x="2020-01-01")
+    assert profiler.report()["filters"]["upcase"]["calls"] == 2
+    # the impure filters are still not evaluated at compile time
+    tpl3 = Liquid("{{ 'now' | date: '%Y' }}", profile=profiler)
+    calls = profiler.report()["filters"]["date"]["calls"]
+    tpl3.render()
+    tpl3.render()
+    assert profiler.report()["filters"]["date"]["calls"] == calls + 2
+
+    # enabling again doesn't wrap the filters again
+    upcase = tpl1.env.filters["upcase"]
+    assert enable_profiling(tpl1.env) is profiler
+    assert tpl1.env.filters["upcase"] is upcase
+
+
+def test_profile_user_filters(set_default_standard):
+    def double(env, value):
+        return value * 2
+
+    from jinja2 import pass_environment
+
+    tpl = Liquid(
+        "{{ x | double }}{{ x | triple }}",
+        filters={"double": pass_environment(double), "triple": lambda x: x * 3},
+        profile=True,
+    )
+    assert tpl.render(x=1) == "23"
+    filters = tpl.profiler.report()["filters"]
+    assert filters["double"]["calls"] == 1
+    # ints have no sizes
+    assert filters["double"]["sizes"] == {}
+    assert filters["triple"]["calls"] == 1
+
+
+def test_profile_filters_added_later(set_default_standard):
+    from jinja2 import Environment
+
+    tpl = Liquid("{{ x | upcase }}", profile=True)
+    tpl.env.filters["double"] = lambda x: x * 2
+    assert getattr(tpl.env.filters.get("double"), "liquid_profiled", False)
+    assert tpl.env.filters.get("nosuch", 1) == 1
+    tpl.env.from_string("{{ x | double }}").render(x=1)
+    assert tpl.profiler.report()["filters"]["double"]["calls"] == 1
+
+    # the wrapped ones are reused until the filters change
+    double = tpl.env.filters["double"]
+    assert tpl.env.filters["double"] is double
+    tpl.env.filters["double"] = lambda x: x * 2
+    assert tpl.env.filters["double"] is not double
+    # not wrapped again
+    tpl.env.filters["double2"] = double
+    assert tpl.env.filters["double2"] is double
+
+    # the overlays share the profiler
+    overlay = tpl.env.overlay()
+    overlay.filters["triple"] = lambda x: x * 3
+    assert overlay.from_string("{{ x | triple }}").render(x=1) == "3"
+    assert tpl.profiler.report()["filters"]["triple"]["calls"] == 1
+    assert "triple" not in tpl.env.filters
+
+    # enabling with another profiler
+    profiler = Profiler()
+    assert enable_profiling(tpl.env, profiler) is profiler
+    assert enable_profiling(tpl.env, profiler) is profiler
+    tpl.env.from_string("{{ x | double }}").render(x=1)
+    assert profiler.report()["filters"]["double"]["calls"] == 1
+
+    # environments without layers
+    env = Environment()
+    profiler = enable_profiling(env)
+    env.filters["double"] = lambda x: x * 2
+    assert env.from_string("{{ 1 | double | upper }}").render() == "2"
+    assert set(profiler.report()["filters"]) == {"double", "upper"}
+
+
+def test_profile_wild_filters():
+    tpl = Liquid(
+        "{% addfilter double %}\n"
+        "def double(x):\n"
+        "    return x * 2\n"
+        "{% endaddfilter %}{{ x | double }}",
+        mode="wild",
+        from_file=False,
+        profile=True,
+    )
+    assert tpl.render(x=1) == "2"
+    assert tpl.profiler.report()["filters"]["double"]["calls"] == 1
+
+
+def test_profile_broken_tags(set_default_standard):
+    def fail(value):
+        raise ValueError(value)
+
+    tpl = Liquid(
+        "{% for i in (1..3) %}"
+        "{% unless i > 1 %}{% continue %}{% endunless %}"
+        "{% case i %}{% when 3 %}{% break %}{% endcase %}"
+        "{% endfor %}"
+        "{% capture y %}{{ x | fail }}{% endcapture %}",
+        filters={"fail": fail},
+        profile=True,
+    )
+    with pytest.raises(ValueError):
+        tpl.render(x=1)
+
+    tags = tpl.profiler.report()["tags"]
+    assert tags["unless"]["calls"] == 3
+    assert tags["case"]["calls"] == 2
+    assert tags["capture"]["calls"] == 1
+    # the ones broken inside are not taken as the parents of the others
+    assert tags["case"]["self"] == pytest.approx(tags["case"]["total"])
+
+
+def test_profile_threads(set_default_standard):
+    tpl = Liquid("{% capture y %}{{ x | upcase }}{% endcapture %}", profile=True)
+
+    threads = [
+        threading.Thread(target=lambda: [tpl.render(x="a") for _ in range(50)])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = tpl.profiler.report()
+    assert report["filters"]["upcase"]["calls"] == 200
+    assert report["tags"]["capture"]["calls"] == 200
+
+
+def test_prometheus(set_default_standard):
+    tpl = Liquid(
+        "{% capture y %}{{ x | upcase }}{% endcapture %}", profile=True
+    )
+    tpl.render(x="abc")
+    text = tpl.profiler.prometheus()
+    assert "# TYPE liquid_calls_total counter\n" in text
+    assert 'liquid_calls_total{kind="filter",name="upcase"} 1\n' in text
+    assert 'liquid_calls_total{kind="tag",name="capture"} 1\n' in text
+    assert 'liquid_seconds_total{kind="tag",name="capture"} ' in text
+    assert 'liquid_self_seconds_total{kind="tag",name="capture"} ' in text
+    assert "# TYPE liquid_value_size histogram\n" in text
+    assert (
+        'liquid_value_size_bucket{kind="filter",name="upcase",le="1"} 0\n'
+        in text
+    )
+    assert (
+        'liquid_value_size_bucket{kind="filter",name="upcase",le="10"} 1\n'
+        in text
+    )
+    assert (
+        'liquid_value_size_bucket{kind="filter",name="upcase",le="+Inf"} 1\n'
+        in text
+    )
+    assert 'liquid_value_size_sum{kind="filter",name="upcase"} 3\n' in text
+    assert 'liquid_value_size_count{kind="filter",name="upcase"} 1\n' in text
+    # tags have no sizes
+    assert 'liquid_value_size_count{kind="tag"' not in text
+
+
+def test_line_profiler(set_default_standard, tmp_path):
+    (tmp_path / "main.liquid").write_text(
+        "head\n"
+        "{% for i in (1..3) %}{% include 'item.liquid' %}{% endfor %}\n"
+        "{{ tail | upcase }}"
+    )
+    (tmp_path / "item.liquid").write_text("<{{ i }}>")
+    tpl = Liquid(
+        "main.liquid", from_file=True, search_paths=[tmp_path]
+    )
+
+    with LineProfiler() as prof:
+        out = tpl.render(tail="tail")
+    assert out == "head\n<1><2><3>\nTAIL"
+
+    main = "main.liquid"
+    lines = {(row["template"], row["line"]): row for row in prof.lines()}
+    assert set(lines) == {(main, 1), (main, 2), (main, 3), ("item.liquid", 1)}
+    # the outputs of the included template are not counted twice
+    assert sum(row["output"] for row in lines.values()) == len(out)
+    assert lines[("item.liquid", 1)]["output"] == 9
+    assert lines[(main, 2)]["total"] >= lines[("item.liquid", 1)]["total"]
+
+    templates = prof.templates()
+    assert list(templates) == [main, "item.liquid"]
+    assert templates[main]["output"] == len(out) - 9
+    assert templates[main]["total"] == pytest.approx(
+        templates[main]["self"] + templates["item.liquid"]["total"]
+    )
+
+    folded = prof.folded().splitlines()
+    assert f"{main}:2;item.liquid:1" in [line.rsplit(" ", 1)[0] for line in folded]
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in folded)
+
+    table = prof.table(limit=2).splitlines()
+    assert table[0].split() == ["Self(ms)", "Total(ms)", "Output(B)", "Line"]
+    assert table[3] == ""
+    assert table[-1].endswith("  item.liquid")
+
+    path = tmp_path / "render.folded"
+    prof.dump_folded(path)
+    assert path.read_text() == prof.folded()
+
+    prof.reset()
+    assert prof.lines() == []
+    assert prof.folded() == ""
+
+
+def test_line_profiler_inactive(set_default_standard):
+    tpl = Liquid("{{ x }}")
+    with LineProfiler() as prof:
+        pass
+    assert tpl.render(x=1) == "1"
+    assert prof.times == {}
+    assert prof.outputs == {}
+
+
+def test_compile_stats(set_default_standard):
+    tpl = Liquid(
+        "{% capture x %}{{ a | append: 'b' }}{% endcapture %}{{ x }}",
+        compile_stats=True,
+    )
+    stats = tpl.env.compile_stats
+    assert tpl.render(a="a") == "ab"
+    assert len(stats.records) == 1
+
+    record = stats.report()[0]
+    assert record["name"] == "<template>"
+    assert record["source_size"] == 59
+    assert record["preprocessed_size"] > 0
+    assert record["code_size"] > record["source_size"]
+    assert record["bytecode_size"] > 0
+    assert set(record["phases"]) == {
+        "preprocess:LiquidStandardExtension",
+        "lex",
+        "filter_stream:FilterColonExtension",
+        "filter_stream:LiquidStandardExtension",
+        "parse",
+        "tags",
+        "generate",
+        "compile",
+    }
+    assert all(elapsed >= 0 for elapsed in record["phases"].values())
+    assert record["total"] == pytest.approx(sum(record["phases"].values()))
+    assert stats.summary() == pytest.approx(record["phases"])
+
+    table = stats.table().splitlines()
+    assert table[0].split()[:4] == [
+        "Total(ms)",
+        "Source(B)",
+        "Code(B)",
+        "Bytecode(B)",
+    ]
+    assert table[1].endswith("  <template>")
+    assert table[3].split() == ["Total(ms)", "Share", "Phase"]
+
+    # compiled expressions have no sources
+    tpl.env.compile_expression("a + 1")
+    assert stats.records[-1].source_size is None
+    assert any(
+        line.split()[1] == "-" for line in stats.table().splitlines()[1:3]
+    )
+    assert len(stats.table(limit=1).splitlines()) == len(table)
+
+    stats.reset()
+    assert stats.records == []
+    assert stats.table().splitlines()[-1].split() == ["Total(ms)", "Share", "Phase"]
+
+
+def test_compile_stats_if_for(set_default_standard):
+    tpl = Liquid(
+        "{% for x in xs limit: 2 %}{% if x %}{{ x }}{% elsif y %}y{% endif %}"
+        "{% endfor %}",
+        compile_stats=True,
+    )
+    assert tpl.render(xs=[1, 0, 3], y=True) == "1y"
+
+    record = tpl.env.compile_stats.records[0]
+    assert {"parse", "parse_if", "parse_for"} <= set(record.phases)
+    # the if tag is excluded from the for tag
+    assert record.total == pytest.approx(sum(record.phases.values()))
+
+
+def test_compile_stats_shared_and_errors(set_default_jekyll):
+    stats = CompileStats()
+    tpl = Liquid("---\na: 1\n---\n{{ page.a }}", compile_stats=stats)
+    assert tpl.render() == "1"
+    assert tpl.env.compile_stats is stats
+    assert "preprocess:FrontMatterExtension" in stats.records[0].phases
+    assert enable_compile_stats(tpl.env) is stats
+
+    with pytest.raises(Exception):
+        tpl.env.from_string("{% if %}")
+    assert len(stats.records) == 1
+    assert stats.current() is None
+
+
+def test_compile_stats_disabled(set_default_standard):
+    tpl = Liquid("{{ x }}")
+    assert getattr(tpl.env, "compile_stats", None) is None
+    assert compile_record(tpl.env) is None
@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from jinja2 import DictLoader, Environment
+from liquid import Liquid
+from liquid.environment import LiquidTemplate, liquid_template_class
+from liquid.exts.front_matter import FrontMatterExtension
+
+
+def _run(func, n=8):
+    with ThreadPoolExecutor(n) as pool:
+        return list(pool.map(func, range(n * 4)))
+
+
+def test_concurrent_renders(set_default_standard):
+    tpl = Liquid(
+        "{% for x in xs %}{% cycle 'a', 'b' %}{{ x | plus: n }}{% endfor %}"
+    )
+    out = _run(lambda i: tpl.render(xs=[1, 2], n=i))
+    assert out == [f"a{i + 1}b{i + 2}" for i in range(32)]
+
+
+def test_concurrent_front_matter(set_default_jekyll):
+    env = Liquid("", from_file=False).env
+    out = _run(lambda i: env.from_string(f"---\na: {i}\n---\n{{{{page.a}}}}"))
+    # each template has its own page
+    assert [tpl.render() for tpl in out] == [str(i) for i in range(32)]
+    assert "page" not in env.globals
+
+
+def test_front_matter_per_template(set_default_jekyll):
+    tpl = Liquid(
+        "---\na: 1\n---\n{{ page.a }}{% include 'part.html' %}{{ page.a }}",
+        from_file=False,
+        loader=DictLoader({"part.html": "---\na: 2\n---\n{{ page.a }}"}),
+    )
+    assert isinstance(tpl.template, LiquidTemplate)
+    # included with the context of the parent
+    assert tpl.render() == "111"
+    # compiling the included template doesn't change the page of the parent
+    assert tpl.render() == "111"
+    assert tpl.env.get_template("part.html").render() == "2"
+    assert liquid_template_class(LiquidTemplate) is LiquidTemplate
+
+
+def test_front_matter_other_env():
+    env = Environment(extensions=[FrontMatterExtension])
+    env.front_matter_lang = "yaml"
+    assert env.from_string("---\na: 1\n---\n{{ page.a }}").render() == "1"
+    assert env.globals["page"]["a"] == 1
+
+
+def test_compile_failed_template_globals(set_default_jekyll):
+    env = Liquid("", from_file=False).env
+    env.set_template_global("x", 1)
+    assert env.from_string("{{ x }}").render() == ""
+    env.set_template_global("x", 1)
+    assert env.pop_template_globals() == {"x": 1}
+    assert env.pop_template_globals() is None
+
+
+def test_python_tag_print_threads(set_default_wild, capsys):
+    barrier = threading.Barrier(4)
+
+    def compile_(i):
+        barrier.wait()
+        return Liquid(f"{{% python print({i}) %}}").render().strip()
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(compile_, range(4))) == ["0", "1", "2", "3"]
+    assert capsys.readouterr().out == ""
+
+    # print() at render time and to files are not captured
+    tpl = Liquid(
+        "{% python %}\n"
+        "import sys\n"
+        "def shout(x):\n"
+        "    print(x)\n"
+        "    return x\n"
+        "print('err', file=sys.stderr)\n"
+        "{% endpython %}{{ shout(1) }}"
+    )
+    assert capsys.readouterr().err == "err\n"
+    assert tpl.render() == "1"
+    assert capsys.readouterr().out == "1\n"
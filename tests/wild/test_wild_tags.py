@@ -22,6 +22,34 @@ def test_python_block(set_default_wild):
     assert Liquid(tpl).render().strip() == "1"
 
 
+def test_python_live_globals(set_default_wild):
+    tpl = (
+        "{% python %}\ndef f():\n    return x\n{% endpython %}"
+        "{% python x = 5 %}{{ f() }}"
+    )
+    liq = Liquid(tpl)
+    assert liq.render() == "5"
+    # also the names bound by the other tags
+    liq.env.globals["x"] = 6
+    assert liq.render() == "6"
+
+
+def test_python_print_not_leaked(set_default_wild):
+    out = Liquid('{% python %}print("hi"){% endpython %}{{ print }}').render()
+    assert out.startswith("hi\n<built-in function print>")
+
+    # the print() bound before is kept
+    tpl = (
+        "{% python %}\ndef print(*args):\n    return 'mine'\n{% endpython %}"
+        "{% python %}print('x'){% endpython %}{{ print() }}"
+    )
+    assert Liquid(tpl).render() == "x\nmine"
+
+    # the print() bound by the code is kept
+    tpl = "{% python print = len %}{{ print('abc') }}"
+    assert Liquid(tpl).render() == "3"
+
+
 def test_import_block(set_default_wild):
     tpl = """
     {% import_ os %}
@@ -57,3 +85,44 @@ def test_addfilter_err(set_default_wild):
     """
     with pytest.raises(TemplateSyntaxError, match="No such filter defined"):
         Liquid(tpl)
+
+
+def test_addfilter_cached(set_default_wild):
+    tpl = """
+    {% addfilter trunc %}
+    def trunc(string, n):
+        return string[:n]
+    {% endaddfilter %}
+    {{"abcde" | trunc: 3}}
+    """
+    liq1 = Liquid(tpl)
+    liq2 = Liquid(tpl)
+    assert liq1.render().strip() == liq2.render().strip() == "abc"
+    # the code is compiled once, but executed for each environment
+    trunc1 = liq1.env.filters["trunc"]
+    trunc2 = liq2.env.filters["trunc"]
+    assert trunc1 is not trunc2
+    assert trunc1.__code__ is trunc2.__code__
+
+
+def test_addfilter_globals_per_env(set_default_wild):
+    tpl = """
+    {% addfilter scale %}
+    def scale(value):
+        return value * factor
+    {% endaddfilter %}
+    {{ 2 | scale }}
+    """
+    assert Liquid(tpl, globals={"factor": 2}).render().strip() == "4"
+    assert Liquid(tpl, globals={"factor": 3}).render().strip() == "6"
+
+
+def test_import_cached(set_default_wild):
+    import os
+
+    liq1 = Liquid("{% import_ os %}{{os.sep}}")
+    liq2 = Liquid("{% from_ os import path %}{{path.sep}}")
+    assert liq1.render() == liq2.render() == os.sep
+    assert liq1.env.globals["os"] is os
+    assert liq2.env.globals["path"] is os.path
+    assert "__builtins__" not in liq1.env.globals